@@ -18,6 +18,8 @@ CONFIG = {
     # verbose is True if not quiet and not piping
     "verbose": True,
     "debug": False,
+    # Output format: "text" for humans, "jsonl" for one JSON record per line
+    "format": "text",
 }
 
 # vim: set ts=8 sw=4 tw=79:
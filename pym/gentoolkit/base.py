@@ -14,6 +14,7 @@ import sys
 
 import gentoolkit
 import gentoolkit.pprinter as pp
+from gentoolkit import instrument
 from gentoolkit.formatters import format_options
 
 
@@ -23,6 +24,8 @@ GLOBAL_OPTIONS = (
     ("    -C, --no-color", "turn off colors"),
     ("    -N, --no-pipe", "turn off pipe detection"),
     ("    -V, --version", "display version info"),
+    ("    --profile=FILE", "write cProfile statistics to FILE"),
+    ("    --timings", "print time spent per phase to stderr"),
 )
 
 
@@ -106,8 +109,7 @@ def parse_global_options(global_opts, args, module_info, formatted_options):
 
     need_help = False
     do_help = False
-    opts = (opt[0] for opt in global_opts)
-    for opt in opts:
+    for opt, arg in global_opts:
         if opt in ("-h", "--help"):
             do_help = True
             if args:
@@ -126,6 +128,10 @@ def parse_global_options(global_opts, args, module_info, formatted_options):
             sys.exit(0)
         elif opt in ("--debug"):
             gentoolkit.CONFIG["debug"] = True
+        elif opt == "--profile":
+            instrument.configure(profile=arg)
+        elif opt == "--timings":
+            instrument.configure(timings=True)
     if do_help:
         print_help(module_info, formatted_options)
         sys.exit(0)
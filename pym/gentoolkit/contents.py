@@ -0,0 +1,241 @@
+# Copyright(c) 2026, Gentoo Foundation
+#
+# Licensed under the GNU General Public License, v2
+
+"""Read the CONTENTS of installed packages without a dblink.
+
+L{Package.parsed_contents<gentoolkit.package.Package.parsed_contents>}
+used to get the contents of a package from portage's dblink, which is
+built for merging and unmerging: making one per package and matching every
+line against a regular expression is most of the time equery files, check,
+size and belongs spend on a whole VDB. Here a line is split at its last
+spaces, the expression only being tried on lines that do not split cleanly,
+and the result of each CONTENTS file is kept for the rest of the process:
+
+    >>> from gentoolkit.contents import get_contents, iter_contents
+    >>> path = '/var/db/pkg/app-misc/hello-1/CONTENTS'
+    >>> next(iter_contents(path))
+    ('/usr', 'dir', None, None, None)
+    >>> get_contents(path)['/usr/bin/hello']
+    ('obj', '1700000000', 'd41d8cd98f00b204e9800998ecf8427e')
+"""
+
+__all__ = (
+    "CONTENTS_CACHE_SIZE",
+    "clear_contents_cache",
+    "get_contents",
+    "iter_contents",
+    "read_contents",
+)
+__docformat__ = "epytext"
+
+# =======
+# Imports
+# =======
+
+import errno
+import os
+import re
+
+from portage import _encodings, _unicode_encode
+from portage.util import normalize_path, writemsg
+
+# =======
+# Globals
+# =======
+
+# Number of CONTENTS files L{get_contents} keeps parsed
+CONTENTS_CACHE_SIZE = 1000
+
+# {(CONTENTS path, root, eprefix): ([mtime_ns, size], contents)}
+_contents_cache = {}
+
+# The same as dblink's
+_NORMALIZE_NEEDED = re.compile(r"//|^[^/]|./$|(^|/)\.\.?(/|$)")
+_CONTENTS_RE = re.compile(
+    r"^("
+    + r"(?P<dir>(dev|dir|fif) (.+))|"
+    + r"(?P<obj>(obj) (.+) (\S+) (\d+))|"
+    + r"(?P<sym>(sym) (.+) -> (.+) ((\d+)|(?P<oldsym>("
+    + r"\(\d+, \d+L, \d+L, \d+, \d+, \d+, \d+L, \d+, (\d+), \d+\)))))"
+    + r")$"
+)
+
+# =========
+# Functions
+# =========
+
+
+def iter_contents(path):
+    """Yield the entries of a CONTENTS file, in the order of its lines.
+
+    Paths are normalized like dblink does, lines which can not be parsed
+    are reported and skipped.
+
+    @type path: str
+    @param path: the CONTENTS file
+    @rtype: generator
+    @return: (path, type, mtime, md5, target) tuples, None for the fields
+            the type of entry does not have
+    @raise OSError: if the file exists but can not be read
+    """
+
+    try:
+        contents = open(
+            _unicode_encode(path, encoding=_encodings["fs"], errors="strict"),
+            encoding=_encodings["repo.content"],
+            errors="replace",
+        )
+    except OSError as err:
+        if err.errno != errno.ENOENT:
+            raise
+        return
+
+    errors = []
+    with contents:
+        for pos, line in enumerate(contents, 1):
+            line = line.rstrip("\n")
+            if "\0" in line:
+                # Null bytes are a common indication of corruption
+                errors.append((pos, "Null byte found in CONTENTS entry"))
+                continue
+            entry = _parse_line(line)
+            if entry is None:
+                errors.append((pos, "Unrecognized CONTENTS entry"))
+                continue
+            name = entry[0]
+            if _NORMALIZE_NEEDED.search(name) is not None:
+                name = normalize_path(name)
+                if not name.startswith(os.sep):
+                    name = os.sep + name
+                entry = (name,) + entry[1:]
+            yield entry
+
+    if errors:
+        writemsg("!!! Parse error in '%s'\n" % path, noiselevel=-1)
+        for pos, error in errors:
+            writemsg("!!!   line %d: %s\n" % (pos, error), noiselevel=-1)
+
+
+def read_contents(path, root=os.sep, eprefix=""):
+    """Read a CONTENTS file into the dict of dblink.getcontents().
+
+    Like there, the parent directories of every entry below eprefix are
+    added as directories.
+
+    @type path: str
+    @param path: the CONTENTS file
+    @type root: str
+    @param root: prepended to every path
+    @type eprefix: str
+    @param eprefix: the EPREFIX the paths of the file start with
+    @rtype: dict
+    @return: {'/path/to/obj': ('obj', mtime, md5), '/path/to/sym': ('sym',
+            mtime, target), '/path/to/dir': ('dir',), ...}
+    """
+
+    # Parents are added down to the depth of EROOT
+    eroot = os.path.join(root, eprefix.lstrip(os.sep))
+    min_depth = len(eroot.rstrip(os.sep).split(os.sep))
+    if root == os.sep:
+        root = None
+    dir_entry = ("dir",)
+    pkgfiles = {}
+    for name, kind, mtime, md5, target in iter_contents(path):
+        if root is not None:
+            name = os.path.join(root, name.lstrip(os.sep))
+        parts = name.split(os.sep)
+        for depth in range(len(parts) - 1, min_depth, -1):
+            parent = os.sep.join(parts[:depth])
+            if parent in pkgfiles:
+                break
+            pkgfiles[parent] = dir_entry
+
+        if kind == "obj":
+            pkgfiles[name] = (kind, mtime, md5)
+        elif kind == "sym":
+            pkgfiles[name] = (kind, mtime, target)
+        else:
+            pkgfiles[name] = (kind,)
+    return pkgfiles
+
+
+def get_contents(path, root=os.sep, eprefix=""):
+    """Return the contents of a CONTENTS file, parsed once per process.
+
+    The result is reused until the mtime or size of the file changes, so
+    it must not be modified.
+
+    @see: L{read_contents}
+    @rtype: dict
+    """
+
+    try:
+        st = os.stat(_unicode_encode(path, encoding=_encodings["fs"]))
+        stamp = [st.st_mtime_ns, st.st_size]
+    except OSError:
+        stamp = None
+    key = (path, root, eprefix)
+    cached = _contents_cache.get(key)
+    if cached is not None and cached[0] == stamp:
+        return cached[1]
+
+    contents = read_contents(path, root, eprefix)
+    _contents_cache.pop(key, None)
+    while _contents_cache and len(_contents_cache) >= CONTENTS_CACHE_SIZE:
+        del _contents_cache[next(iter(_contents_cache))]
+    _contents_cache[key] = (stamp, contents)
+    return contents
+
+
+def clear_contents_cache():
+    """Forget the CONTENTS files parsed so far."""
+
+    _contents_cache.clear()
+
+
+def _parse_line(line):
+    """Return the (path, type, mtime, md5, target) of a CONTENTS line, or
+    None if it is not valid."""
+
+    kind = line[:4]
+    rest = line[4:]
+    if kind in ("dir ", "dev ", "fif "):
+        if rest:
+            return (rest, kind[:3], None, None, None)
+    elif kind == "obj ":
+        parts = rest.rsplit(" ", 2)
+        if len(parts) == 3 and parts[0] and parts[1] and parts[2].isdigit():
+            return (parts[0], "obj", parts[2], parts[1], None)
+    elif kind == "sym ":
+        link, sep, mtime = rest.rpartition(" ")
+        name, sep, target = link.rpartition(" -> ")
+        if name and target and mtime.isdigit():
+            return (name, "sym", mtime, None, target)
+
+    # Anything the splitting does not handle, like the old symlink format
+    # of bug #351814
+    match = _CONTENTS_RE.match(line)
+    if match is None:
+        return None
+    if match.group("obj") is not None:
+        base = _CONTENTS_RE.groupindex["obj"]
+        return (
+            match.group(base + 2),
+            "obj",
+            match.group(base + 4),
+            match.group(base + 3),
+            None,
+        )
+    if match.group("sym") is not None:
+        base = _CONTENTS_RE.groupindex["sym"]
+        if match.group("oldsym") is None:
+            mtime = match.group(base + 5)
+        else:
+            mtime = match.group(base + 8)
+        return (match.group(base + 2), "sym", mtime, None, match.group(base + 3))
+    base = _CONTENTS_RE.groupindex["dir"]
+    return (match.group(base + 2), match.group(base + 1), None, None, None)
+
+
+# vim: set ts=4 sw=4 tw=79:
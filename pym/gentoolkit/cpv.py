@@ -6,13 +6,14 @@
 
 """Provides attributes and methods for a category/package-version string."""
 
-__all__ = ("CPV", "compare_strs", "split_cpv")
+__all__ = ("CPV", "clear_split_cpv_cache", "compare_strs", "split_cpv", "split_cpvs")
 
 # =======
 # Imports
 # =======
 
 import re
+from itertools import islice
 
 from portage.versions import catpkgsplit, vercmp, pkgcmp
 
@@ -30,6 +31,11 @@ _pkg_re = re.compile(r"^[a-zA-Z0-9+._]+$")
 # Prefix specific revision is of the form -r0<digit>+.<digit>+
 isvalid_rev_re = re.compile(r"(\d+|0\d+\.\d+)")
 
+# Results of split_cpv, {validate: {cpv: chunks}}. The same strings are
+# split over and over while a tree is walked, so keep the most recent.
+_split_cache = {True: {}, False: {}}
+SPLIT_CACHE_SIZE = 100000
+
 # =======
 # Classes
 # =======
@@ -196,13 +202,67 @@ def split_cpv(cpv, validate=True):
 
     Modified from pkgcore.ebuild.cpv
 
+    The results are cached, the same tuple is returned for the same cpv
+    until L{SPLIT_CACHE_SIZE} newer ones pushed it out.
+
     @type cpv: str
     @param cpv: pkg, cat/pkg, pkg-ver, cat/pkg-ver
     @rtype: tuple
     @return: (category, pkg_name, version, revision)
             Each tuple element is a string or empty string ("").
+    @raise GentoolkitInvalidCPV: if cpv can not be split
+    """
+
+    cache = _split_cache[bool(validate)]
+    try:
+        return cache[cpv]
+    except KeyError:
+        pass
+    chunks = cache[cpv] = _split_cpv(cpv, validate)
+    if len(cache) > SPLIT_CACHE_SIZE:
+        # Forget the oldest
+        del cache[next(iter(cache))]
+    return chunks
+
+
+def split_cpvs(cpvs, validate=True):
+    """Split many cpvs, see L{split_cpv}.
+
+    @type cpvs: iterable
+    @param cpvs: the cpv strings
+    @rtype: list
+    @return: the (category, pkg_name, version, revision) of each cpv, in
+            the same order
+    @raise GentoolkitInvalidCPV: at the first cpv that can not be split
     """
 
+    cache = _split_cache[bool(validate)]
+    get = cache.get
+    result = []
+    append = result.append
+    for cpv in cpvs:
+        chunks = get(cpv)
+        if chunks is None:
+            chunks = cache[cpv] = _split_cpv(cpv, validate)
+        append(chunks)
+    # Trim once at the end, the loop only grows the cache
+    excess = len(cache) - SPLIT_CACHE_SIZE
+    if excess > 0:
+        for cpv in list(islice(cache, excess)):
+            del cache[cpv]
+    return result
+
+
+def clear_split_cpv_cache():
+    """Forget the cached results of L{split_cpv}."""
+
+    for cache in _split_cache.values():
+        cache.clear()
+
+
+def _split_cpv(cpv, validate):
+    """Split a cpv, uncached. See L{split_cpv}."""
+
     category = name = version = revision = ""
 
     try:
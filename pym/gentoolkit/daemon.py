@@ -0,0 +1,422 @@
+# Copyright(c) 2026, Gentoo Foundation
+#
+# Licensed under the GNU General Public License, v2
+
+"""Serve equery requests from a long-lived process with warm Portage state.
+
+Starting equery with --daemon imports Portage, builds the package settings
+and the cat/pkg indexes once, and then listens on a Unix socket. For every
+request it forks a child which inherits that warm state, takes over the
+client's stdin, stdout and stderr (passed over the socket) and runs
+equery as usual. Forking keeps the module-level option dicts of each
+equery module private to one request.
+
+The daemon restarts itself as soon as the VDB, a repository or the Portage
+configuration is modified, so it never answers from stale databases.
+
+bin/equery only imports this module (and no Portage) before trying to
+reach a daemon. When none is running, or it cannot serve the request, it
+runs equery in-process as before.
+
+The socket is $EQUERY_SOCKET, or equery-UID.socket in $XDG_RUNTIME_DIR (or the
+temporary directory). Setting EQUERY_SOCKET to an empty string disables
+the client.
+"""
+
+__all__ = ("get_socket_path", "run", "run_client", "serve")
+__docformat__ = "epytext"
+
+# =======
+# Imports
+# =======
+
+import array
+import json
+import os
+import signal
+import socket
+import struct
+import sys
+import tempfile
+
+# =======
+# Globals
+# =======
+
+# The client's view of these must match the daemon's, else it would answer
+# for another system or configuration.
+ENV_KEYS = (
+    "ACCEPT_KEYWORDS",
+    "EPREFIX",
+    "PORTAGE_CONFIGROOT",
+    "PORTAGE_REPOSITORIES",
+    "PORTDIR",
+    "PORTDIR_OVERLAY",
+    "ROOT",
+    "SYSROOT",
+    "USE",
+)
+
+# Reply sent when the client should run the request itself
+RETRY = b"retry"
+
+# Seconds a child gets to exit after the client was interrupted
+INTERRUPT_TIMEOUT = 5
+
+# Seconds a client gets to send its request, nobody else is served meanwhile
+REQUEST_TIMEOUT = 2
+
+_FD_BYTES = array.array("i", [0, 0, 0]).itemsize * 3
+
+# =========
+# Functions
+# =========
+
+
+def get_socket_path():
+    """Return the path of the daemon socket, or None if disabled."""
+
+    path = os.environ.get("EQUERY_SOCKET")
+    if path is not None:
+        return path or None
+    runtime_dir = os.environ.get("XDG_RUNTIME_DIR") or tempfile.gettempdir()
+    return os.path.join(runtime_dir, "equery-%d.socket" % os.getuid())
+
+
+def run(argv):
+    """Run equery in this process.
+
+    @type argv: list
+    @param argv: sys.argv style arguments
+    @rtype: int
+    @return: the exit status
+    """
+
+    from gentoolkit import equery, errors
+
+    try:
+        equery.main(argv)
+    except errors.GentoolkitNonZeroExit as err:
+        return err.return_code
+    except errors.GentoolkitException as err:
+        if "--debug" in argv or bool(os.getenv("DEBUG", False)):
+            raise
+        else:
+            from gentoolkit import pprinter as pp
+
+            sys.stderr.write(pp.error(str(err)))
+            if err.is_serious:
+                print()
+                print("Add '--debug' to global options for traceback.")
+            return 1
+    return 0
+
+
+def run_client(argv):
+    """Pass a request to a running daemon.
+
+    @type argv: list
+    @param argv: sys.argv style arguments
+    @rtype: int or None
+    @return: the exit status, or None if the request must be run in-process
+    """
+
+    path = get_socket_path()
+    if path is None or "--daemon" in argv or not os.path.exists(path):
+        return None
+
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.settimeout(1)
+        sock.connect(path)
+        sock.settimeout(None)
+
+        request = {"argv": argv, "cwd": os.getcwd(), "env": dict(os.environ)}
+        fds = array.array("i", [0, 1, 2])
+        sys.stdout.flush()
+        sys.stderr.flush()
+        sock.sendmsg(
+            [json.dumps(request).encode("utf_8") + b"\n"],
+            [(socket.SOL_SOCKET, socket.SCM_RIGHTS, fds)],
+        )
+    except OSError:
+        sock.close()
+        return None
+
+    # From here on the daemon has our stdio, running the request again
+    # would repeat its output
+    try:
+        reply = _wait_for_status(sock)
+    finally:
+        sock.close()
+
+    if reply == RETRY:
+        return None
+    try:
+        return int(reply)
+    except (TypeError, ValueError):
+        sys.stderr.write("equery: the daemon did not finish the request\n")
+        return 1
+
+
+def _wait_for_status(sock):
+    """Read the reply to a request, passing an interrupt on to the child
+    running it.
+
+    @rtype: bytes
+    @return: the exit status or L{RETRY}, None if the connection broke
+    """
+
+    with sock.makefile("rb") as replies:
+        pid = None
+        try:
+            for reply in replies:
+                reply = reply.strip()
+                if not reply.startswith(b"pid "):
+                    return reply
+                pid = int(reply[4:])
+            return None
+        except OSError:
+            return None
+        except (KeyboardInterrupt, SystemExit):
+            # bin/equery turns ^C into SystemExit
+            if pid is None:
+                raise
+        os.kill(pid, signal.SIGINT)
+        try:
+            # Let it finish writing to the terminal before we return
+            sock.settimeout(INTERRUPT_TIMEOUT)
+            replies.read()
+        except OSError:
+            os.kill(pid, signal.SIGKILL)
+    return b"1"
+
+
+def serve(path=None):
+    """Serve equery requests until killed.
+
+    @type path: str
+    @param path: socket path, defaults to L{get_socket_path}
+    """
+
+    if path is None:
+        path = get_socket_path()
+    if path is None:
+        sys.stderr.write("equery: no daemon socket configured\n")
+        sys.exit(2)
+
+    signature = _warm()
+
+    if os.path.exists(path):
+        os.unlink(path)
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    old_umask = os.umask(0o077)
+    try:
+        server.bind(path)
+    finally:
+        os.umask(old_umask)
+    server.listen(64)
+
+    # Children report their own exit status, nobody needs to wait for them
+    signal.signal(signal.SIGCHLD, signal.SIG_IGN)
+
+    try:
+        while True:
+            conn = server.accept()[0]
+            if _get_signature() != signature:
+                # Let the client answer this one, and come back fresh
+                _send_line(conn, RETRY)
+                conn.close()
+                server.close()
+                os.unlink(path)
+                sys.stdout.flush()
+                os.execv(sys.executable, [sys.executable] + sys.argv)
+            _handle(conn)
+    finally:
+        if os.path.exists(path):
+            os.unlink(path)
+
+
+def _handle(conn):
+    """Fork a child to run one request."""
+
+    try:
+        conn.settimeout(REQUEST_TIMEOUT)
+        request, fds = _receive_request(conn)
+        conn.settimeout(None)
+    except OSError:
+        conn.close()
+        return
+
+    if request is None or not _can_serve(conn, request):
+        for fd in fds:
+            os.close(fd)
+        _send_line(conn, RETRY)
+        conn.close()
+        return
+
+    sys.stdout.flush()
+    sys.stderr.flush()
+    pid = os.fork()
+    if pid:
+        for fd in fds:
+            os.close(fd)
+        conn.close()
+        return
+
+    status = 1
+    try:
+        signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+        signal.signal(signal.SIGPIPE, signal.SIG_DFL)
+        signal.signal(signal.SIGINT, signal.default_int_handler)
+        # For the client to pass ^C on
+        _send_line(conn, b"pid %d" % os.getpid())
+        for target, fd in enumerate(fds):
+            os.dup2(fd, target)
+            os.close(fd)
+        os.chdir(request["cwd"])
+        os.environ.clear()
+        os.environ.update(request["env"])
+
+        from gentoolkit import CONFIG
+
+        CONFIG["piping"] = not sys.stdout.isatty()
+
+        try:
+            status = run(request["argv"])
+        except SystemExit as err:
+            if err.code is None:
+                status = 0
+            elif isinstance(err.code, int):
+                status = err.code
+            else:
+                sys.stderr.write("%s\n" % err.code)
+                status = 1
+    except KeyboardInterrupt:
+        print()
+        status = 1
+    except BaseException:
+        import traceback
+
+        traceback.print_exc()
+    finally:
+        try:
+            sys.stdout.flush()
+            sys.stderr.flush()
+            _send_line(conn, str(status).encode("ascii"))
+        finally:
+            os._exit(status)
+
+
+def _can_serve(conn, request):
+    """Return True if the request comes from our user and environment."""
+
+    if hasattr(socket, "SO_PEERCRED"):
+        creds = conn.getsockopt(
+            socket.SOL_SOCKET, socket.SO_PEERCRED, struct.calcsize("3i")
+        )
+        uid = struct.unpack("3i", creds)[1]
+        if uid != os.getuid():
+            return False
+
+    env = request["env"]
+    return all(env.get(x) == os.environ.get(x) for x in ENV_KEYS)
+
+
+def _receive_request(conn):
+    """Read a request and the client's stdio file descriptors.
+
+    @rtype: tuple
+    @return: (request dict or None, list of fds)
+    @raise OSError: if nothing could be received
+    """
+
+    fds = array.array("i")
+    data, ancdata, flags, addr = conn.recvmsg(4096, socket.CMSG_LEN(_FD_BYTES))
+    for level, kind, cmsg_data in ancdata:
+        if level == socket.SOL_SOCKET and kind == socket.SCM_RIGHTS:
+            usable = len(cmsg_data) - (len(cmsg_data) % fds.itemsize)
+            fds.frombytes(cmsg_data[:usable])
+
+    try:
+        while data and not data.endswith(b"\n"):
+            chunk = conn.recv(4096)
+            if not chunk:
+                break
+            data += chunk
+    except OSError:
+        # Timed out, the fds are closed by the caller
+        return None, list(fds)
+
+    if len(fds) != 3 or not data.endswith(b"\n"):
+        return None, list(fds)
+    try:
+        return json.loads(data.decode("utf_8")), list(fds)
+    except ValueError:
+        return None, list(fds)
+
+
+def _send_line(conn, data):
+    try:
+        conn.sendall(data + b"\n")
+    except OSError:
+        pass
+
+
+def _warm():
+    """Load everything a request can share, and return the state signature."""
+
+    from gentoolkit import helpers
+
+    # Everything equery modules need apart from the modules themselves, whose
+    # option dicts are filled in at import time from the request's options.
+    for name in ("dependencies", "equery", "metadata", "package", "query"):
+        __import__("gentoolkit." + name)
+    from gentoolkit.sets import get_available_sets
+
+    # Take the signature first, so that changes made while warming up cause
+    # a restart instead of being missed.
+    signature = _get_signature()
+
+    for tree in ("porttree", "vartree"):
+        helpers.get_cp_index(tree)
+    get_available_sets()
+
+    return signature
+
+
+def _get_signature():
+    """Return the mtimes of the databases and config the daemon relies on.
+
+    Adding a package changes the mtime of its category directory only, so
+    the directory of every category in every repository is included.
+    Portage bumps the VDB directory itself for each merge.
+    """
+
+    import portage
+    from portage.const import VDB_PATH
+
+    settings = portage.settings
+    paths = [
+        os.path.join(settings["EROOT"], VDB_PATH),
+        os.path.join(settings["PORTAGE_CONFIGROOT"], "etc", "portage"),
+        os.path.join(settings["PORTAGE_CONFIGROOT"], "etc", "portage", "make.conf"),
+        os.path.join(settings["PORTAGE_CONFIGROOT"], "etc", "portage", "make.profile"),
+    ]
+    for repo in portage.db[portage.root]["porttree"].dbapi.porttrees:
+        paths.append(repo)
+        paths.append(os.path.join(repo, "profiles"))
+        paths.append(os.path.join(repo, "metadata", "timestamp.chk"))
+        paths.append(os.path.join(repo, "profiles", "categories"))
+        paths.extend(os.path.join(repo, x) for x in settings.categories)
+
+    result = []
+    for path in paths:
+        try:
+            result.append(os.stat(path).st_mtime_ns)
+        except OSError:
+            result.append(None)
+    return tuple(result)
+
+
+# vim: set ts=4 sw=4 tw=79:
@@ -24,6 +24,7 @@ import portage
 from portage.output import white, yellow, turquoise, green
 
 import gentoolkit.pprinter as pp
+from gentoolkit import instrument
 from gentoolkit.eclean.search import (
     DistfilesSearch,
     findPackages,
@@ -210,6 +211,17 @@ def printUsage(_error=None, help=None):
             + "d (days) and h (hours).",
             file=out,
         )
+        print(
+            yellow(" --profile=<path>")
+            + "          - write cProfile statistics to "
+            + yellow("<path>"),
+            file=out,
+        )
+        print(
+            yellow(" --timings")
+            + "                 - print time spent per phase to stderr",
+            file=out,
+        )
         print(
             yellow(" -h, --help") + "                - display the help screen",
             file=out,
@@ -399,6 +411,10 @@ def parseArgs(options={}):
                 options["ignore-failure"] = True
             elif o in ("--unique-use"):
                 options["unique-use"] = True
+            elif o == "--profile":
+                instrument.configure(profile=a)
+            elif o == "--timings":
+                instrument.configure(timings=True)
             else:
                 return_code = False
         # sanity check of --deep only options:
@@ -434,6 +450,8 @@ def parseArgs(options={}):
         "help",
         "version",
         "verbose",
+        "profile=",
+        "timings",
     ]
     getopt_options["short"]["distfiles"] = "fs:"
     getopt_options["long"]["distfiles"] = ["fetch-restricted", "size-limit="]
@@ -526,33 +544,34 @@ def doAction(action, options, exclude={}, output=None):
     # find files to delete, depending on the action
     if not options["quiet"]:
         output.einfo("Building file list for " + action + " cleaning...")
-    if action == "packages":
-        clean_me = findPackages(
-            options,
-            exclude=exclude,
-            destructive=options["destructive"],
-            package_names=options["package-names"],
-            time_limit=options["time-limit"],
-            pkgdir=pkgdir,
-            # port_dbapi=Dbapi(portage.db[portage.root]["porttree"].dbapi),
-            # var_dbapi=Dbapi(portage.db[portage.root]["vartree"].dbapi),
-        )
-    else:
-        # accept defaults
-        engine = DistfilesSearch(
-            output=options["verbose-output"],
-            # portdb=Dbapi(portage.db[portage.root]["porttree"].dbapi),
-            # var_dbapi=Dbapi(portage.db[portage.root]["vartree"].dbapi),
-        )
-        clean_me, saved, deprecated = engine.findDistfiles(
-            exclude=exclude,
-            destructive=options["destructive"],
-            fetch_restricted=options["fetch-restricted"],
-            package_names=options["package-names"],
-            time_limit=options["time-limit"],
-            size_limit=options["size-limit"],
-            deprecate=options["deprecated"],
-        )
+    with instrument.phase("search " + files_type):
+        if action == "packages":
+            clean_me = findPackages(
+                options,
+                exclude=exclude,
+                destructive=options["destructive"],
+                package_names=options["package-names"],
+                time_limit=options["time-limit"],
+                pkgdir=pkgdir,
+                # port_dbapi=Dbapi(portage.db[portage.root]["porttree"].dbapi),
+                # var_dbapi=Dbapi(portage.db[portage.root]["vartree"].dbapi),
+            )
+        else:
+            # accept defaults
+            engine = DistfilesSearch(
+                output=options["verbose-output"],
+                # portdb=Dbapi(portage.db[portage.root]["porttree"].dbapi),
+                # var_dbapi=Dbapi(portage.db[portage.root]["vartree"].dbapi),
+            )
+            clean_me, saved, deprecated = engine.findDistfiles(
+                exclude=exclude,
+                destructive=options["destructive"],
+                fetch_restricted=options["fetch-restricted"],
+                package_names=options["package-names"],
+                time_limit=options["time-limit"],
+                size_limit=options["size-limit"],
+                deprecate=options["deprecated"],
+            )
 
     # initialize our cleaner
     cleaner = CleanUp(output.progress_controller)
@@ -566,12 +585,13 @@ def doAction(action, options, exclude={}, output=None):
         elif not options["quiet"]:
             output.einfo("Cleaning " + files_type + "...")
         # do the cleanup, and get size of deleted files
-        if options["pretend"]:
-            clean_size = cleaner.pretend_clean(clean_me)
-        elif action in ["distfiles"]:
-            clean_size = cleaner.clean_dist(clean_me)
-        elif action in ["packages"]:
-            clean_size = cleaner.clean_pkgs(clean_me, pkgdir)
+        with instrument.phase("clean " + files_type):
+            if options["pretend"]:
+                clean_size = cleaner.pretend_clean(clean_me)
+            elif action in ["distfiles"]:
+                clean_size = cleaner.clean_dist(clean_me)
+            elif action in ["packages"]:
+                clean_size = cleaner.clean_pkgs(clean_me, pkgdir)
         # vocabulary for final message
         if options["pretend"]:
             verb = "would be"
@@ -676,7 +696,8 @@ def main():
         )
         sys.exit(1)
     # execute action
-    doAction(action, options, exclude=exclude, output=output)
+    with instrument.session("eclean " + action):
+        doAction(action, options, exclude=exclude, output=output)
 
 
 if __name__ == "__main__":
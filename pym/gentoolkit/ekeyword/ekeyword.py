@@ -34,21 +34,26 @@ Examples:
 
   # Mark s390 as the same state as amd64.
   $ %(prog)s s390=amd64 foo-1.ebuild
+
+  # Mark riscv as unstable for all ebuilds stable on amd64 but not on riscv.
+  $ %(prog)s --query 'amd64 & !?riscv' ~riscv
 """
 
 import argparse
 import collections
+import contextlib
 import difflib
+import functools
 import io
 import os
 import re
+import shutil
 import subprocess
 import sys
 
-from gentoolkit.profile import load_profile_data
-
-import portage
-from portage.output import colorize, nocolor
+# portage, and the gentoolkit modules using it, are imported where they are
+# needed: merge-driver-ekeyword uses the keyword functions without them, as
+# importing portage takes longer than the rest of a merge.
 
 
 __version__ = "git"
@@ -64,6 +69,9 @@ __version__ = "git"
 #  ref_arch: Set |arch| status to this arch (ignoring |op|)
 Op = collections.namedtuple("Op", ("op", "arch", "ref_arch"))
 
+# Fewer ebuilds than this per worker process are processed serially.
+MIN_SHARD_SIZE = 50
+
 
 def warning(msg):
     """Write |msg| as a warning to stderr"""
@@ -134,6 +142,9 @@ def diff_keywords(old_keywords, new_keywords, style="color-inline"):
       A string containing the diff output ready to shown to the user
     """
 
+    if style == "color-inline":
+        from portage.output import colorize
+
     def show_diff(s):
         output = ""
 
@@ -371,15 +382,107 @@ def process_ebuild(
             style=style,
         )
         if updated and not dry_run:
-            with io.open(ebuild, "w", encoding="utf8") as f:
-                f.writelines(content)
+            write_ebuild(ebuild, content)
             if manifest:
                 subprocess.check_call(["ebuild", ebuild, "manifest"])
     return updated
 
 
+def write_ebuild(ebuild, content):
+    """Replace |ebuild| with the lines in |content|
+
+    The new content is written to a temporary file next to it first, so
+    the ebuild is never seen half written.  A symlink is followed, not
+    replaced.
+    """
+    ebuild = os.path.realpath(ebuild)
+    tmp = os.path.join(
+        os.path.dirname(ebuild), ".%s.%d" % (os.path.basename(ebuild), os.getpid())
+    )
+    try:
+        with io.open(tmp, "w", encoding="utf8") as f:
+            f.writelines(content)
+        shutil.copymode(ebuild, tmp)
+        os.replace(tmp, ebuild)
+    except BaseException:
+        with contextlib.suppress(OSError):
+            os.unlink(tmp)
+        raise
+
+
+def process_ebuilds(
+    work,
+    arch_status=None,
+    verbose=0,
+    quiet=0,
+    dry_run=False,
+    style="color-inline",
+    manifest=False,
+    jobs=1,
+):
+    """Process a list of ebuilds like process_ebuild
+
+    With |jobs| > 1 and enough ebuilds, they are processed in that many
+    worker processes.  Their output is shown in the order of |work| all
+    the same.  The Manifest is regenerated once per package directory,
+    after all its ebuilds were updated.
+
+    Args:
+      work: A list of (ebuild, ops) pairs, see args_to_work
+      jobs: The number of worker processes
+      The others are those of process_ebuild
+
+    Returns:
+      Whether any updates were processed, per ebuild
+    """
+    kwargs = {
+        "arch_status": arch_status,
+        "verbose": verbose,
+        "quiet": quiet,
+        "dry_run": dry_run,
+        "style": style,
+    }
+    from gentoolkit.helpers import fork_map
+
+    results = fork_map(
+        functools.partial(_process_ebuild_quietly, kwargs=kwargs),
+        work,
+        jobs,
+        MIN_SHARD_SIZE,
+    )
+    if results is None:
+        updated = [process_ebuild(ebuild, ops, **kwargs) for ebuild, ops in work]
+    else:
+        updated = []
+        for result, output in results:
+            sys.stdout.write(output)
+            updated.append(result)
+        sys.stdout.flush()
+
+    if manifest and not dry_run:
+        # One ebuild of each package directory to regenerate the Manifest with
+        packages = {}
+        for (ebuild, _ops), result in zip(work, updated):
+            if result:
+                packages.setdefault(os.path.dirname(os.path.abspath(ebuild)), ebuild)
+        for ebuild in packages.values():
+            subprocess.check_call(["ebuild", ebuild, "manifest"])
+    return updated
+
+
+def _process_ebuild_quietly(item, kwargs):
+    """Run process_ebuild in a worker, returning its output with the result"""
+    ebuild, ops = item
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output):
+        updated = process_ebuild(ebuild, ops, **kwargs)
+    return updated, output.getvalue()
+
+
 def portage_settings():
     """Return the portage settings we care about."""
+    import portage
+
     # Portage creates the db member on the fly which confuses the linter.
     return portage.db[portage.root]["vartree"].settings
 
@@ -461,6 +564,12 @@ def get_parser():
         action="store_true",
         help="Run `ebuild manifest` on the ebuild after modifying it",
     )
+    parser.add_argument(
+        "--jobs",
+        default=os.cpu_count() or 1,
+        type=int,
+        help="Number of processes to process many ebuilds with",
+    )
     parser.add_argument(
         "-n",
         "--dry-run",
@@ -489,6 +598,15 @@ def get_parser():
         choices=("auto", "color-inline", "inline", "short-multi", "long-multi"),
         help="Select output format for showing differences",
     )
+    parser.add_argument(
+        "--query",
+        help="Process the ebuilds of the repository whose KEYWORDS match QUERY, "
+        "e.g. 'amd64 & !arm64' (see gentoolkit.keywordmatrix)",
+    )
+    parser.add_argument(
+        "--repo",
+        help="The repository to --query, defaults to the main one",
+    )
     parser.add_argument(
         "-V",
         "--version",
@@ -518,7 +636,7 @@ def main(argv):
             else:
                 parse_args.append(arg)
             # Handle flags that take arguments.
-            if arg in ("--format",):
+            if arg in ("--format", "--jobs", "--query", "--repo"):
                 if argv:
                     parse_args.append(argv.pop(0))
         elif len(arg) == 2 and arg[0] == "-":
@@ -526,6 +644,11 @@ def main(argv):
         else:
             work_args.append(arg)
 
+    from portage.output import nocolor
+
+    from gentoolkit.keywordmatrix import KeywordMatrix
+    from gentoolkit.profile import load_profile_data
+
     parser = get_parser()
     opts = parser.parse_args(parse_args)
     if not work_args:
@@ -539,22 +662,34 @@ def main(argv):
             opts.style = "color-inline"
 
     arch_status = load_profile_data()
+    if opts.query:
+        repo = opts.repo or portage_settings().repositories.mainRepoLocation()
+        matrix = KeywordMatrix(repo, arches=arch_status or None).load()
+        try:
+            ebuilds = matrix.ebuilds(matrix.query(opts.query))
+        except ValueError as e:
+            parser.error(e)
+        if not ebuilds:
+            if not opts.quiet:
+                warning("no ebuilds match %s" % opts.query)
+            return os.EX_OK
+        # The ops apply to every ebuild after them
+        work_args += ebuilds
     try:
         work = args_to_work(work_args, arch_status=arch_status, quiet=opts.quiet)
     except ValueError as e:
         parser.error(e)
 
-    for ebuild, ops in work:
-        process_ebuild(
-            ebuild,
-            ops,
-            arch_status=arch_status,
-            verbose=opts.verbose,
-            quiet=opts.quiet,
-            dry_run=opts.dry_run,
-            style=opts.style,
-            manifest=opts.manifest,
-        )
+    process_ebuilds(
+        work,
+        arch_status=arch_status,
+        verbose=opts.verbose,
+        quiet=opts.quiet,
+        dry_run=opts.dry_run,
+        style=opts.style,
+        manifest=opts.manifest,
+        jobs=opts.jobs,
+    )
 
     return os.EX_OK
 
@@ -339,6 +339,60 @@ class TestProcessEbuild(unittest.TestCase):
         self.assertEqual(m.call_count, 0)
 
 
+class TestProcessEbuilds(unittest.TestCase):
+    """Tests for process_ebuilds"""
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        with open(os.path.join(TESTDIR, "process-1.ebuild")) as f:
+            self.orig_content = f.read()
+        self.work = []
+        for pn in ("foo", "bar"):
+            os.mkdir(os.path.join(self.tmpdir.name, pn))
+            for pv in range(4):
+                ebuild = os.path.join(self.tmpdir.name, pn, "%s-%d.ebuild" % (pn, pv))
+                with open(ebuild, "w") as f:
+                    f.write(self.orig_content)
+                ops = (ekeyword.Op("~" if pv % 2 else None, "arm", None),)
+                self.work.append((ebuild, ops))
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def _contents(self):
+        contents = []
+        for ebuild, _ops in self.work:
+            with open(ebuild) as f:
+                contents.append(f.read())
+        return contents
+
+    def testParallel(self):
+        """Verify worker processes give the same results as one"""
+        with mock.patch.object(ekeyword, "MIN_SHARD_SIZE", 1):
+            updated = ekeyword.process_ebuilds(self.work, quiet=2, jobs=2)
+        parallel = self._contents()
+        for ebuild, _ops in self.work:
+            with open(ebuild, "w") as f:
+                f.write(self.orig_content)
+        self.assertEqual(ekeyword.process_ebuilds(self.work, quiet=2), updated)
+        self.assertEqual(self._contents(), parallel)
+        self.assertEqual(updated, [False, True] * 4)
+        # No temporary files left behind
+        self.assertEqual(len(os.listdir(os.path.dirname(self.work[0][0]))), 4)
+
+    def testManifestGrouped(self):
+        """Verify `ebuild ... manifest` runs once per package directory"""
+        with mock.patch.object(subprocess, "check_call") as m:
+            ekeyword.process_ebuilds(self.work, quiet=2, manifest=True)
+        self.assertEqual(
+            m.call_args_list,
+            [
+                mock.call(["ebuild", self.work[1][0], "manifest"]),
+                mock.call(["ebuild", self.work[5][0], "manifest"]),
+            ],
+        )
+
+
 class TestArgToOps(unittest.TestCase):
     """Tests for arg_to_op()"""
 
@@ -34,6 +34,7 @@ import portage
 
 import gentoolkit as gen
 from gentoolkit import errors
+from gentoolkit import instrument
 from gentoolkit import pprinter as pp
 from gentoolkit.base import (
     initialize_configuration,
@@ -71,7 +72,17 @@ def main():
     """Parse input and run the program."""
 
     short_opts = "hqCNV"
-    long_opts = ("help", "quiet", "nocolor", "no-color", "no-pipe", "version", "debug")
+    long_opts = (
+        "help",
+        "quiet",
+        "nocolor",
+        "no-color",
+        "no-pipe",
+        "version",
+        "debug",
+        "profile=",
+        "timings",
+    )
 
     initialize_configuration()
 
@@ -106,8 +117,12 @@ def main():
         sys.exit(2)
 
     try:
-        loaded_module = __import__(expanded_module_name, globals(), locals(), [], 1)
-        loaded_module.main(module_args)
+        with instrument.session("enalyze " + expanded_module_name):
+            with instrument.phase("import module"):
+                loaded_module = __import__(
+                    expanded_module_name, globals(), locals(), [], 1
+                )
+            loaded_module.main(module_args)
     except portage.exception.AmbiguousPackageName as err:
         raise errors.GentoolkitAmbiguousPackage(err.args[0])
     except IOError as err:
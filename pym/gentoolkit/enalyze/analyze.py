@@ -8,7 +8,10 @@
 """Provides a breakdown list of USE flags or keywords used and by
 what packages according to the Installed package database"""
 
+import os
+
 import gentoolkit
+from gentoolkit import instrument
 from gentoolkit.module_base import ModuleBase
 from gentoolkit import pprinter as pp
 from gentoolkit.flag import get_installed_use, get_flags
@@ -20,12 +23,14 @@ from gentoolkit.helpers import get_installed_cpvs
 import portage
 
 
+@instrument.timed("gather USE flags")
 def gather_flags_info(
     cpvs=None,
     system_flags=None,
     include_unset=False,
     target="USE",
     use_portage=False,
+    jobs=1,
     #  override-able for testing
     _get_flags=get_flags,
     _get_used=get_installed_use,
@@ -43,6 +48,8 @@ def gather_flags_info(
     @type target: string
     @param target: the environment variable being analyzed
                     one of ["USE", "PKGUSE"]
+    @type jobs: int
+    @param jobs: number of worker processes to shard the cpvs across
     @type _get_flags: function
     @param _get_flags: ovride-able for testing,
                     defaults to gentoolkit.enalyze.lib.get_flags
@@ -61,14 +68,8 @@ def gather_flags_info(
         _get_used=get_installed_use,
     )
     flag_users = {}
-    for cpv in cpvs:
-        if cpv.startswith("virtual"):
-            continue
-        if use_portage:
-            plus, minus, unset = flags.analyse_cpv(cpv)
-        else:
-            pkg = Package(cpv)
-            plus, minus, unset = flags.analyse_pkg(pkg)
+    cpvs = [cpv for cpv in cpvs if not cpv.startswith("virtual")]
+    for cpv, (plus, minus, unset) in flags.analyse_cpvs(cpvs, use_portage, jobs):
         for flag in plus:
             if flag in flag_users:
                 flag_users[flag]["+"].append(cpv)
@@ -91,6 +92,7 @@ def gather_flags_info(
     return flag_users
 
 
+@instrument.timed("gather keywords")
 def gather_keywords_info(
     cpvs=None,
     system_keywords=None,
@@ -112,15 +114,15 @@ def gather_keywords_info(
     """
     if cpvs is None:
         cpvs = portage.db[portage.root]["vartree"].dbapi.cpv_all()
+    cpvs = [cpv for cpv in cpvs if not cpv.startswith("virtual")]
+    if use_portage:
+        inst_keywords = analyser.get_inst_keywords(cpvs)
+    else:
+        inst_keywords = (
+            (cpv, analyser.get_inst_keyword_pkg(Package(cpv))) for cpv in cpvs
+        )
     keyword_users = {}
-    for cpv in cpvs:
-        if cpv.startswith("virtual"):
-            continue
-        if use_portage:
-            keyword = analyser.get_inst_keyword_cpv(cpv)
-        else:
-            pkg = Package(cpv)
-            keyword = analyser.get_inst_keyword_pkg(pkg)
+    for cpv, keyword in inst_keywords:
         # print "returned keyword =", cpv, keyword, keyword[0]
         key = keyword[0]
         if key in ["~", "-"]:
@@ -181,6 +183,7 @@ class Analyse(ModuleBase):
             "portage": True,
             "width": 80,
             "prepend": "",
+            "jobs": os.cpu_count() or 1,
         }
         self.module_opts = {
             "-f": ("flags", "boolean", True),
@@ -199,6 +202,8 @@ class Analyse(ModuleBase):
             "--portage": ("portage", "boolean", False),
             "-W": ("width", "int", 80),
             "--width": ("width", "int", 80),
+            "-j": ("jobs", "int", None),
+            "--jobs": ("jobs", "int", None),
         }
         self.formatted_options = [
             ("  -h, --help", "Outputs this useage message"),
@@ -229,6 +234,11 @@ class Analyse(ModuleBase):
                 "  -W, --width",
                 "Format the output to wrap at 'WIDTH' ie: long line output",
             ),
+            (
+                "  -j, --jobs",
+                "Number of processes to analyze USE flags with "
+                + "(default: number of CPUs)",
+            ),
         ]
         self.formatted_args = [
             ("  use", "Causes the action to analyze the installed packages USE flags"),
@@ -249,7 +259,7 @@ class Analyse(ModuleBase):
             ("  unmask", "Causes the action to analyze the installed packages"),
             ("  ", "for those that need to be unmasked"),
         ]
-        self.short_opts = "huvpGP:W:"
+        self.short_opts = "huvpGP:W:j:"
         self.long_opts = (
             "help",
             "unset",
@@ -257,6 +267,7 @@ class Analyse(ModuleBase):
             "prefix",
             "prepend=",
             "width=",
+            "jobs=",
         )  # , "portage")
         self.need_queries = True
         self.arg_spec = "Target"
@@ -277,14 +288,15 @@ class Analyse(ModuleBase):
         query = self.main_setup(input_args)
         query = self.validate_query(query)
         self.set_quiet(quiet)
-        if query in ["use", "pkguse"]:
-            self.analyse_flags(query)
-        elif query in ["keywords"]:
-            self.analyse_keywords()
-        elif query in ["packages"]:
-            self.analyse_packages()
-        elif query in ["unmask"]:
-            self.analyse_unmask()
+        with instrument.phase("analyse " + query):
+            if query in ["use", "pkguse"]:
+                self.analyse_flags(query)
+            elif query in ["keywords"]:
+                self.analyse_keywords()
+            elif query in ["packages"]:
+                self.analyse_packages()
+            elif query in ["unmask"]:
+                self.analyse_unmask()
 
     def analyse_flags(self, target):
         """This will scan the installed packages db and analyze the
@@ -313,6 +325,7 @@ class Analyse(ModuleBase):
                 self.options["unset"],
                 target=target.upper(),
                 use_portage=self.options["portage"],
+                jobs=self.options["jobs"],
             )
         else:
             cpvs = get_installed_cpvs()
@@ -322,6 +335,7 @@ class Analyse(ModuleBase):
                 include_unset=self.options["unset"],
                 target=target.upper(),
                 use_portage=self.options["portage"],
+                jobs=self.options["jobs"],
             )
         # print flag_users
         flag_keys = sorted(flag_users)
@@ -486,8 +500,8 @@ class Analyse(ModuleBase):
         elif not self.options["quiet"]:
             print("   cat/pkg-ver                             USE Flags")
             # blankline = lambda: None
-        for cpv in cpvs:
-            (flag_plus, flag_neg, unset) = flags.analyse_cpv(cpv)
+        analysed = flags.analyse_cpvs(cpvs, jobs=self.options["jobs"])
+        for cpv, (flag_plus, flag_neg, unset) in analysed:
             if self.options["unset"]:
                 self.printer(
                     cpv, "", (sorted(flag_plus), sorted(flag_neg), sorted(unset))
@@ -0,0 +1,218 @@
+# Copyright(c) 2026, Gentoo Foundation
+#
+# Licensed under the GNU General Public License, v2
+
+"""Per package results of 'enalyze rebuild', kept between runs.
+
+Every result is stored with the COUNTER and the mtime of the package's
+VDB entry, which both change whenever it is (re)installed, and with the
+mtime and size of its ebuild and metadata cache entry in the repository.
+The whole cache is stored with a digest of the configuration the analysis
+depends on, like the system USE flags and the state of make.conf,
+/etc/portage and the profiles. A rerun only analyses the packages
+installed or changed since the last one, or all of them once that
+configuration changed.
+"""
+
+__all__ = (
+    "ResultCache",
+    "config_state",
+    "get_cache_path",
+)
+__docformat__ = "epytext"
+
+# =======
+# Imports
+# =======
+
+import hashlib
+import json
+import os
+
+import portage
+
+from gentoolkit import helpers
+
+# =======
+# Classes
+# =======
+
+
+class ResultCache:
+    """Analysis results of installed packages, validated per VDB entry.
+
+    @type path: str
+    @param path: the JSON file the results are kept in
+    @type state: object
+    @param state: JSON serializable description of the configuration the
+            results depend on, see L{config_state}
+    @type vardb: portage.dbapi.vartree.vardbapi
+    @param vardb: defaults to portage.db[portage.root]["vartree"].dbapi
+    @type portdb: portage.dbapi.porttree.portdbapi
+    @param portdb: defaults to portage.db[portage.root]["porttree"].dbapi
+    """
+
+    VERSION = 2
+
+    def __init__(self, path, state, vardb=None, portdb=None):
+        self.path = path
+        self.digest = hashlib.sha1(
+            json.dumps(state, sort_keys=True).encode("utf-8")
+        ).hexdigest()
+        self.vardb = vardb or portage.db[portage.root]["vartree"].dbapi
+        self.portdb = portdb or portage.db[portage.root]["porttree"].dbapi
+        # {cpv: [counter, mtime_ns, repository stamp, result]}
+        self.entries = {}
+        # Entries of the cpvs looked up in this run, the ones saved
+        self.current = {}
+        self.hits = 0
+        self.misses = 0
+
+    def load(self):
+        """Read the results of the last run, unless they are stale or
+        unreadable."""
+
+        try:
+            with open(self.path, encoding="utf-8") as cache:
+                data = json.load(cache)
+        except (OSError, ValueError):
+            return
+        if (
+            isinstance(data, dict)
+            and data.get("version") == self.VERSION
+            and data.get("digest") == self.digest
+        ):
+            self.entries = data.get("entries", {})
+
+    def lookup(self, cpvs):
+        """Split cpvs into the ones with a valid cached result and the
+        ones to analyse.
+
+        @type cpvs: list
+        @param cpvs: installed cat/pkg-ver strings
+        @rtype: tuple
+        @return: ({cpv: result}, [cpv, ...])
+        """
+
+        found = {}
+        missing = []
+        for cpv, (counter,) in helpers.get_installed_metadata(
+            ("COUNTER",), cpvs, self.vardb
+        ):
+            stamp = [counter, self._mtime(cpv), self._repo_stamp(cpv)]
+            entry = self.entries.get(cpv)
+            if entry is not None and entry[:3] == stamp:
+                found[cpv] = entry[3]
+                self.current[cpv] = entry
+            else:
+                missing.append(cpv)
+                self.current[cpv] = stamp + [None]
+        self.hits += len(found)
+        self.misses += len(missing)
+        return found, missing
+
+    def store(self, cpv, result):
+        """Remember the result for a cpv returned by lookup()."""
+
+        self.current[cpv][3] = result
+
+    def save(self):
+        """Write the results of the cpvs looked up in this run, dropping
+        those of packages no longer installed."""
+
+        data = {
+            "version": self.VERSION,
+            "digest": self.digest,
+            "entries": self.current,
+        }
+        helpers.write_cache_file(
+            self.path, lambda cache: json.dump(data, cache, separators=(",", ":"))
+        )
+
+    def _mtime(self, cpv):
+        try:
+            return os.stat(self.vardb.getpath(cpv)).st_mtime_ns
+        except (AttributeError, OSError):
+            return None
+
+    def _repo_stamp(self, cpv):
+        """Return the [mtime_ns, size] of the ebuild of an installed cpv and
+        of its md5-cache entry, or None if no repository has it."""
+
+        ebuild, location = self.portdb.findname2(cpv)
+        if ebuild is None:
+            return None
+        stamp = []
+        for path in (ebuild, os.path.join(location, "metadata", "md5-cache", cpv)):
+            try:
+                st = os.stat(path)
+                stamp.extend((st.st_mtime_ns, st.st_size))
+            except OSError:
+                stamp.extend((None, None))
+        return stamp
+
+
+# =========
+# Functions
+# =========
+
+
+def get_cache_path(target):
+    """Return the cache file of a rebuild target.
+
+    @type target: str
+    @param target: one of "use", "keywords"
+    @rtype: str
+    """
+
+    return helpers.get_cache_path("enalyze-rebuild-%s.json" % target)
+
+
+def config_state(settings=None):
+    """Describe the configuration files, profiles and repositories that
+    determine the USE flags of a package.
+
+    @type settings: portage.config
+    @param settings: defaults to portage.settings
+    The ebuilds themselves are checked per package by L{ResultCache}.
+    Their md5-cache entries change with the eclasses they inherit, the
+    eclasses of repositories without an md5-cache are part of the state.
+
+    @rtype: list
+    @return: [[path, mtime_ns, size], ...] of the files of make.conf,
+            /etc/portage and the profiles, and of the eclasses of
+            repositories without an md5-cache
+    """
+
+    if settings is None:
+        settings = portage.settings
+    config_root = settings["PORTAGE_CONFIGROOT"]
+    paths = [
+        os.path.join(config_root, "etc", "make.conf"),
+        os.path.join(config_root, portage.const.USER_CONFIG_PATH),
+    ]
+    paths.extend(settings.profiles)
+    for repo in settings.repositories:
+        if not os.path.isdir(os.path.join(repo.location, "metadata", "md5-cache")):
+            paths.append(os.path.join(repo.location, "eclass"))
+
+    state = []
+    for path in paths:
+        _stat_path(path, state)
+        if os.path.isdir(path):
+            for dirpath, dirnames, filenames in os.walk(path):
+                dirnames.sort()
+                for name in sorted(filenames):
+                    _stat_path(os.path.join(dirpath, name), state)
+    return state
+
+
+def _stat_path(path, state):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return
+    state.append([path, st.st_mtime_ns, st.st_size])
+
+
+# vim: set ts=4 sw=4 tw=79:
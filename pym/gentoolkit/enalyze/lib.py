@@ -8,7 +8,10 @@
 
 """Provides support functions to enalyze modules"""
 
+from functools import partial
+
 from gentoolkit import errors
+from gentoolkit.helpers import fork_map, get_installed_metadata
 from gentoolkit.keyword import reduce_keywords
 from gentoolkit.flag import (
     reduce_flags,
@@ -19,10 +22,17 @@ from gentoolkit.flag import (
     defaulted_flags,
 )
 
-# from gentoolkit.package import Package
+from gentoolkit.package import Package
 
 import portage
 
+# Fewest packages worth handing to a worker process
+MIN_SHARD_SIZE = 100
+
+# The FlagAnalyzer of a worker process, see FlagAnalyzer.analyse_cpvs()
+_shard_analyzer = None
+_shard_use_portage = False
+
 
 class FlagAnalyzer:
     """Specialty functions for analysing an installed package's
@@ -49,8 +59,20 @@ class FlagAnalyzer:
         self.get_used = _get_used
         self.filter_defaults = filter_defaults
         self.target = target
+        # A private config clone, used by worker processes
+        self.settings = None
         self.reset(system)
 
+    def use_settings(self, settings):
+        """Determine the flags with settings, a private config clone,
+        instead of the shared porttree config.
+
+        @type settings: portage.config
+        """
+        self.settings = settings
+        if self.get_flags is get_flags:
+            self.get_flags = partial(get_flags, settings=settings)
+
     def reset(self, system):
         """Resets the internal system USE flags and use_expand variables
         to the new setting. The use_expand variable is handled internally.
@@ -76,6 +98,41 @@ class FlagAnalyzer:
         iuse_defaults = defaulted_flags(_iuse)
         return self._analyse(installed, iuse, iuse_defaults)
 
+    def analyse_cpvs(self, cpvs, use_portage=True, jobs=1):
+        """Analyse many cpvs like analyse_cpv(), or analyse_pkg() if not
+        use_portage.
+
+        With jobs > 1 the cpvs are sharded across that many worker
+        processes, each of which determines the flags with its own config
+        clone instead of going through the one shared porttree config.
+
+        @type cpvs: list
+        @param cpvs: ['cat/pkg-ver', ...]
+        @type jobs: int
+        @param jobs: number of worker processes
+        @rtype: iterator
+        @return (cpv, (plus, minus, unset)) in the order of cpvs
+        """
+        cpvs = list(cpvs)
+        results = fork_map(
+            _analyse_shard_cpv,
+            cpvs,
+            jobs,
+            MIN_SHARD_SIZE,
+            initializer=_init_shard_worker,
+            initargs=(self, use_portage),
+        )
+        if results is None:
+            for cpv in cpvs:
+                yield cpv, self._analyse_one(cpv, use_portage)
+            return
+        yield from zip(cpvs, results)
+
+    def _analyse_one(self, cpv, use_portage):
+        if use_portage:
+            return self.analyse_cpv(cpv)
+        return self.analyse_pkg(Package(cpv))
+
     def _analyse(self, installed, iuse, iuse_defaults):
         """Analyzes the supplied info and returns the flag settings
         that differ from the defaults
@@ -122,7 +179,9 @@ class FlagAnalyzer:
         return pkg.environment(self.target).split()
 
     def pkg_flags(self, pkg):
-        final_use, use_expand_hidden, usemasked, useforced = get_all_cpv_use(pkg.cpv)
+        final_use, use_expand_hidden, usemasked, useforced = get_all_cpv_use(
+            pkg.cpv, self.settings
+        )
         flags = pkg.environment("IUSE", prefer_vdb=False).split()
         return filter_flags(flags, use_expand_hidden, usemasked, useforced)
 
@@ -150,6 +209,19 @@ class FlagAnalyzer:
         return _flags
 
 
+def _init_shard_worker(analyzer, use_portage):
+    """Set up a worker process of FlagAnalyzer.analyse_cpvs()."""
+
+    global _shard_analyzer, _shard_use_portage
+    analyzer.use_settings(portage.config(clone=portage.settings))
+    _shard_analyzer = analyzer
+    _shard_use_portage = use_portage
+
+
+def _analyse_shard_cpv(cpv):
+    return _shard_analyzer._analyse_one(cpv, _shard_use_portage)
+
+
 class KeywordAnalyser:
     """Specialty functions for analysing the installed package db for
     keyword useage and the packages that used them.
@@ -311,6 +383,44 @@ class KeywordAnalyser:
         used = used.split()
         return self._parse(keywords, used, pkg=pkg)
 
+    def get_inst_keywords(self, cpvs=None):
+        """Determines the installed with keywords of many packages at once
+
+        KEYWORDS and USE of all of them are read in one pass over the VDB.
+        Every package is then classified with a lookup table of the system
+        keyword in the order _parse() checks it, so only the few installed
+        with neither it nor its testing form go through determine_keyword().
+
+        @type cpvs: list
+        @param cpvs: installed CAT/PKG-VERs, defaults to all of them
+        @rtype: iterator
+        @returns (cpv, keyword) with the result of get_inst_keyword_cpv()
+        """
+        table = None
+        for cpv, (keywords, used) in get_installed_metadata(
+            ("KEYWORDS", "USE"), cpvs, self.vardb
+        ):
+            keywords = keywords.split()
+            used = used.split()
+            if table is None:
+                if not self.parse_order:
+                    self.set_order(used)
+                # {keyword: (rank, result)}
+                table = {
+                    self.keyword: (0, self.keyword),
+                    "~" + self.keyword: (1, "~" + self.keyword),
+                }
+            if self.arch not in used:
+                self.mismatched.append(cpv)
+            found = [table[kwd] for kwd in keywords if kwd in table]
+            if found:
+                yield cpv, min(found)[1]
+                continue
+            keyword = self.determine_keyword(keywords, used, cpv)
+            if not keyword:
+                raise errors.GentoolkitUnknownKeyword(cpv, " ".join(keywords), used)
+            yield cpv, keyword
+
     def _parse(self, keywords, used, pkg=None, cpv=None):
         if pkg:
             _cpv = pkg.cpv
@@ -11,8 +11,10 @@ what packages according to the Installed package database"""
 
 
 import os
+from collections import Counter
 
 import gentoolkit
+from gentoolkit import instrument
 from gentoolkit.module_base import ModuleBase
 from gentoolkit import pprinter as pp
 from gentoolkit.enalyze.lib import (
@@ -21,6 +23,7 @@ from gentoolkit.enalyze.lib import (
     FlagAnalyzer,
     KeywordAnalyser,
 )
+from gentoolkit.enalyze.cache import ResultCache, config_state, get_cache_path
 from gentoolkit.enalyze.output import RebuildPrinter
 from gentoolkit.atom import Atom
 from gentoolkit.package import Package
@@ -30,9 +33,12 @@ import portage
 from portage import _encodings, _unicode_encode
 
 
+@instrument.timed("gather USE flags")
 def cpv_all_diff_use(
     cpvs=None,
     system_flags=None,
+    jobs=1,
+    cache=None,
     #  override-able for testing
     _get_flags=get_flags,
     _get_used=get_installed_use,
@@ -47,6 +53,11 @@ def cpv_all_diff_use(
     @type: system_flags: list
     @param system_flags: the current default USE flags as defined
                     by portage.settings["USE"].split()
+    @type jobs: int
+    @param jobs: number of worker processes to shard the cpvs across
+    @type cache: gentoolkit.enalyze.cache.ResultCache
+    @param cache: optional results of the last run, only the cpvs changed
+                    since are analyzed
     @type _get_flags: function
     @param _get_flags: ovride-able for testing,
                     defaults to gentoolkit.enalyze.lib.get_flags
@@ -59,6 +70,11 @@ def cpv_all_diff_use(
     cpvs.sort()
     data = {}
     cp_counts = {}
+    # {cpv: [slot, flags]}
+    results = {}
+    todo = cpvs
+    if cache is not None:
+        results, todo = cache.lookup(cpvs)
     # pass them in to override for tests
     flags = FlagAnalyzer(
         system_flags,
@@ -67,25 +83,30 @@ def cpv_all_diff_use(
         _get_flags=_get_flags,
         _get_used=get_installed_use,
     )
-    for cpv in cpvs:
-        plus, minus, unset = flags.analyse_cpv(cpv)
-        atom = Atom("=" + cpv)
-        atom.slot = portage.db[portage.root]["vartree"].dbapi.aux_get(
-            atom.cpv, ["SLOT"]
-        )[0]
+    for cpv, (plus, minus, unset) in flags.analyse_cpvs(todo, jobs=jobs):
+        slot = portage.db[portage.root]["vartree"].dbapi.aux_get(cpv, ["SLOT"])[0]
         for flag in minus:
             plus.add("-" + flag)
-        if len(plus):
+        # sorted, so that reruns produce the same lines
+        results[cpv] = [slot, sorted(plus)]
+        if cache is not None:
+            cache.store(cpv, results[cpv])
+    for cpv in cpvs:
+        slot, use = results[cpv]
+        if use:
+            atom = Atom("=" + cpv)
+            atom.slot = slot
             if atom.cp not in data:
                 data[atom.cp] = []
             if atom.cp not in cp_counts:
                 cp_counts[atom.cp] = 0
-            atom.use = list(plus)
+            atom.use = list(use)
             data[atom.cp].append(atom)
             cp_counts[atom.cp] += 1
     return data, cp_counts
 
 
+@instrument.timed("gather keywords")
 def cpv_all_diff_keywords(
     cpvs=None,
     system_keywords=None,
@@ -93,6 +114,7 @@ def cpv_all_diff_keywords(
     #  override-able for testing
     keywords=portage.settings["ACCEPT_KEYWORDS"],
     analyser=None,
+    cache=None,
 ):
     """Analyze the installed pkgs 'keywords' for difference from ACCEPT_KEYWORDS
 
@@ -103,22 +125,43 @@ def cpv_all_diff_keywords(
                     or reports on all relevant keywords found to have been used.
     @param _get_kwds: overridable function for testing
     @param _get_used: overridable function for testing
+    @param cache: optional gentoolkit.enalyze.cache.ResultCache of the
+                    last run, only the cpvs changed since are analyzed
     @rtype dict. {keyword:{"stable":[cat/pkg-ver,...],
                                                "testing":[cat/pkg-ver,...]}
     """
     if cpvs is None:
         cpvs = portage.db[portage.root]["vartree"].dbapi.cpv_all()
+    cpvs = [cpv for cpv in cpvs if not cpv.startswith("virtual")]
+    # {cpv: [keyword, slot, mismatched]}
+    results = {}
+    todo = cpvs
+    if cache is not None:
+        results, todo = cache.lookup(cpvs)
+    if use_portage:
+        inst_keywords = analyser.get_inst_keywords(todo)
+    else:
+        inst_keywords = (
+            (cpv, analyser.get_inst_keyword_pkg(Package(cpv))) for cpv in todo
+        )
+    mismatched = set(analyser.mismatched)
+    for cpv, keyword in inst_keywords:
+        # print "returned keyword =", cpv, keyword, keyword[0]
+        slot = None
+        if keyword[0] in ["~", "-"] and keyword not in system_keywords:
+            slot = portage.db[portage.root]["vartree"].dbapi.aux_get(cpv, ["SLOT"])[0]
+        results[cpv] = [keyword, slot, False]
+        if cache is not None:
+            cache.store(cpv, results[cpv])
+    for cpv in analyser.mismatched:
+        if cpv not in mismatched:
+            results[cpv][2] = True
+    # list the mismatched ones in order, whether cached or not
+    analyser.mismatched = [cpv for cpv in cpvs if results[cpv][2]]
     keyword_users = {}
     cp_counts = {}
     for cpv in cpvs:
-        if cpv.startswith("virtual"):
-            continue
-        if use_portage:
-            keyword = analyser.get_inst_keyword_cpv(cpv)
-        else:
-            pkg = Package(cpv)
-            keyword = analyser.get_inst_keyword_pkg(pkg)
-        # print "returned keyword =", cpv, keyword, keyword[0]
+        keyword, slot, _mismatched = results[cpv]
         key = keyword[0]
         if key in ["~", "-"] and keyword not in system_keywords:
             atom = Atom("=" + cpv)
@@ -128,19 +171,12 @@ def cpv_all_diff_keywords(
                 cp_counts[atom.cp] = 0
             if key in ["~"]:
                 atom.keyword = keyword
-                atom.slot = portage.db[portage.root]["vartree"].dbapi.aux_get(
-                    atom.cpv, ["SLOT"]
-                )[0]
-                keyword_users[atom.cp].append(atom)
-                cp_counts[atom.cp] += 1
             elif key in ["-"]:
                 # print "adding cpv to missing:", cpv
                 atom.keyword = "**"
-                atom.slot = portage.db[portage.root]["vartree"].dbapi.aux_get(
-                    atom.cpv, ["SLOT"]
-                )[0]
-                keyword_users[atom.cp].append(atom)
-                cp_counts[atom.cp] += 1
+            atom.slot = slot
+            keyword_users[atom.cp].append(atom)
+            cp_counts[atom.cp] += 1
     return keyword_users, cp_counts
 
 
@@ -167,7 +203,9 @@ class Rebuild(ModuleBase):
             "pretend": False,
             "prefix": False,
             "portage": True,
-            "slot": False
+            "slot": False,
+            "jobs": os.cpu_count() or 1,
+            "cache": True,
             # "unset": False
         }
         self.module_opts = {
@@ -179,6 +217,9 @@ class Rebuild(ModuleBase):
             "--slot": ("slot", "boolean", True),
             "-v": ("verbose", "boolean", True),
             "--verbose": ("verbose", "boolean", True),
+            "-j": ("jobs", "int", None),
+            "--jobs": ("jobs", "int", None),
+            "--no-cache": ("cache", "boolean", False),
         }
         self.formatted_options = [
             ("    -h, --help", "Outputs this useage message"),
@@ -188,6 +229,10 @@ class Rebuild(ModuleBase):
             ("  ", "leading '=' and include the version"),
             ("    -s, --slot", "will atomize the package with a"),
             ("  ", "leading '=' and include the slot"),
+            ("    -j, --jobs", "number of processes to analyze USE flags with"),
+            ("  ", "(default: number of CPUs)"),
+            ("    --no-cache", "analyze all packages again, instead of only"),
+            ("  ", "the ones changed since the last run"),
         ]
         self.formatted_args = [
             (
@@ -204,8 +249,16 @@ class Rebuild(ModuleBase):
                 + "current mask status",
             ),
         ]
-        self.short_opts = "hepsv"
-        self.long_opts = ("help", "exact", "pretend", "slot", "verbose")
+        self.short_opts = "hepsvj:"
+        self.long_opts = (
+            "help",
+            "exact",
+            "pretend",
+            "slot",
+            "verbose",
+            "jobs=",
+            "no-cache",
+        )
         self.need_queries = True
         self.arg_spec = "TargetSpec"
         self.arg_options = ["use", "keywords", "unmask"]
@@ -226,12 +279,13 @@ class Rebuild(ModuleBase):
         self.options["quiet"] = quiet
         query = self.main_setup(input_args)
         query = self.validate_query(query)
-        if query in ["use"]:
-            self.rebuild_use()
-        elif query in ["keywords"]:
-            self.rebuild_keywords()
-        elif query in ["unmask"]:
-            self.rebuild_unmask()
+        with instrument.phase("rebuild " + query):
+            if query in ["use"]:
+                self.rebuild_use()
+            elif query in ["keywords"]:
+                self.rebuild_keywords()
+            elif query in ["unmask"]:
+                self.rebuild_unmask()
 
     def rebuild_use(self):
         if not self.options["quiet"]:
@@ -242,7 +296,14 @@ class Rebuild(ModuleBase):
         output = RebuildPrinter(
             "use", self.options["pretend"], self.options["exact"], self.options["slot"]
         )
-        pkgs, cp_counts = cpv_all_diff_use(system_flags=system_use)
+        cache = self.load_cache(
+            "use",
+            [system_use, portage.settings["USE_EXPAND"].split(), config_state()],
+        )
+        pkgs, cp_counts = cpv_all_diff_use(
+            system_flags=system_use, jobs=self.options["jobs"], cache=cache
+        )
+        self.save_cache(cache)
         pkg_count = len(pkgs)
         if self.options["verbose"]:
             print()
@@ -331,12 +392,17 @@ class Rebuild(ModuleBase):
 
         cpvs = portage.db[portage.root]["vartree"].dbapi.cpv_all()
         # print "Total number of installed ebuilds =", len(cpvs)
+        cache = self.load_cache(
+            "keywords", [arch, system_keywords, self.analyser.keyword]
+        )
         pkgs, cp_counts = cpv_all_diff_keywords(
             cpvs=cpvs,
             system_keywords=system_keywords,
             use_portage=self.options["portage"],
             analyser=self.analyser,
+            cache=cache,
         )
+        self.save_cache(cache)
         # print([pkgs[p][0].cpv for p in pkgs])
         pkg_keys = []
         if pkgs:
@@ -387,20 +453,70 @@ class Rebuild(ModuleBase):
     def rebuild_unmask(self):
         self.not_implemented("unmask")
 
+    def load_cache(self, target, state):
+        """Returns the ResultCache of the last run for target, or None
+        with --no-cache
+
+        @param target: string. 'use' or 'keywords'
+        @param state: the settings the results of target depend on
+        """
+        if not self.options["cache"]:
+            return None
+        cache = ResultCache(get_cache_path(target), [target, state])
+        cache.load()
+        return cache
+
+    def save_cache(self, cache):
+        if cache is None:
+            return
+        cache.save()
+        if self.options["verbose"]:
+            print()
+            print(
+                pp.emph("  -- Analyzed ")
+                + pp.number(str(cache.misses))
+                + pp.emph(" packages, ")
+                + pp.number(str(cache.hits))
+                + pp.emph(" unchanged since the last run")
+            )
+
     def save_file(self, filepath, data):
         """Writes the data to the file determined by filepath
 
+        The first line of data, the header with the date, is only
+        updated along with the entries. An up to date file is left alone.
+
         @param filepath: string. eg. '/path/to/filename'
         @param data: list of lines to write to filepath
         """
-        if not self.options["quiet"]:
+        path = _unicode_encode(filepath, encoding=_encodings["fs"])
+        try:
+            with open(path, encoding=_encodings["content"]) as current:
+                old = current.read().split("\n")
+        except OSError:
+            old = None
+        new = "\n".join(data).split("\n")
+        if old is not None:
+            # Skip the header, up to the empty line after it
+            header = data[0].count("\n") + 1
+            added = Counter(new[header:])
+            removed = Counter(old[header:])
+            added, removed = added - removed, removed - added
+            if not added and not removed:
+                if not self.options["quiet"]:
+                    print("   - Up to date: %s" % filepath)
+                return
+            if not self.options["quiet"]:
+                print(
+                    "   - Updating file: %s (%d added, %d removed entries)"
+                    % (filepath, sum(added.values()), sum(removed.values()))
+                )
+        elif not self.options["quiet"]:
             print("   - Saving file: %s" % filepath)
-        with open(
-            _unicode_encode(filepath, encoding=_encodings["fs"]),
-            mode="w",
-            encoding=_encodings["content"],
-        ) as output:
-            output.write("\n".join(data))
+        tmp = path + b".tmp"
+        with open(tmp, mode="w", encoding=_encodings["content"]) as output:
+            output.write("\n".join(new))
+        os.replace(tmp, path)
         print("   - Done")
 
 
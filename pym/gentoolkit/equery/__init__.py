@@ -4,7 +4,13 @@
 
 """Gentoo package query tool"""
 
-__all__ = ("format_options", "format_package_names", "mod_usage")
+__all__ = (
+    "filetype_record",
+    "format_options",
+    "format_package_names",
+    "mod_usage",
+    "print_record",
+)
 __docformat__ = "epytext"
 # version is dynamically set by distutils sdist
 __version__ = "git"
@@ -14,6 +20,7 @@ __version__ = "git"
 # =======
 
 import errno
+import json
 import os
 import sys
 import time
@@ -23,6 +30,7 @@ import portage
 
 from gentoolkit import CONFIG
 from gentoolkit import errors
+from gentoolkit import instrument
 from gentoolkit import pprinter as pp
 from gentoolkit.textwrap_ import TextWrapper
 
@@ -36,6 +44,17 @@ __authors__ = (
 # Globals
 # =======
 
+FORMATS = ("text", "jsonl")
+
+# CONTENTS entry types as shown to the user
+FILETYPE_NAMES = {
+    "obj": "file",
+    "dir": "dir",
+    "sym": "sym",
+    "dev": "dev",
+    "fif": "fifo",
+}
+
 NAME_MAP = {
     "b": "belongs",
     "k": "check",
@@ -76,6 +95,10 @@ def print_help(with_description=True):
                 (" -C, --no-color", "turn off colors"),
                 (" -N, --no-pipe", "turn off pipe detection"),
                 (" -V, --version", "display version info"),
+                (" --format=FMT", "output format: text (default) or jsonl"),
+                (" --profile=FILE", "write cProfile statistics to FILE"),
+                (" --timings", "print time spent per phase to stderr"),
+                (" --daemon", "serve queries from a warm background process"),
             )
         )
     )
@@ -197,6 +220,41 @@ def format_filetype(path, fdesc, show_type=False, show_md5=False, show_timestamp
     return result
 
 
+def filetype_record(path, fdesc):
+    """Describe a path for --format=jsonl output.
+
+    @type path: str
+    @param path: the path
+    @type fdesc: list
+    @param fdesc: [file_type, timestamp, MD5 sum/symlink target], see
+            L{format_filetype}
+    @rtype: dict
+    @return: {'path': path, 'type': type, ...} with 'mtime' for files and
+            symlinks, 'md5' for files and 'target' for symlinks
+    """
+
+    ftype = fdesc[0]
+    record = {"path": path, "type": FILETYPE_NAMES.get(ftype, ftype)}
+    if ftype == "obj":
+        record["mtime"] = int(fdesc[1])
+        record["md5"] = fdesc[2]
+    elif ftype == "sym":
+        record["mtime"] = int(fdesc[1])
+        record["target"] = fdesc[2].split()[0]
+
+    return record
+
+
+def print_record(record):
+    """Print one result as a line of compact JSON, for --format=jsonl.
+
+    @type record: dict
+    @param record: JSON serializable description of the result
+    """
+
+    sys.stdout.write(json.dumps(record, separators=(",", ":")) + "\n")
+
+
 def format_timestamp(timestamp):
     """Format a timestamp into, e.g., '2009-01-31 21:19:44' format"""
 
@@ -268,8 +326,7 @@ def parse_global_options(global_opts, args):
 
     need_help = False
     do_help = False
-    opts = (opt[0] for opt in global_opts)
-    for opt in opts:
+    for opt, arg in global_opts:
         if opt in ("-h", "--help"):
             if args:
                 need_help = True
@@ -285,8 +342,26 @@ def parse_global_options(global_opts, args):
         elif opt in ("-V", "--version"):
             print_version()
             sys.exit(0)
+        elif opt == "--format":
+            if arg not in FORMATS:
+                sys.stderr.write(pp.error("Unknown output format '%s'" % arg))
+                print_help(with_description=False)
+                sys.exit(2)
+            CONFIG["format"] = arg
+            if arg != "text":
+                CONFIG["color"] = 0
+                pp.output.nocolor()
         elif opt in ("--debug"):
             CONFIG["debug"] = True
+        elif opt == "--profile":
+            instrument.configure(profile=arg)
+        elif opt == "--timings":
+            instrument.configure(timings=True)
+        elif opt == "--daemon":
+            from gentoolkit import daemon
+
+            daemon.serve()
+            sys.exit(0)
     if do_help:
         print_help()
         sys.exit(0)
@@ -316,7 +391,19 @@ def main(argv):
     """Parse input and run the program."""
 
     short_opts = "hqCNV"
-    long_opts = ("help", "quiet", "nocolor", "no-color", "no-pipe", "version", "debug")
+    long_opts = (
+        "help",
+        "quiet",
+        "nocolor",
+        "no-color",
+        "no-pipe",
+        "version",
+        "debug",
+        "daemon",
+        "format=",
+        "profile=",
+        "timings",
+    )
 
     initialize_configuration()
 
@@ -330,8 +417,9 @@ def main(argv):
     # Parse global options
     need_help = parse_global_options(global_opts, args)
 
-    # verbose is shorthand for the very common 'not quiet or piping'
-    if CONFIG["quiet"] or CONFIG["piping"]:
+    # verbose is shorthand for the very common 'not quiet or piping'. Records
+    # are for programs, so they never come with headers or summaries.
+    if CONFIG["quiet"] or CONFIG["piping"] or CONFIG["format"] != "text":
         CONFIG["verbose"] = False
     else:
         CONFIG["verbose"] = True
@@ -353,8 +441,12 @@ def main(argv):
         sys.exit(2)
 
     try:
-        loaded_module = __import__(expanded_module_name, globals(), locals(), [], 1)
-        loaded_module.main(module_args)
+        with instrument.session("equery " + expanded_module_name):
+            with instrument.phase("import module"):
+                loaded_module = __import__(
+                    expanded_module_name, globals(), locals(), [], 1
+                )
+            loaded_module.main(module_args)
     except portage.exception.AmbiguousPackageName as err:
         raise errors.GentoolkitAmbiguousPackage(err.args[0])
     except IOError as err:
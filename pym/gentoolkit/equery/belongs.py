@@ -18,7 +18,14 @@ import sys
 from getopt import gnu_getopt, GetoptError
 
 import gentoolkit.pprinter as pp
-from gentoolkit.equery import format_filetype, format_options, mod_usage, CONFIG
+from gentoolkit.equery import (
+    filetype_record,
+    format_filetype,
+    format_options,
+    mod_usage,
+    print_record,
+    CONFIG,
+)
 from gentoolkit.helpers import FileOwner
 
 # =======
@@ -35,8 +42,10 @@ QUERY_OPTS = {"full_regex": False, "early_out": False, "name_only": False}
 class BelongsPrinter:
     """Outputs a formatted list of packages that claim to own a files."""
 
-    def __init__(self, verbose=True, name_only=False):
-        if verbose:
+    def __init__(self, verbose=True, name_only=False, jsonl=False):
+        if jsonl:
+            self.print_fn = self.print_record
+        elif verbose:
             self.print_fn = self.print_verbose
         else:
             self.print_fn = self.print_quiet
@@ -63,6 +72,12 @@ class BelongsPrinter:
             name = str(pkg.cpv)
         pp.uprint(pp.cpv(name), "(" + file_str + ")")
 
+    def print_record(self, pkg, cfile):
+        "Format as a JSON record."
+        record = {"cpv": pkg.cp if self.name_only else str(pkg.cpv)}
+        record.update(filetype_record(cfile, pkg.parsed_contents()[cfile]))
+        print_record(record)
+
 
 # =========
 # Functions
@@ -138,7 +153,9 @@ def main(input_args):
         pp.uprint(" * Searching for %s ... " % (pp.regexpquery(",".join(queries))))
 
     printer_fn = BelongsPrinter(
-        verbose=CONFIG["verbose"], name_only=QUERY_OPTS["name_only"]
+        verbose=CONFIG["verbose"],
+        name_only=QUERY_OPTS["name_only"],
+        jsonl=CONFIG["format"] == "jsonl",
     )
 
     find_owner = FileOwner(
@@ -19,8 +19,8 @@ import portage.checksum as checksum
 
 import gentoolkit.pprinter as pp
 from gentoolkit import errors
-from gentoolkit.equery import format_options, mod_usage, CONFIG
-from gentoolkit.query import Query
+from gentoolkit.equery import format_options, mod_usage, print_record, CONFIG
+from gentoolkit.query import Query, QueryBatch
 
 # =======
 # Globals
@@ -231,6 +231,17 @@ def checks_printer(cpv, data, verbose=True, only_failures=False):
         print("failed(%s)" % n_failed)
 
 
+def checks_record(cpv, data, only_failures=False):
+    """Output results of pkg file(s) checks as a JSON record"""
+
+    n_passed, n_checked, errs = data
+    if only_failures and n_passed == n_checked:
+        return
+    print_record(
+        {"cpv": str(cpv), "passed": n_passed, "checked": n_checked, "errors": errs}
+    )
+
+
 def parse_module_options(module_opts):
     """Parse module options and update QUERY_OPTS"""
 
@@ -265,23 +276,30 @@ def main(input_args):
         print_help()
         sys.exit(2)
 
+    batch = QueryBatch(
+        (Query(x, QUERY_OPTS["is_regex"]) for x in queries), **QUERY_OPTS
+    )
+
     first_run = True
-    for query in (Query(x, QUERY_OPTS["is_regex"]) for x in queries):
-        if not first_run:
+    for query in batch:
+        if not first_run and CONFIG["format"] == "text":
             print()
 
-        matches = query.smart_find(**QUERY_OPTS)
+        matches = batch.smart_find(query)
 
         if not matches:
             raise errors.GentoolkitNoMatches(query, in_installed=True)
 
         matches.sort()
 
-        printer = partial(
-            checks_printer,
-            verbose=CONFIG["verbose"],
-            only_failures=QUERY_OPTS["only_failures"],
-        )
+        if CONFIG["format"] == "jsonl":
+            printer = partial(checks_record, only_failures=QUERY_OPTS["only_failures"])
+        else:
+            printer = partial(
+                checks_printer,
+                verbose=CONFIG["verbose"],
+                only_failures=QUERY_OPTS["only_failures"],
+            )
         check = VerifyContents(printer_fn=printer)
         check(matches)
 
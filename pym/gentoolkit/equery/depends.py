@@ -15,7 +15,7 @@ from getopt import gnu_getopt, GetoptError
 
 import gentoolkit.pprinter as pp
 from gentoolkit.dependencies import Dependencies
-from gentoolkit.equery import format_options, mod_usage, CONFIG
+from gentoolkit.equery import format_options, mod_usage, print_record, CONFIG
 from gentoolkit.helpers import get_cpvs, get_installed_cpvs
 from gentoolkit.cpv import CPV
 
@@ -37,8 +37,9 @@ QUERY_OPTS = {
 class DependPrinter:
     """Output L{gentoolkit.dependencies.Dependencies} objects."""
 
-    def __init__(self, verbose=True):
+    def __init__(self, verbose=True, jsonl=False):
         self.verbose = verbose
+        self.jsonl = jsonl
 
         if verbose:
             self.print_fn = self.print_verbose
@@ -46,7 +47,10 @@ class DependPrinter:
             self.print_fn = self.print_quiet
 
     def __call__(self, dep, dep_is_displayed=False):
-        self.format_depend(dep, dep_is_displayed)
+        if self.jsonl:
+            self.print_record(dep)
+        else:
+            self.format_depend(dep, dep_is_displayed)
 
     @staticmethod
     def print_verbose(indent, cpv, use_conditional, depatom):
@@ -61,6 +65,20 @@ class DependPrinter:
 
         pp.uprint(indent + cpv)
 
+    @staticmethod
+    def print_record(dep):
+        """Prints a dependency as a JSON record."""
+
+        mdep = dep.matching_dep
+        print_record(
+            {
+                "cpv": str(dep.cpv),
+                "depth": getattr(dep, "depth", 0),
+                "atom": str(mdep),
+                "use_conditional": (mdep.use_conditional or "").split(),
+            }
+        )
+
     def format_depend(self, dep, dep_is_displayed):
         """Format a dependency for printing.
 
@@ -180,12 +198,14 @@ def main(input_args):
     # Output
     #
 
-    dep_print = DependPrinter(verbose=CONFIG["verbose"])
+    dep_print = DependPrinter(
+        verbose=CONFIG["verbose"], jsonl=CONFIG["format"] == "jsonl"
+    )
 
     first_run = True
     got_match = False
     for query in queries:
-        if not first_run:
+        if not first_run and CONFIG["format"] == "text":
             print()
 
         pkg = Dependencies(query)
@@ -18,7 +18,7 @@ import portage
 
 import gentoolkit.pprinter as pp
 from gentoolkit import errors
-from gentoolkit.equery import format_options, mod_usage, CONFIG
+from gentoolkit.equery import format_options, mod_usage, print_record, CONFIG
 from gentoolkit.keyword import determine_keyword
 from gentoolkit.query import Query
 
@@ -149,16 +149,7 @@ def depgraph_printer(
         # 'NoneType' object has no attribute 'atom'
         pass
     if pkg and not no_mask:
-        mask = pkg.mask_status()
-        if not mask:
-            mask = [
-                determine_keyword(
-                    portage.settings["ARCH"],
-                    portage.settings["ACCEPT_KEYWORDS"],
-                    pkg.environment("KEYWORDS"),
-                )
-            ]
-        mask = pp.masking(mask)
+        mask = pp.masking(pkg.mask_status() or [get_keyword(pkg)])
     try:
         pp.uprint(" ".join((indent, decorator, pp.cpv(str(pkg.cpv)), atom, mask, use)))
     except AttributeError:
@@ -166,13 +157,64 @@ def depgraph_printer(
         pp.uprint("".join((indent, decorator, "(no match for %r)" % dep.atom)))
 
 
+def depgraph_record(
+    depth,
+    pkg,
+    dep,
+    root=None,
+    no_use=False,
+    no_atom=False,
+    initial_pkg=False,
+    no_mask=False,
+):
+    """Print L{gentoolkit.dependencies.Dependencies.graph_depends} results as
+    JSON records.
+
+    @type root: str
+    @param root: cpv of the package at the root of the graph
+    @see: L{depgraph_printer} for the other arguments
+    """
+
+    record = {"root": root, "depth": depth, "cpv": None}
+    if pkg is not None:
+        record["cpv"] = str(pkg.cpv)
+    if not no_atom:
+        record["atom"] = None if dep is None else str(dep)
+    if not no_use:
+        record["use"] = list(dep.use.tokens) if dep is not None and dep.use else []
+    if not no_mask:
+        record["mask"] = record["keyword"] = None
+        if pkg is not None:
+            record["mask"] = pkg.mask_status()
+            record["keyword"] = get_keyword(pkg)
+    print_record(record)
+
+
+def get_keyword(pkg):
+    """Return the keyword under which pkg is accepted.
+
+    @type pkg: L{gentoolkit.package.Package}
+    @rtype: str
+    @see: L{gentoolkit.keyword.determine_keyword}
+    """
+
+    return determine_keyword(
+        portage.settings["ARCH"],
+        portage.settings["ACCEPT_KEYWORDS"],
+        pkg.environment("KEYWORDS"),
+    )
+
+
 def make_depgraph(pkg, printer_fn):
     """Create and display depgraph for each package."""
 
-    print()
-    if CONFIG["verbose"]:
+    if CONFIG["format"] == "jsonl":
+        printer_fn = partial(printer_fn, root=str(pkg.cpv))
+    elif CONFIG["verbose"]:
+        print()
         pp.uprint(" * " + pp.subsection("dependency graph for ") + pp.cpv(str(pkg.cpv)))
     else:
+        print()
         pp.uprint("%s:" % pkg.cpv)
 
     # Print out the first package
@@ -219,7 +261,7 @@ def main(input_args):
 
     first_run = True
     for query in (Query(x) for x in queries):
-        if not first_run:
+        if not first_run and CONFIG["format"] == "text":
             print()
 
         matches = query.smart_find(**QUERY_OPTS)
@@ -229,7 +271,14 @@ def main(input_args):
 
         matches.sort()
 
-        if CONFIG["verbose"]:
+        if CONFIG["format"] == "jsonl":
+            printer = partial(
+                depgraph_record,
+                no_atom=QUERY_OPTS["no_atom"],
+                no_use=QUERY_OPTS["no_useflags"],
+                no_mask=QUERY_OPTS["no_mask"],
+            )
+        elif CONFIG["verbose"]:
             printer = partial(
                 depgraph_printer,
                 no_atom=QUERY_OPTS["no_atom"],
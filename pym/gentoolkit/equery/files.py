@@ -17,8 +17,15 @@ from getopt import gnu_getopt, GetoptError
 import portage
 
 import gentoolkit.pprinter as pp
-from gentoolkit.equery import format_filetype, format_options, mod_usage, CONFIG
-from gentoolkit.query import Query
+from gentoolkit.equery import (
+    filetype_record,
+    format_filetype,
+    format_options,
+    mod_usage,
+    print_record,
+    CONFIG,
+)
+from gentoolkit.query import Query, QueryBatch
 
 # =======
 # Globals
@@ -51,6 +58,102 @@ FILTER_RULES = (
     "fifo",
 )
 
+# (rules, PATH, CONFIG_PROTECT, CONFIG_PROTECT_MASK, ContentsFilter) of the
+# last call of filter_contents()
+_contents_filter = None
+
+# =======
+# Classes
+# =======
+
+
+class ContentsFilter:
+    """Select the entries of CONTENTS matching filter rules.
+
+    What the rules compare entries with, the directories of PATH and the
+    prefixes of CONFIG_PROTECT and CONFIG_PROTECT_MASK, is prepared once,
+    then every entry is classified once against all the rules.
+
+    @type rules: iterable
+    @param rules: names from L{FILTER_RULES}
+    """
+
+    def __init__(self, rules):
+        rules = frozenset(rules)
+        self.types = rules.intersection(("dir", "obj", "sym", "dev"))
+        if "fifo" in rules:
+            self.types |= {"fif"}
+        self.command_dirs = frozenset()
+        if "cmd" in rules:
+            self.command_dirs = frozenset(
+                os.path.normpath(x) for x in os.environ["PATH"].split(os.pathsep)
+            )
+        self.conf_paths = self.conf_mask_paths = ()
+        if "conf" in rules:
+            self.conf_paths, self.conf_mask_paths = _config_protect()
+        self.doc_paths = tuple(
+            os.path.join(os.sep, "usr", "share", x)
+            for x in ("doc", "man", "info")
+            if x in rules
+        )
+        # What an obj has to start with to be a doc or conf file
+        self.obj_paths = self.doc_paths + self.conf_paths
+        self.path = "path" in rules
+
+    def __call__(self, contents):
+        """Return a copy of contents with the matching entries only.
+
+        @type contents: dict
+        @param contents: {'path': ['filetype', ...], ...}
+        @rtype: dict
+        """
+
+        # path[: path.rfind(os.sep)] or os.sep is os.path.dirname(path) for
+        # the normalized, absolute paths of CONTENTS, only faster
+        if self.path:
+            # The directories with files in them. Those are listed in
+            # sorted order, without any directory below the last one.
+            parents = {
+                path[: path.rfind(os.sep)] or os.sep
+                for path, entry in contents.items()
+                if entry[0] != "dir"
+            }
+            items = sorted(contents.items())
+        else:
+            parents = None
+            items = contents.items()
+
+        command_dirs = self.command_dirs
+        filtered_content = {}
+        listed_dir = None
+        for path, entry in items:
+            kind = entry[0]
+            if parents is not None and kind == "dir" and path in parents:
+                if listed_dir is None or not path.startswith(listed_dir):
+                    listed_dir = path
+                    filtered_content[path] = entry
+                    continue
+            if kind in self.types:
+                filtered_content[path] = entry
+            elif kind == "obj" or kind == "sym":
+                if (
+                    command_dirs
+                    and (path[: path.rfind(os.sep)] or os.sep) in command_dirs
+                ):
+                    filtered_content[path] = entry
+                elif (
+                    kind == "obj"
+                    and path.startswith(self.obj_paths)
+                    and (
+                        path.startswith(self.doc_paths)
+                        or not path.startswith(self.conf_mask_paths)
+                    )
+                ):
+                    filtered_content[path] = entry
+
+        return filtered_content
+
+
 # =========
 # Functions
 # =========
@@ -143,80 +246,50 @@ def display_files(contents):
             )
 
 
+def display_file_records(cpv, contents):
+    """Print one JSON record per file in contents.
+
+    @type cpv: str
+    @param cpv: the package owning the files
+    @type contents: dict
+    @param contents: {'path': ['filetype', ...], ...}
+    """
+
+    for name in sorted(contents):
+        record = {"cpv": cpv}
+        record.update(filetype_record(name, contents[name]))
+        print_record(record)
+
+
 def filter_by_doc(contents, content_filter):
     """Return a copy of content filtered by documentation."""
 
-    filtered_content = {}
-    for doctype in ("doc", "man", "info"):
-        # List only files from /usr/share/{doc,man,info}
-        if doctype in content_filter:
-            docpath = os.path.join(os.sep, "usr", "share", doctype)
-            for path in contents:
-                if contents[path][0] == "obj" and path.startswith(docpath):
-                    filtered_content[path] = contents[path]
-
-    return filtered_content
+    doctypes = [x for x in ("doc", "man", "info") if x in content_filter]
+    return ContentsFilter(doctypes)(contents)
 
 
 def filter_by_command(contents):
     """Return a copy of content filtered by executable commands."""
 
-    filtered_content = {}
-    userpath = os.environ["PATH"].split(os.pathsep)
-    userpath = [os.path.normpath(x) for x in userpath]
-    for path in contents:
-        if contents[path][0] in ["obj", "sym"] and os.path.dirname(path) in userpath:
-            filtered_content[path] = contents[path]
-
-    return filtered_content
+    return ContentsFilter(["cmd"])(contents)
 
 
 def filter_by_path(contents):
     """Return a copy of content filtered by file paths."""
 
-    filtered_content = {}
-    paths = list(reversed(sorted(contents.keys())))
-    while paths:
-        basepath = paths.pop()
-        if contents[basepath][0] == "dir":
-            check_subdirs = False
-            for path in paths:
-                if contents[path][0] != "dir" and os.path.dirname(path) == basepath:
-                    filtered_content[basepath] = contents[basepath]
-                    check_subdirs = True
-                    break
-            if check_subdirs:
-                while paths and paths[-1].startswith(basepath):
-                    paths.pop()
-
-    return filtered_content
+    return ContentsFilter(["path"])(contents)
 
 
 def filter_by_conf(contents):
     """Return a copy of content filtered by configuration files."""
 
-    filtered_content = {}
-    conf_path = portage.settings["CONFIG_PROTECT"].split()
-    conf_path = tuple(os.path.normpath(x) for x in conf_path)
-    conf_mask_path = portage.settings["CONFIG_PROTECT_MASK"].split()
-    conf_mask_path = tuple(os.path.normpath(x) for x in conf_mask_path)
-    for path in contents:
-        if contents[path][0] == "obj" and path.startswith(conf_path):
-            if not path.startswith(conf_mask_path):
-                filtered_content[path] = contents[path]
-
-    return filtered_content
+    return ContentsFilter(["conf"])(contents)
 
 
 def filter_by_fifo(contents):
     """Return a copy of content filtered by fifo entries."""
 
-    filtered_content = {}
-    for path in contents:
-        if contents[path][0] in ["fif"]:
-            filtered_content[path] = contents[path]
-
-    return filtered_content
+    return ContentsFilter(["fifo"])(contents)
 
 
 def filter_contents(contents):
@@ -229,29 +302,30 @@ def filter_contents(contents):
     @return: contents with unrequested filetypes stripped
     """
 
-    if QUERY_OPTS["type_filter"]:
-        content_filter = QUERY_OPTS["type_filter"]
-    else:
+    global _contents_filter
+
+    if not QUERY_OPTS["type_filter"]:
         return contents
 
-    filtered_content = {}
-    if frozenset(("dir", "obj", "sym", "dev")).intersection(content_filter):
-        # Filter elements by type (as recorded in CONTENTS)
-        for path in contents:
-            if contents[path][0] in content_filter:
-                filtered_content[path] = contents[path]
-    if "cmd" in content_filter:
-        filtered_content.update(filter_by_command(contents))
-    if "path" in content_filter:
-        filtered_content.update(filter_by_path(contents))
-    if "conf" in content_filter:
-        filtered_content.update(filter_by_conf(contents))
-    if frozenset(("doc", "man", "info")).intersection(content_filter):
-        filtered_content.update(filter_by_doc(contents, content_filter))
-    if "fifo" in content_filter:
-        filtered_content.update(filter_by_fifo(contents))
-
-    return filtered_content
+    key = (
+        frozenset(QUERY_OPTS["type_filter"]),
+        os.environ.get("PATH"),
+        portage.settings["CONFIG_PROTECT"],
+        portage.settings["CONFIG_PROTECT_MASK"],
+    )
+    if _contents_filter is None or _contents_filter[:-1] != key:
+        _contents_filter = key + (ContentsFilter(key[0]),)
+    return _contents_filter[-1](contents)
+
+
+def _config_protect():
+    """Return the normalized prefixes of CONFIG_PROTECT and
+    CONFIG_PROTECT_MASK."""
+
+    return tuple(
+        tuple(os.path.normpath(x) for x in portage.settings[var].split())
+        for var in ("CONFIG_PROTECT", "CONFIG_PROTECT_MASK")
+    )
 
 
 def parse_module_options(module_opts):
@@ -313,12 +387,14 @@ def main(input_args):
     # Output files
     #
 
+    batch = QueryBatch((Query(x) for x in queries), **QUERY_OPTS)
+
     first_run = True
-    for query in queries:
-        if not first_run:
+    for query in batch:
+        if not first_run and CONFIG["format"] == "text":
             print()
 
-        matches = Query(query).smart_find(**QUERY_OPTS)
+        matches = batch.smart_find(query)
 
         if not matches:
             sys.stderr.write(pp.error("No matching packages found for %s" % query))
@@ -330,7 +406,10 @@ def main(input_args):
                 pp.uprint(" * Contents of %s:" % pp.cpv(str(pkg.cpv)))
 
             contents = pkg.parsed_contents()
-            display_files(filter_contents(contents))
+            if CONFIG["format"] == "jsonl":
+                display_file_records(str(pkg.cpv), filter_contents(contents))
+            else:
+                display_files(filter_contents(contents))
 
         first_run = False
 
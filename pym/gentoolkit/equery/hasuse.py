@@ -15,7 +15,7 @@ from getopt import gnu_getopt, GetoptError
 
 import gentoolkit.pprinter as pp
 from gentoolkit import errors
-from gentoolkit.equery import format_options, mod_usage, CONFIG
+from gentoolkit.equery import format_options, mod_usage, print_record, CONFIG
 from gentoolkit.package import PackageFormatter, FORMAT_TMPL_VARS
 from gentoolkit.query import Query
 
@@ -102,7 +102,12 @@ def display_useflags(query, pkg):
     if QUERY_OPTS["in_overlay"] and not QUERY_OPTS["in_porttree"]:
         if not "O" in pkgstr.location:
             return False
-    pp.uprint(pkgstr)
+    if CONFIG["format"] == "jsonl":
+        record = pkgstr.record()
+        record["query"] = query
+        print_record(record)
+    else:
+        pp.uprint(pkgstr)
 
     return True
 
@@ -165,7 +170,7 @@ def main(input_args):
     first_run = True
     got_match = False
     for query in queries:
-        if not first_run:
+        if not first_run and CONFIG["format"] == "text":
             print()
 
         if CONFIG["verbose"]:
@@ -15,10 +15,10 @@ from getopt import gnu_getopt, GetoptError
 
 import gentoolkit.pprinter as pp
 from gentoolkit import errors
-from gentoolkit.equery import format_options, mod_usage, CONFIG
+from gentoolkit.equery import format_options, mod_usage, print_record, CONFIG
 from gentoolkit.helpers import get_bintree_cpvs
 from gentoolkit.package import PackageFormatter, FORMAT_TMPL_VARS
-from gentoolkit.query import Query
+from gentoolkit.query import Query, QueryBatch
 
 # =======
 # Globals
@@ -196,15 +196,19 @@ def main(input_args):
         print_help()
         sys.exit(2)
 
+    batch = QueryBatch(
+        (Query(x, QUERY_OPTS["is_regex"]) for x in queries), **QUERY_OPTS
+    )
+
     first_run = True
-    for query in (Query(x, QUERY_OPTS["is_regex"]) for x in queries):
-        if not first_run:
+    for query in batch:
+        if not first_run and CONFIG["format"] == "text":
             print()
 
         # if we are in quiet mode, do not raise GentoolkitNoMatches exception
         # instead we raise GentoolkitNonZeroExit to exit with an exit value of 3
         try:
-            matches = query.smart_find(**QUERY_OPTS)
+            matches = batch.smart_find(query)
         except errors.GentoolkitNoMatches:
             if CONFIG["verbose"]:
                 raise
@@ -238,6 +242,19 @@ def main(input_args):
             if QUERY_OPTS["in_overlay"] and not QUERY_OPTS["in_porttree"]:
                 if not "O" in pkgstr.location:
                     continue
+            if CONFIG["format"] == "jsonl":
+                record = pkgstr.record()
+                if QUERY_OPTS["include_mask_reason"]:
+                    mask_reason = pkg.mask_reason()
+                    if mask_reason and any(mask_reason):
+                        record["mask_reason"] = {
+                            "explanation": mask_reason[0],
+                            "location": mask_reason[1],
+                        }
+                    else:
+                        record["mask_reason"] = None
+                print_record(record)
+                continue
             pp.uprint(pkgstr)
 
             if QUERY_OPTS["include_mask_reason"]:
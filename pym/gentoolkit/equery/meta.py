@@ -15,19 +15,25 @@ import os
 import sys
 from getopt import gnu_getopt, GetoptError
 
+import portage
+
 import gentoolkit.pprinter as pp
 from gentoolkit import errors
 from gentoolkit.keyword import Keyword
-from gentoolkit.equery import format_options, mod_usage, CONFIG
+from gentoolkit.maintainers import MaintainerIndex
+from gentoolkit.equery import format_options, mod_usage, print_record, CONFIG
 from gentoolkit.helpers import print_sequence, print_file
 from gentoolkit.textwrap_ import TextWrapper
+from gentoolkit.metadata import get_metadata_cache
 from gentoolkit.query import Query
+from gentoolkit.usedesc import get_use_descriptions
 
 # =======
 # Globals
 # =======
 
 QUERY_OPTS = {
+    "by_maintainer": False,
     "current": False,
     "description": False,
     "keywords": False,
@@ -81,6 +87,10 @@ def print_help(with_description=True, with_usage=True):
                 (" -k, --keywords", "show keywords for all matching package versions"),
                 (" -l, --license", "show licenses for the best maching version"),
                 (" -m, --maintainer", "show the maintainer(s) for the package"),
+                (
+                    " -M, --by-maintainer",
+                    "list the packages of the maintainer emails given as queries",
+                ),
                 (" -r, --reverse", "show the output in reverse order if applicable"),
                 (
                     " -S, --stablreq",
@@ -218,6 +228,15 @@ def format_upstream(upstream):
     return result
 
 
+def local_useflags(pkg):
+    """Get the local USE flags of a package from the shared index of
+    flag descriptions."""
+
+    return get_use_descriptions().local_flags(
+        os.path.join(pkg.package_path(), "metadata.xml")
+    )
+
+
 def format_useflags(useflags):
     """Format USE flag information for display."""
 
@@ -333,7 +352,7 @@ def call_format_functions(best_match, matches):
         print_sequence(format_list(desc))
 
     if QUERY_OPTS["useflags"]:
-        useflags = format_useflags(best_match.metadata.use())
+        useflags = format_useflags(local_useflags(best_match))
         print_sequence(format_list(useflags))
 
     if QUERY_OPTS["license"] or not got_opts:
@@ -359,6 +378,86 @@ def call_format_functions(best_match, matches):
         print_file(os.path.join(best_match.package_path(), "metadata.xml"))
 
 
+def maintainers_record(maints):
+    """Describe maintainers for machine-readable output."""
+
+    return [
+        {
+            "email": maint.email,
+            "name": maint.name,
+            "description": maint.description,
+            "restrict": maint.restrict,
+        }
+        for maint in maints
+    ]
+
+
+def call_record_functions(best_match, matches):
+    """Gather the requested information and print it as a JSON record."""
+
+    got_opts = any(QUERY_OPTS.values())
+    metadata = best_match.metadata
+    record = {"cp": best_match.cp, "repo": best_match.repo_name()}
+
+    if QUERY_OPTS["maintainer"] or not got_opts:
+        record["maintainers"] = maintainers_record(metadata.maintainers())
+
+    if QUERY_OPTS["upstream"] or not got_opts:
+        record["upstream"] = [
+            {
+                "maintainers": maintainers_record(up.maintainers),
+                "changelogs": up.changelogs,
+                "docs": [{"url": url, "lang": lang} for url, lang in up.docs],
+                "bugtrackers": up.bugtrackers,
+                "remoteids": [{"type": typ, "id": id_} for id_, typ in up.remoteids],
+            }
+            for up in metadata.upstream()
+        ]
+        record["homepage"] = best_match.environment("HOMEPAGE").split()
+
+    if not got_opts:
+        record["location"] = best_match.package_path()
+
+    if QUERY_OPTS["keywords"] or not got_opts:
+        keyword_map = filter_keywords(matches)
+        record["keywords"] = [
+            {
+                "version": match.fullversion,
+                "slot": match.environment("SLOT"),
+                "keywords": sorted(keyword_map[match], key=Keyword),
+            }
+            for match in matches
+        ]
+
+    if QUERY_OPTS["description"]:
+        record["descriptions"] = metadata.descriptions()
+
+    if QUERY_OPTS["useflags"]:
+        record["useflags"] = [
+            {"name": flag.name, "description": flag.description}
+            for flag in local_useflags(best_match)
+        ]
+
+    if QUERY_OPTS["license"] or not got_opts:
+        record["license"] = best_match.environment("LICENSE")
+
+    if QUERY_OPTS["stablereq"]:
+        stablereq_map = stablereq(matches)
+        record["stablereq"] = [
+            {
+                "version": match.fullversion,
+                "slot": match.environment("SLOT"),
+                "cc": sorted(stablereq_map[match]),
+            }
+            for match in matches
+        ]
+
+    if QUERY_OPTS["xml"]:
+        record["xml"] = os.path.join(best_match.package_path(), "metadata.xml")
+
+    print_record(record)
+
+
 def format_line(line, first="", subsequent="", force_quiet=False):
     """Wrap a string at word boundaries and optionally indent the first line
     and/or subsequent lines with custom strings.
@@ -461,6 +560,45 @@ def format_list(lst, first="", subsequent="", force_quiet=False):
     return result
 
 
+def list_by_maintainer(queries):
+    """Print the packages of all repositories maintained by the queries.
+
+    @type queries: list
+    @param queries: email addresses, their beginnings, or comma separated
+            lists of them
+    """
+
+    indexes = []
+    for repo in portage.settings.repositories:
+        indexes.append((repo.name, MaintainerIndex(repo.location).refresh()))
+
+    for query in queries:
+        found = False
+        for repo_name, index in indexes:
+            for cp in index.find(query.split(",")):
+                found = True
+                if CONFIG["format"] == "jsonl":
+                    print_record(
+                        {
+                            "cp": cp,
+                            "repo": repo_name,
+                            "maintainers": index.maintainers(cp),
+                        }
+                    )
+                elif CONFIG["verbose"]:
+                    pp.uprint(
+                        "%s::%s  %s"
+                        % (pp.cpv(cp), repo_name, ", ".join(index.maintainers(cp)))
+                    )
+                else:
+                    pp.uprint(cp)
+        if not found:
+            raise errors.GentoolkitNoMatches(query)
+
+    for repo_name, index in indexes:
+        index.save()
+
+
 def parse_module_options(module_opts):
     """Parse module options and update QUERY_OPTS"""
 
@@ -475,6 +613,8 @@ def parse_module_options(module_opts):
             QUERY_OPTS["license"] = True
         elif opt in ("-m", "--maintainer"):
             QUERY_OPTS["maintainer"] = True
+        elif opt in ("-M", "--by-maintainer"):
+            QUERY_OPTS["by_maintainer"] = True
         elif opt in ("-k", "--keywords"):
             QUERY_OPTS["keywords"] = True
         elif opt in ("-S", "--stablereq"):
@@ -490,13 +630,14 @@ def parse_module_options(module_opts):
 def main(input_args):
     """Parse input and run the program."""
 
-    short_opts = "hdHklmrSuUx"
+    short_opts = "hdHklmMrSuUx"
     long_opts = (
         "help",
         "description",
         "keywords",
         "license",
         "maintainer",
+        "by-maintainer",
         "reverse",
         "stablereq",
         "useflags",
@@ -519,6 +660,10 @@ def main(input_args):
         print_help()
         sys.exit(2)
 
+    if QUERY_OPTS["by_maintainer"]:
+        list_by_maintainer(queries)
+        return
+
     first_run = True
     for query in (Query(x) for x in queries):
         best_match = query.find_best()
@@ -535,16 +680,23 @@ def main(input_args):
             )
             continue
 
-        if not first_run:
+        if not first_run and CONFIG["format"] == "text":
             print()
 
         matches.sort()
         matches.sort(
             reverse=any(name in ("-r", "--reverse") for name, opt in module_opts)
         )
-        call_format_functions(best_match, matches)
+        if CONFIG["format"] == "jsonl":
+            call_record_functions(best_match, matches)
+        else:
+            call_format_functions(best_match, matches)
 
         first_run = False
 
+    get_metadata_cache().save()
+    if QUERY_OPTS["useflags"]:
+        get_use_descriptions().save()
+
 
 # vim: set ts=4 sw=4 tw=79:
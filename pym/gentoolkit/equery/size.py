@@ -14,8 +14,9 @@ import sys
 from getopt import gnu_getopt, GetoptError
 
 import gentoolkit.pprinter as pp
-from gentoolkit.equery import format_options, mod_usage, CONFIG
-from gentoolkit.query import Query
+from gentoolkit.equery import format_options, mod_usage, print_record, CONFIG
+from gentoolkit.query import Query, QueryBatch
+from gentoolkit.sizes import SizeIndex, package_sizes
 
 # =======
 # Globals
@@ -29,6 +30,7 @@ QUERY_OPTS = {
     "is_regex": False,
     "show_progress": False,
     "size_in_bytes": False,
+    "unique": False,
 }
 
 # =========
@@ -67,22 +69,38 @@ def print_help(with_description=True):
                 (" -h, --help", "display this help message"),
                 (" -b, --bytes", "report size in bytes"),
                 (" -f, --full-regex", "query is a regular expression"),
+                (" -u, --unique", "count files shared between packages once"),
             )
         )
     )
 
 
-def display_size(match_set):
+def display_size(match_set, sizes=None):
     """Display the total size of all accessible files owned by packages.
 
     @type match_set: list
     @param match_set: package cat/pkg-ver strings
+    @type sizes: dict
+    @param sizes: {cpv: (size, files, uncounted)} from
+            L{gentoolkit.sizes}, defaults to L{Package.size} of each package
     """
 
     for pkg in match_set:
-        size, files, uncounted = pkg.size()
-
-        if CONFIG["verbose"]:
+        if sizes is None:
+            size, files, uncounted = pkg.size()
+        else:
+            size, files, uncounted = sizes[str(pkg.cpv)]
+
+        if CONFIG["format"] == "jsonl":
+            print_record(
+                {
+                    "cpv": str(pkg.cpv),
+                    "size": size,
+                    "files": files,
+                    "uncounted": uncounted,
+                }
+            )
+        elif CONFIG["verbose"]:
             pp.uprint(" * %s" % pp.cpv(str(pkg.cpv)))
             print("Total files : %s".rjust(25) % pp.number(str(files)))
 
@@ -153,6 +171,8 @@ def parse_module_options(module_opts):
             print()
         elif opt in ("-f", "--full-regex"):
             QUERY_OPTS["is_regex"] = True
+        elif opt in ("-u", "--unique"):
+            QUERY_OPTS["unique"] = True
 
 
 def main(input_args):
@@ -160,8 +180,8 @@ def main(input_args):
 
     # -e, --exact-name is no longer needed. Kept for compatibility.
     # 04/09 djanderson
-    short_opts = "hbfe"
-    long_opts = ("help", "bytes", "full-regex", "exact-name")
+    short_opts = "hbfeu"
+    long_opts = ("help", "bytes", "full-regex", "exact-name", "unique")
 
     try:
         module_opts, queries = gnu_getopt(input_args, short_opts, long_opts)
@@ -177,19 +197,28 @@ def main(input_args):
         print_help()
         sys.exit(2)
 
+    batch = QueryBatch(
+        (Query(x, QUERY_OPTS["is_regex"]) for x in queries), **QUERY_OPTS
+    )
+
+    if QUERY_OPTS["unique"]:
+        index = SizeIndex()
     first_run = True
-    for query in (Query(x, QUERY_OPTS["is_regex"]) for x in queries):
-        if not first_run:
+    for query in batch:
+        if not first_run and CONFIG["format"] == "text":
             print()
 
-        matches = query.smart_find(**QUERY_OPTS)
+        matches = batch.smart_find(query)
 
         if not matches:
             sys.stderr.write(pp.error("No package found matching %s" % query))
 
         matches.sort()
 
-        display_size(matches)
+        if QUERY_OPTS["unique"]:
+            display_size(matches, index.sizes(matches))
+        else:
+            display_size(matches, package_sizes(matches))
 
         first_run = False
 
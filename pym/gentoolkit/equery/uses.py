@@ -15,17 +15,17 @@ import sys
 
 from functools import partial
 from getopt import gnu_getopt, GetoptError
-from glob import glob
 
 from portage import settings
-from portage import _encodings, _unicode_encode
 
 import gentoolkit.pprinter as pp
 from gentoolkit import errors
-from gentoolkit.equery import format_options, mod_usage, CONFIG
+from gentoolkit.equery import format_options, mod_usage, print_record, CONFIG
 from gentoolkit.textwrap_ import TextWrapper
 from gentoolkit.query import Query
 from gentoolkit.flag import get_flags, reduce_flags
+from gentoolkit.metadata import get_metadata_cache
+from gentoolkit.usedesc import get_use_descriptions
 
 # =======
 # Globals
@@ -122,67 +122,51 @@ def display_useflags(output):
             pp.uprint(markers[in_makeconf] + flag)
 
 
+def display_useflag_records(cpv, output):
+    """Print one JSON record per USE flag.
+
+    @type cpv: str
+    @param cpv: the package the flags belong to
+    @type output: list
+    @param output: [(inuse, inused, flag, desc, restrict), ...], see
+            L{display_useflags}
+    """
+
+    for in_makeconf, in_installed, flag, desc, restrict in output:
+        print_record(
+            {
+                "cpv": cpv,
+                "flag": flag,
+                "enabled": bool(in_makeconf),
+                "installed": bool(in_installed),
+                "description": desc.strip() if desc else None,
+                "restrict": restrict or None,
+            }
+        )
+
+
 def get_global_useflags():
     """Get global and expanded USE flag variables from
-    PORTDIR/profiles/use.desc and PORTDIR/profiles/desc/*.desc respectively.
+    profiles/use.desc and profiles/desc/*.desc of the repositories.
 
     @rtype: dict
     @return: {'flag_name': 'flag description', ...}
     """
 
-    global_usedesc = {}
-    # Get global USE flag descriptions
-    try:
-        path = os.path.join(settings["PORTDIR"], "profiles", "use.desc")
-        with open(
-            _unicode_encode(path, encoding=_encodings["fs"]),
-            encoding=_encodings["content"],
-        ) as open_file:
-            for line in open_file:
-                if line.startswith("#"):
-                    continue
-                # Ex. of fields: ['syslog', 'Enables support for syslog\n']
-                fields = line.split(" - ", 1)
-                if len(fields) == 2:
-                    global_usedesc[fields[0]] = fields[1].rstrip()
-    except IOError:
+    path = os.path.join(settings["PORTDIR"], "profiles", "use.desc")
+    if not os.path.isfile(path):
         sys.stderr.write(
             pp.warn("Could not load USE flag descriptions from %s" % pp.path(path))
         )
-
-    del path, open_file
-    # Add USE_EXPANDED variables to usedesc hash -- Bug #238005
-    for path in glob(os.path.join(settings["PORTDIR"], "profiles", "desc", "*.desc")):
-        try:
-            with open(
-                _unicode_encode(path, encoding=_encodings["fs"]),
-                encoding=_encodings["content"],
-            ) as open_file:
-                for line in open_file:
-                    if line.startswith("#"):
-                        continue
-                    fields = [field.strip() for field in line.split(" - ", 1)]
-                    if len(fields) == 2:
-                        expanded_useflag = "%s_%s" % (
-                            path.split("/")[-1][0:-5],
-                            fields[0],
-                        )
-                        global_usedesc[expanded_useflag] = fields[1]
-        except IOError:
-            sys.stderr.write(
-                pp.warn("Could not load USE flag descriptions from %s" % path)
-            )
-
-    return global_usedesc
+    return get_use_descriptions().global_flags()
 
 
 def get_output_descriptions(pkg, global_usedesc):
     """Prepare descriptions and usage information for each USE flag."""
 
-    if pkg.metadata is None:
-        local_usedesc = []
-    else:
-        local_usedesc = pkg.metadata.use()
+    local_usedesc = get_use_descriptions().local_flags(
+        os.path.join(pkg.package_path(), "metadata.xml")
+    )
 
     iuse, final_use = get_flags(pkg.cpv, final_setting=True)
     usevar = reduce_flags(iuse)
@@ -287,7 +271,7 @@ def main(input_args):
     first_run = True
     legend_printed = False
     for query in (Query(x) for x in queries):
-        if not first_run:
+        if not first_run and CONFIG["format"] == "text":
             print()
 
         if QUERY_OPTS["all_versions"]:
@@ -304,7 +288,9 @@ def main(input_args):
         for pkg in matches:
 
             output = get_output_descriptions(pkg, global_usedesc)
-            if output:
+            if CONFIG["format"] == "jsonl":
+                display_useflag_records(str(pkg.cpv), output)
+            elif output:
                 if CONFIG["verbose"]:
                     if not legend_printed:
                         print_legend()
@@ -320,5 +306,8 @@ def main(input_args):
 
         first_run = False
 
+    get_metadata_cache().save()
+    get_use_descriptions().save()
+
 
 # vim: set ts=4 sw=4 tw=79:
@@ -19,7 +19,7 @@ from getopt import gnu_getopt, GetoptError
 
 import gentoolkit.pprinter as pp
 from gentoolkit import errors
-from gentoolkit.equery import format_options, mod_usage
+from gentoolkit.equery import format_options, mod_usage, print_record, CONFIG
 from gentoolkit.query import Query
 
 from portage import _encodings, _unicode_encode
@@ -112,7 +112,16 @@ def main(input_args):
         if matches:
             pkg = sorted(matches).pop()
             ebuild_path = pkg.ebuild_path()
-            if ebuild_path:
+            if ebuild_path and CONFIG["format"] == "jsonl":
+                record = {"cpv": str(pkg.cpv), "path": os.path.normpath(ebuild_path)}
+                if QUERY_OPTS["ebuild"]:
+                    with open(
+                        _unicode_encode(ebuild_path, encoding=_encodings["fs"]),
+                        encoding=_encodings["content"],
+                    ) as f:
+                        record["ebuild"] = f.read()
+                print_record(record)
+            elif ebuild_path:
                 pp.uprint(os.path.normpath(ebuild_path))
                 if QUERY_OPTS["ebuild"]:
                     print_ebuild(ebuild_path)
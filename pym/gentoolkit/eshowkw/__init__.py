@@ -13,8 +13,10 @@ from portage import settings as ports
 from portage import config as portc
 from portage import portdbapi as portdbapi
 
+from gentoolkit import instrument
 from gentoolkit.eshowkw.keywords_header import keywords_header
 from gentoolkit.eshowkw.keywords_content import keywords_content
+from gentoolkit.eshowkw.keywords_content import content_cache
 from gentoolkit.eshowkw.display_pretty import string_rotator
 from gentoolkit.eshowkw.display_pretty import display
 
@@ -24,16 +26,14 @@ order = "bottom"
 topper = "versionlist"
 
 
-def process_display(package, keywords, dbapi):
+@instrument.timed("display package")
+def process_display(package, keywords, dbapi, cache=None):
 
     portdata = keywords_content(
-        package, keywords.keywords, dbapi, ignore_slots, order, bold, topper
+        package, keywords.keywords, dbapi, ignore_slots, order, bold, topper, cache
     )
     if topper == "archlist":
-        header = string_rotator().rotateContent(keywords.content, keywords.length, bold)
-        extra = string_rotator().rotateContent(
-            keywords.extra, keywords.length, bold, False
-        )
+        header, extra = keywords.rotated(bold)
         # -1 : space is taken in account and appended by us
         filler = "".ljust(portdata.slot_length - 1)
         header = ["%s%s%s" % (x, filler, y) for x, y in zip(header, extra)]
@@ -44,15 +44,28 @@ def process_display(package, keywords, dbapi):
         header = string_rotator().rotateContent(
             portdata.content, portdata.content_length, bold
         )
-        content = keywords.content
         sep = ["".ljust(keywords.length) for x in range(portdata.slot_length - 1)]
-        content.extend(sep)
-        content.extend(keywords.extra)
+        content = keywords.content + sep + keywords.extra
         header_length = keywords.length
         content_length = portdata.version_length
     display(content, header, header_length, content_length, portdata.cp, topper)
 
 
+def expand_packages(packages, dbapi):
+    """Yield the packages to display, with the packages of a category in
+    place of "category" or "category/*"."""
+    for package in packages:
+        category = package[:-2] if package.endswith("/*") else package
+        if category not in dbapi.settings.categories:
+            yield package
+            continue
+        cps = dbapi.cp_all(categories=[category])
+        if not cps:
+            msg_err = 'No packages in category "%s"' % category
+            raise SystemExit(msg_err)
+        yield from cps
+
+
 def process_args(argv):
     """Option parsing via argc"""
     parser = argparse.ArgumentParser(
@@ -69,7 +82,23 @@ def process_args(argv):
         help="show package version and exit",
     )
 
-    parser.add_argument("package", nargs="*", default=None, help="Packages to check.")
+    parser.add_argument(
+        "package",
+        nargs="*",
+        default=None,
+        help="Packages or categories to check.",
+    )
+
+    parser.add_argument(
+        "--profile", metavar="FILE", help="write cProfile statistics to FILE"
+    )
+
+    parser.add_argument(
+        "--timings",
+        action="store_true",
+        default=None,
+        help="print the time spent per phase to stderr",
+    )
 
     parser.add_argument(
         "-a", "--arch", nargs=1, default=[], help="Display only specified arch(s)"
@@ -142,70 +171,83 @@ def main(argv, indirect=False):
     color = opts.color
     package = opts.package
 
-    # equery support
-    if indirect and len(package) <= 0:
-        msg_err = "No packages specified"
-        raise SystemExit(msg_err)
-
-    # disable colors when redirected and they are not forced on
-    if not color and not sys.stdout.isatty():
-        # disable colors
-        porto.nocolor()
-
-    # Imply prefix if user specified any architectures (Bug 578496)
-    if len(opts.arch) > 0:
-        prefix = True
-
-    keywords = keywords_header(prefix, highlight_arch, order)
-    if len(package) > 0:
-        mysettings = portc(local_config=False)
-        dbapi = portdbapi(mysettings=mysettings)
-        if not use_overlays:
-            dbapi.porttrees = [dbapi.porttree_root]
-        for pkg in package:
-            process_display(pkg, keywords, dbapi)
+    # Options not given leave those of equery keywords alone, which also
+    # runs the session already
+    instrument.configure(profile=opts.profile, timings=opts.timings)
+    if indirect:
+        session = instrument.phase("eshowkw")
     else:
-        currdir = os.getcwd()
-        # check if there are actualy some ebuilds
-        ebuilds = [
-            "%s" % x for x in os.listdir(currdir) if fnmatch.fnmatch(x, "*.ebuild")
-        ]
-        if len(ebuilds) <= 0:
-            msg_err = 'No ebuilds at "%s"' % currdir
+        session = instrument.session("eshowkw")
+    with session:
+        # equery support
+        if indirect and len(package) <= 0:
+            msg_err = "No packages specified"
             raise SystemExit(msg_err)
-        package = "%s/%s" % (
-            os.path.basename(os.path.abspath("../")),
-            os.path.basename(currdir),
-        )
-        ourtree = os.path.realpath("../..")
-        ourstat = os.stat(ourtree)
-        ourstat = (ourstat.st_ino, ourstat.st_dev)
-        for repo in ports.repositories:
-            try:
-                repostat = os.stat(repo.location)
-            except OSError:
-                continue
-            if ourstat == (repostat.st_ino, repostat.st_dev):
-                dbapi = portdbapi(mysettings=portc(local_config=False))
-                break
-        else:
-            repos = {}
-            for repo in ports.repositories:
-                repos[repo.name] = repo.location
 
-            with open(os.path.join(ourtree, "profiles", "repo_name"), "rt") as f:
-                repo_name = f.readline().strip()
+        # disable colors when redirected and they are not forced on
+        if not color and not sys.stdout.isatty():
+            # disable colors
+            porto.nocolor()
 
-            repos[repo_name] = ourtree
-            repos = "".join(
-                "[{}]\nlocation={}\n".format(k, v) for k, v in repos.items()
-            )
-            mysettings = portc(local_config=False, env={"PORTAGE_REPOSITORIES": repos})
+        # Imply prefix if user specified any architectures (Bug 578496)
+        if len(opts.arch) > 0:
+            prefix = True
+
+        with instrument.phase("build header"):
+            keywords = keywords_header(prefix, highlight_arch, order)
+        if len(package) > 0:
+            mysettings = portc(local_config=False)
             dbapi = portdbapi(mysettings=mysettings)
-        # specify that we want just our nice tree we are in cwd
-        dbapi.porttrees = [ourtree]
-        process_display(package, keywords, dbapi)
-    return 0
+            if not use_overlays:
+                dbapi.porttrees = [dbapi.porttree_root]
+            # one config, mask and vartree cache for all of them
+            cache = content_cache()
+            for pkg in expand_packages(package, dbapi):
+                process_display(pkg, keywords, dbapi, cache)
+        else:
+            currdir = os.getcwd()
+            # check if there are actualy some ebuilds
+            ebuilds = [
+                "%s" % x for x in os.listdir(currdir) if fnmatch.fnmatch(x, "*.ebuild")
+            ]
+            if len(ebuilds) <= 0:
+                msg_err = 'No ebuilds at "%s"' % currdir
+                raise SystemExit(msg_err)
+            package = "%s/%s" % (
+                os.path.basename(os.path.abspath("../")),
+                os.path.basename(currdir),
+            )
+            ourtree = os.path.realpath("../..")
+            ourstat = os.stat(ourtree)
+            ourstat = (ourstat.st_ino, ourstat.st_dev)
+            for repo in ports.repositories:
+                try:
+                    repostat = os.stat(repo.location)
+                except OSError:
+                    continue
+                if ourstat == (repostat.st_ino, repostat.st_dev):
+                    dbapi = portdbapi(mysettings=portc(local_config=False))
+                    break
+            else:
+                repos = {}
+                for repo in ports.repositories:
+                    repos[repo.name] = repo.location
+
+                with open(os.path.join(ourtree, "profiles", "repo_name"), "rt") as f:
+                    repo_name = f.readline().strip()
+
+                repos[repo_name] = ourtree
+                repos = "".join(
+                    "[{}]\nlocation={}\n".format(k, v) for k, v in repos.items()
+                )
+                mysettings = portc(
+                    local_config=False, env={"PORTAGE_REPOSITORIES": repos}
+                )
+                dbapi = portdbapi(mysettings=mysettings)
+            # specify that we want just our nice tree we are in cwd
+            dbapi.porttrees = [ourtree]
+            process_display(package, keywords, dbapi)
+        return 0
 
 
 if __name__ == "__main__":
@@ -6,12 +6,45 @@ import portage as port
 import os
 from portage.output import colorize
 
-__all__ = ["keywords_content"]
+__all__ = ["keywords_content", "content_cache"]
 
 from gentoolkit.eshowkw.display_pretty import colorize_string
 from gentoolkit.eshowkw.display_pretty import align_string
 
 
+class content_cache:
+    """Portage data shared by the keywords_content of several packages."""
+
+    def masked(self, cpv):
+        """Figure out if package is pmasked."""
+        if cpv not in self.masks:
+            try:
+                self.masks[cpv] = "package.mask" in port.getmaskingstatus(
+                    cpv, settings=self.mysettings
+                )
+            except:
+                # occurs when package is not known by portdb
+                # so we consider it unmasked
+                self.masks[cpv] = False
+        return self.masks[cpv]
+
+    def installed(self, cpv, repo):
+        """Check if package version is installed from repo."""
+        cp = port.cpv_getkey(cpv)
+        if cp not in self.installs:
+            self.installs[cp] = {
+                x: self.vartree.aux_get(x, ["repository"])[0]
+                for x in self.vartree.match(cp)
+            }
+        return self.installs[cp].get(cpv) == repo
+
+    def __init__(self):
+        self.vartree = port.db[port.root]["vartree"].dbapi
+        self.mysettings = port.config(local_config=False)
+        self.masks = {}
+        self.installs = {}
+
+
 class keywords_content:
     class RedundancyChecker:
         def __listRedundant(self, masks, keywords, ignoreslots, slots):
@@ -142,25 +175,15 @@ class keywords_content:
 
         def __getMaskStatus(self, cpv):
             """Figure out if package is pmasked."""
-            try:
-                if "package.mask" in port.getmaskingstatus(
-                    cpv, settings=self.mysettings
-                ):
-                    return True
-            except:
-                # occurs when package is not known by portdb
-                # so we consider it unmasked
-                pass
-            return False
+            return self.cache.masked(cpv)
 
         def __getInstallStatus(self, cpv, repo):
             """Check if package version we test is installed."""
-            return bool(self.vartree.match("=%s::%s" % (cpv, repo)))
+            return self.cache.installed(cpv, repo)
 
-        def __init__(self, packages):
+        def __init__(self, packages, cache=None):
             """Query all relevant data for version data formatting"""
-            self.vartree = port.db[port.root]["vartree"].dbapi
-            self.mysettings = port.config(local_config=False)
+            self.cache = cache if cache is not None else content_cache()
             self.versions = self.__getVersions(packages)
             self.masks = list(map(lambda x: self.__getMaskStatus(x), packages))
 
@@ -365,8 +388,11 @@ class keywords_content:
         content_align="bottom",
         usebold=False,
         toplist="archlist",
+        cache=None,
     ):
-        """Query all relevant data from portage databases."""
+        """Query all relevant data from portage databases.
+
+        The content_cache is shared with other packages displayed, if given."""
         (
             packages,
             self.repositories,
@@ -379,7 +405,7 @@ class keywords_content:
         self.slot_length = max([len(x) for x in self.slots])
         repositories_length = max([len(x) for x in self.repositories])
         self.keyword_length = len(keywords_list)
-        vers = self.VersionChecker(list(zip(packages, self.repositories)))
+        vers = self.VersionChecker(list(zip(packages, self.repositories)), cache)
         self.versions = vers.versions
         masks = vers.masks
         self.version_length = max([len(x) for x in self.versions])
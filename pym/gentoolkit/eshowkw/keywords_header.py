@@ -7,6 +7,7 @@ __all__ = ["keywords_header"]
 from portage import settings as ports
 from gentoolkit.eshowkw.display_pretty import colorize_string
 from gentoolkit.eshowkw.display_pretty import align_string
+from gentoolkit.eshowkw.display_pretty import string_rotator
 from gentoolkit.profile import load_profile_data
 
 
@@ -151,3 +152,15 @@ class keywords_header:
             self.keywords, additional, keywords_align, self.length
         )
         self.extra = self.__prepareExtra(extra, keywords_align, self.length)
+        self.__rotated = {}
+
+    def rotated(self, bold=False):
+        """Return the content and extra fields rotated for the top of the
+        listing, built once for all packages displayed."""
+        if bold not in self.__rotated:
+            rotator = string_rotator()
+            self.__rotated[bold] = (
+                rotator.rotateContent(self.content, self.length, bold),
+                rotator.rotateContent(self.extra, self.length, bold, False),
+            )
+        return self.__rotated[bold]
@@ -135,14 +135,31 @@ def filter_flags(use, use_expand_hidden, usemasked, useforced):
     return list(use.values())
 
 
-def get_all_cpv_use(cpv):
+def get_all_cpv_use(cpv, settings=None):
     """Uses portage to determine final USE flags and settings for an emerge
 
     @type cpv: string
     @param cpv: eg cat/pkg-ver
+    @type settings: portage.config
+    @param settings: a private config clone to use instead of the shared
+            (and locked) porttree config
     @rtype: lists
     @return  use, use_expand_hidden, usemask, useforce
     """
+    if settings is not None:
+        try:
+            settings.setcpv(cpv, mydb=portage.portdb)
+            return (
+                settings["PORTAGE_USE"].split(),
+                settings["USE_EXPAND_HIDDEN"].split(),
+                list(settings.usemask),
+                list(settings.useforce),
+            )
+        except KeyError:
+            return [], [], [], []
+        finally:
+            settings.reset()
+
     use = None
     portage.db[portage.root]["porttree"].dbapi.settings.unlock()
     try:
@@ -163,7 +180,7 @@ def get_all_cpv_use(cpv):
     return use, use_expand_hidden, usemask, useforce
 
 
-def get_flags(cpv, final_setting=False):
+def get_flags(cpv, final_setting=False, settings=None):
     """Retrieves all information needed to filter out hidded, masked, etc.
     USE flags for a given package.
 
@@ -172,10 +189,12 @@ def get_flags(cpv, final_setting=False):
     @type final_setting: boolean
     @param final_setting: used to also determine the final
             enviroment USE flag settings and return them as well.
+    @type settings: portage.config
+    @param settings: optional private config clone, see L{get_all_cpv_use}
     @rtype: list or list, list
     @return IUSE or IUSE, final_flags
     """
-    final_use, use_expand_hidden, usemasked, useforced = get_all_cpv_use(cpv)
+    final_use, use_expand_hidden, usemasked, useforced = get_all_cpv_use(cpv, settings)
     iuse_flags = filter_flags(get_iuse(cpv), use_expand_hidden, usemasked, useforced)
     if final_setting:
         final_flags = filter_flags(final_use, use_expand_hidden, usemasked, useforced)
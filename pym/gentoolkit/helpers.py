@@ -9,12 +9,21 @@
 """
 
 __all__ = (
+    "CPIndex",
     "FileOwner",
+    "RepoNames",
+    "find_sorted_line",
+    "fork_map",
+    "get_cache_path",
+    "get_cp_index",
     "get_cpvs",
     "get_installed_cpvs",
+    "get_installed_metadata",
+    "get_repo_names",
     "get_uninstalled_cpvs",
     "get_bintree_cpvs",
     "uniqify",
+    "write_cache_file",
 )
 __docformat__ = "epytext"
 
@@ -24,23 +33,108 @@ __docformat__ = "epytext"
 
 import os
 import re
+from bisect import bisect_left
 from functools import partial
 from itertools import chain
 
 import portage
 from portage import _encodings, _unicode_encode
+from portage.versions import cpv_getkey
 
 from gentoolkit import pprinter as pp
 from gentoolkit import errors
+from gentoolkit import instrument
 
 # This has to be imported below to stop circular import.
 # from gentoolkit.package import Package
 
+# =======
+# Globals
+# =======
+
+# {(ROOT, tree, repository locations): CPIndex}
+_cp_indexes = {}
+
+_repo_names = None
+
 # =======
 # Classes
 # =======
 
 
+class CPIndex:
+    """A sorted index of the cat/pkg keys known to a Portage dbapi.
+
+    Categories are kept in one sorted array and package names in another,
+    grouped by category, so that glob and regex queries can be matched
+    against the (small) table of names before any versions are listed.
+
+    Example usage:
+            >>> from gentoolkit.helpers import CPIndex
+            >>> index = CPIndex(['dev-lang/python', 'app-misc/foo'])
+            >>> index.categories
+            ['app-misc', 'dev-lang']
+            >>> list(index.get_cps(cp_predicate=lambda x: 'py' in x))
+            ['dev-lang/python']
+    """
+
+    def __init__(self, cps):
+        """Build the index.
+
+        @type cps: iterable
+        @param cps: cat/pkg strings
+        """
+        self.categories = []
+        self.names = []
+        # self.names[self._bounds[i]:self._bounds[i + 1]] are the package
+        # names of self.categories[i]
+        self._bounds = []
+
+        for cat, name in sorted(x.split("/", 1) for x in set(cps)):
+            if not self.categories or self.categories[-1] != cat:
+                self.categories.append(cat)
+                self._bounds.append(len(self.names))
+            self.names.append(name)
+        self._bounds.append(len(self.names))
+
+    def __len__(self):
+        return len(self.names)
+
+    def __iter__(self):
+        return self.get_cps()
+
+    def get_names(self, category):
+        """Return the sorted package names of a category.
+
+        @type category: str
+        @param category: an exact category name
+        @rtype: list
+        """
+
+        i = bisect_left(self.categories, category)
+        if i == len(self.categories) or self.categories[i] != category:
+            return []
+        return self.names[self._bounds[i] : self._bounds[i + 1]]
+
+    def get_cps(self, cat_predicate=None, cp_predicate=None):
+        """Yield the indexed cat/pkg strings which pass the predicates.
+
+        @type cat_predicate: function
+        @param cat_predicate: called once per category
+        @type cp_predicate: function
+        @param cp_predicate: called once per cat/pkg of a matching category
+        @rtype: generator
+        """
+
+        for i, cat in enumerate(self.categories):
+            if cat_predicate is not None and not cat_predicate(cat):
+                continue
+            for name in self.names[self._bounds[i] : self._bounds[i + 1]]:
+                cp = "%s/%s" % (cat, name)
+                if cp_predicate is None or cp_predicate(cp):
+                    yield cp
+
+
 class FileOwner:
     """Creates a function for locating the owner of filename queries.
 
@@ -186,12 +280,264 @@ class FileOwner:
         return result
 
 
+class RepoNames:
+    """The repository names of cpvs, as L{gentoolkit.package.Package.repo_name}
+    gives them.
+
+    An installed package is from the repository recorded in the VDB, any
+    other from the repository of highest priority which has its ebuild.
+    The names of all the versions of a cat/pkg are looked up at once, with
+    one cp_list() call instead of an ebuild path for each version.
+
+    Example usage:
+            >>> from gentoolkit.helpers import get_repo_names
+            >>> get_repo_names()('sys-apps/portage-2.3.99')
+            'gentoo'
+
+    @type vardb: portage.dbapi.vartree.vardbapi
+    @param vardb: defaults to the one of portage.root
+    @type portdb: portage.dbapi.porttree.portdbapi
+    @param portdb: defaults to the one of portage.root
+    """
+
+    def __init__(self, vardb=None, portdb=None):
+        self.vardb = vardb or portage.db[portage.root]["vartree"].dbapi
+        self.portdb = portdb or portage.db[portage.root]["porttree"].dbapi
+        # {cpv: repository name}, "" when unknown
+        self._names = {}
+
+    def __call__(self, cpv):
+        """Return the repository name of a cpv, "" if unknown."""
+
+        try:
+            return self._names[cpv]
+        except KeyError:
+            return self.resolve((cpv,))[cpv]
+
+    def resolve(self, cpvs):
+        """Look up the repository names of many cpvs.
+
+        @type cpvs: iterable
+        @param cpvs: cat/pkg-ver strings
+        @rtype: dict
+        @return: {cpv: repository name or ""}
+        """
+
+        cpvs = [str(x) for x in cpvs]
+        todo = [x for x in cpvs if x not in self._names]
+        if todo:
+            with instrument.phase("resolve repository names"):
+                self._resolve(todo)
+        return {x: self._names[x] for x in cpvs}
+
+    def _resolve(self, cpvs):
+        for cp in set(cpv_getkey(x) for x in cpvs):
+            installed = self.vardb.cp_list(cp)
+            for cpv, values in get_installed_metadata(
+                ("repository",), installed, self.vardb
+            ):
+                self._names[str(cpv)] = values[0]
+            installed = set(str(x) for x in installed)
+            # Sorted by (version, repository priority), so the repository
+            # of highest priority comes last
+            for cpv in self.portdb.cp_list(cp):
+                if str(cpv) not in installed:
+                    self._names[str(cpv)] = getattr(cpv, "repo", None) or ""
+        for cpv in cpvs:
+            self._names.setdefault(cpv, "")
+
+
 # =========
 # Functions
 # =========
 
 
-def get_cpvs(predicate=None, include_installed=True):
+def find_sorted_line(data, key, start=0):
+    """Binary search a buffer of sorted lines, like a memory mapped file.
+
+    @type data: bytes or mmap.mmap
+    @param data: newline terminated lines, sorted bytewise from start on
+    @type key: bytes
+    @param key: the line, or line prefix, to look for
+    @type start: int
+    @param start: offset of the first line
+    @rtype: int
+    @return: offset of the first line not sorting before key, or len(data)
+    """
+
+    lo, hi = start, len(data)
+    while lo < hi:
+        mid = (lo + hi) // 2
+        line = max(data.rfind(b"\n", lo, mid) + 1, lo)
+        end = data.find(b"\n", line)
+        if data[line:end] < key:
+            lo = end + 1
+        else:
+            hi = line
+    return lo
+
+
+def get_cache_path(name):
+    """Return the path of a file in gentoolkit's cache directory,
+    $XDG_CACHE_HOME/gentoolkit or ~/.cache/gentoolkit.
+
+    The directory may not exist yet.
+
+    @type name: str
+    @param name: file name
+    @rtype: str
+    """
+
+    cache_home = os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache")
+    return os.path.join(cache_home, "gentoolkit", name)
+
+
+def write_cache_file(path, write, binary=False):
+    """Replace a file in the cache directory at once.
+
+    The content is written to a temporary file next to it, which is then
+    renamed over it, so that other processes never read half of it. A
+    cache which can not be written is only a lost speedup for the next
+    run, so errors are not reported.
+
+    @type path: str
+    @param path: see L{get_cache_path}
+    @type write: callable
+    @param write: called with the open temporary file to write the content
+    @type binary: bool
+    @param binary: open the file in binary mode instead of as UTF-8 text
+    @rtype: bool
+    @return: True if the file was written
+    """
+
+    tmp = "%s.%d" % (path, os.getpid())
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        if binary:
+            f = open(tmp, "wb")
+        else:
+            f = open(tmp, "w", encoding="utf-8")
+        with f:
+            write(f)
+        os.replace(tmp, path)
+    except OSError:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        return False
+    return True
+
+
+def fork_map(func, items, jobs, min_chunk_size=1, initializer=None, initargs=()):
+    """Map func over items in a pool of forked worker processes.
+
+    The workers inherit the state of this process, like Portage's
+    settings and databases. Each gets a few chunks of at least a quarter
+    of min_chunk_size items, which evens out their differing speeds.
+
+    @type func: callable
+    @param func: called with one item in a worker, must return something
+            picklable
+    @type items: list
+    @param items: the work
+    @type jobs: int
+    @param jobs: maximum number of workers, there are no more than one
+            per min_chunk_size items
+    @type min_chunk_size: int
+    @param min_chunk_size: number of items worth a worker process
+    @type initializer: callable
+    @param initializer: called with initargs in each worker first
+    @type initargs: tuple
+    @rtype: generator or None
+    @return: the results in the order of items, or None if the work is
+            better done in this process, because there is too little of
+            it or processes can not be forked
+    """
+
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+
+    jobs = min(jobs or 1, len(items) // min_chunk_size)
+    if jobs < 2 or "fork" not in multiprocessing.get_all_start_methods():
+        return None
+    chunksize = max(min_chunk_size // 4, -(-len(items) // (jobs * 4)), 1)
+
+    def results():
+        with ProcessPoolExecutor(
+            jobs,
+            mp_context=multiprocessing.get_context("fork"),
+            initializer=initializer,
+            initargs=initargs,
+        ) as executor:
+            yield from executor.map(func, items, chunksize=chunksize)
+
+    return results()
+
+
+def get_cp_index(tree="porttree"):
+    """Return the cached L{CPIndex} for one of Portage's trees.
+
+    The index is built on first use and reused for the rest of the process,
+    as long as ROOT and the locations of the repositories stay the same.
+
+    @type tree: str
+    @param tree: one of 'porttree', 'vartree' or 'bintree'
+    @rtype: L{CPIndex}
+    """
+
+    dbapi = portage.db[portage.root][tree].dbapi
+    key = (portage.root, tree, tuple(getattr(dbapi, "porttrees", ())))
+    index = _cp_indexes.get(key)
+    if index is None:
+        with instrument.phase("build cat/pkg index"):
+            index = _cp_indexes[key] = CPIndex(dbapi.cp_all())
+    return index
+
+
+def clear_cp_index_cache():
+    """Forget all cached L{CPIndex} objects."""
+
+    _cp_indexes.clear()
+
+
+def get_repo_names():
+    """Return the process wide L{RepoNames}.
+
+    @rtype: L{RepoNames}
+    """
+
+    global _repo_names
+
+    if _repo_names is None:
+        _repo_names = RepoNames()
+    return _repo_names
+
+
+def clear_repo_names_cache():
+    """Forget the repository names looked up so far."""
+
+    global _repo_names
+
+    _repo_names = None
+
+
+def _iter_tree_cpvs(tree, predicate, cat_predicate, cp_predicate):
+    """Expand the cps of a tree which pass the cat and cp predicates."""
+
+    dbapi = portage.db[portage.root][tree].dbapi
+    cps = get_cp_index(tree).get_cps(
+        cat_predicate=cat_predicate, cp_predicate=cp_predicate
+    )
+
+    return iter(
+        x for x in chain.from_iterable(dbapi.cp_list(x) for x in cps) if predicate(x)
+    )
+
+
+def get_cpvs(
+    predicate=None, include_installed=True, cat_predicate=None, cp_predicate=None
+):
     """Get all packages in the Portage tree and overlays. Optionally apply a
     predicate.
 
@@ -209,6 +555,12 @@ def get_cpvs(predicate=None, include_installed=True):
     @param include_installed:
             If True: Return the union of all_cpvs and all_installed_cpvs
             If False: Return the difference of all_cpvs and all_installed_cpvs
+    @type cat_predicate: function
+    @param cat_predicate: a function to filter categories with before any
+            of their packages are listed
+    @type cp_predicate: function
+    @param cp_predicate: a function to filter cat/pkg keys with before their
+            versions are listed
     @rtype: generator
     @return: a generator that yields unsorted cat/pkg-ver strings from the
             Portage tree
@@ -217,18 +569,14 @@ def get_cpvs(predicate=None, include_installed=True):
     if not predicate:
         predicate = lambda x: x
 
-    all_cps = portage.db[portage.root]["porttree"].dbapi.cp_all()
+    all_cpvs = _iter_tree_cpvs("porttree", predicate, cat_predicate, cp_predicate)
 
-    all_cpvs = iter(
-        x
-        for x in chain.from_iterable(
-            portage.db[portage.root]["porttree"].dbapi.cp_list(x) for x in all_cps
+    all_installed_cpvs = set(
+        get_installed_cpvs(
+            predicate, cat_predicate=cat_predicate, cp_predicate=cp_predicate
         )
-        if predicate(x)
     )
 
-    all_installed_cpvs = set(get_installed_cpvs(predicate))
-
     if include_installed:
         for cpv in all_cpvs:
             if cpv in all_installed_cpvs:
@@ -245,11 +593,15 @@ def get_cpvs(predicate=None, include_installed=True):
 get_uninstalled_cpvs = partial(get_cpvs, include_installed=False)
 
 
-def get_installed_cpvs(predicate=None):
+def get_installed_cpvs(predicate=None, cat_predicate=None, cp_predicate=None):
     """Get all installed packages. Optionally apply a predicate.
 
     @type predicate: function
     @param predicate: a function to filter the package list with
+    @type cat_predicate: function
+    @param cat_predicate: a function to filter categories with
+    @type cp_predicate: function
+    @param cp_predicate: a function to filter cat/pkg keys with
     @rtype: generator
     @return: a generator that yields unsorted installed cat/pkg-ver strings
             from VARDB
@@ -258,25 +610,69 @@ def get_installed_cpvs(predicate=None):
     if not predicate:
         predicate = lambda x: x
 
-    installed_cps = portage.db[portage.root]["vartree"].dbapi.cp_all()
-
-    installed_cpvs = iter(
-        x
-        for x in chain.from_iterable(
-            portage.db[portage.root]["vartree"].dbapi.cp_list(x) for x in installed_cps
-        )
-        if predicate(x)
-    )
+    installed_cpvs = _iter_tree_cpvs("vartree", predicate, cat_predicate, cp_predicate)
 
     for cpv in installed_cpvs:
         yield cpv
 
 
-def get_bintree_cpvs(predicate=None):
+def get_installed_metadata(keys, cpvs=None, vardb=None):
+    """Read metadata of many installed packages in one pass over the VDB.
+
+    This reads the files of the VDB directly, without the locking, stat
+    and cache validation of vardbapi.aux_get() for every package.
+
+    @type keys: sequence
+    @param keys: metadata keys, e.g. ("KEYWORDS", "USE")
+    @type cpvs: iterable
+    @param cpvs: installed cat/pkg-ver strings, defaults to all
+    @type vardb: portage.dbapi.vartree.vardbapi
+    @param vardb: defaults to portage.db[portage.root]["vartree"].dbapi.
+            Anything without getpath(), like a test double, is read with
+            aux_get().
+    @rtype: generator
+    @return: (cpv, [value, ...]) with values in the order of keys, "" for
+            missing ones and whitespace collapsed like aux_get() does
+    """
+
+    if vardb is None:
+        vardb = portage.db[portage.root]["vartree"].dbapi
+    if cpvs is None:
+        cpvs = vardb.cpv_all()
+
+    if not hasattr(vardb, "getpath"):
+        for cpv in cpvs:
+            yield cpv, vardb.aux_get(cpv, list(keys))
+        return
+
+    encoding = _encodings["repo.content"]
+    for cpv in cpvs:
+        pkgdir = vardb.getpath(cpv)
+        values = []
+        for key in keys:
+            try:
+                with open(
+                    _unicode_encode(
+                        os.path.join(pkgdir, key), encoding=_encodings["fs"]
+                    ),
+                    encoding=encoding,
+                    errors="replace",
+                ) as metadata:
+                    values.append(" ".join(metadata.read().split()))
+            except FileNotFoundError:
+                values.append("")
+        yield cpv, values
+
+
+def get_bintree_cpvs(predicate=None, cat_predicate=None, cp_predicate=None):
     """Get all binary packages available. Optionally apply a predicate.
 
     @type predicate: function
     @param predicate: a function to filter the package list with
+    @type cat_predicate: function
+    @param cat_predicate: a function to filter categories with
+    @type cp_predicate: function
+    @param cp_predicate: a function to filter cat/pkg keys with
     @rtype: generator
     @return: a generator that yields unsorted binary package cat/pkg-ver strings
             from BINDB
@@ -285,15 +681,7 @@ def get_bintree_cpvs(predicate=None):
     if not predicate:
         predicate = lambda x: x
 
-    installed_cps = portage.db[portage.root]["bintree"].dbapi.cp_all()
-
-    installed_cpvs = iter(
-        x
-        for x in chain.from_iterable(
-            portage.db[portage.root]["bintree"].dbapi.cp_list(x) for x in installed_cps
-        )
-        if predicate(x)
-    )
+    installed_cpvs = _iter_tree_cpvs("bintree", predicate, cat_predicate, cp_predicate)
 
     for cpv in installed_cpvs:
         yield cpv
@@ -19,20 +19,31 @@ TARGET_ARCH = "auto"  # can be overridden by -t ARCH
 # do not change anything below #
 ################################
 
+import os
 from os.path import join, basename
 from sys import stderr, stdout
 from os import stat
 from time import time
-from xml.dom import minidom, NotFoundErr
-from xml.parsers.expat import ExpatError
 
 # TODO: just import needed stuff to safe memory/time and maybe use "as foo"
 import portage
+import portage.dbapi.porttree
 import portage.versions
 
+from gentoolkit import instrument
+from gentoolkit.helpers import fork_map
+from gentoolkit.maintainers import MaintainerIndex, match_maintainers
+from gentoolkit.metadata import MetaData
+
 from optparse import OptionParser
 from time import gmtime, strftime
 
+# with fewer categories than this per process, check them all in this one
+MIN_SHARD_SIZE = 4
+
+# _mtime_ is the ebuild's mtime, which the portdbapi gets with the metadata
+AUX_KEYS = ["KEYWORDS", "SLOT", "_mtime_"]
+
 # override/change portage module settings
 
 
@@ -136,76 +147,36 @@ def show_result(conf, pkgs):
         out.close()
 
 
-def _get_metadata(metadata, element, tag):
-    values = []
-
-    try:
-        metadatadom = minidom.parse(metadata)
-    except ExpatError as e:
-        raise ExpatError(
-            "%s: %s"
-            % (
-                metadata,
-                e,
-            )
-        )
+def _get_maintainer_emails(metadata):
+    """Return the email addresses of the maintainers in a metadata.xml,
+    upstream ones included."""
 
     try:
-        elements = metadatadom.getElementsByTagName(element)
-        if not elements:
-            return values
-    except NotFoundErr:
-        return values
+        metadata = MetaData(metadata)
+    except SyntaxError as e:
+        raise SyntaxError("%s: %s" % (metadata, e))
 
-    try:
-        for _element in elements:
-            node = _element.getElementsByTagName(tag)
-
-            try:
-                values.append(node[0].childNodes[0].data)
-            except IndexError:
-                pass
-    except NotFoundErr:
-        raise NotFoundErr("%s: Malformed input: missing 'flag' tag(s)" % (metadata))
-
-    metadatadom.unlink()
-    return values
+    maintainers = list(metadata.maintainers())
+    for upstream in metadata.upstream():
+        maintainers.extend(upstream.maintainers)
+    return [maint.email for maint in maintainers if maint.email]
 
 
 def is_maintainer(maintainer, metadata):
-    data = []
-
     if maintainer == None:
         return True
 
-    mtainer = maintainer.split(",")
-
-    data = _get_metadata(metadata, "maintainer", "email")
-
-    if not data and len(maintainer) == 0:
-        return True
-    elif not data and len(maintainer) > 0:
-        return False
-    else:
-        for addy in data:
-            for contact in mtainer:
-                if addy == contact:
-                    return True
-                if addy.startswith(contact):
-                    return True
-    return False
+    return match_maintainers(maintainer.split(","), _get_maintainer_emails(metadata))
 
 
 # fetch a list of arch (just stable) packages
 # -* is important to be sure that just arch is used
-def get_packages(conf):
+def get_packages(conf, categories=None, aux=None):
     _pkgs = {}
+    dbapi = conf["target_dbapi"]
+    maintained = _get_maintained(conf)
 
-    _portage_settings(
-        "ACCEPT_KEYWORDS", ("-* %s" % str(conf["TARGET_ARCH"])), conf["portdb"].settings
-    )
-
-    for cp in conf["portdb"].dbapi.cp_all():
+    for cp in dbapi.cp_all(categories=categories):
         cpvrs = []
         slots = {}
 
@@ -213,17 +184,17 @@ def get_packages(conf):
             if not cp in conf["USER_PKGS"] and not basename(cp) in conf["USER_PKGS"]:
                 continue
 
-        # None is important to match also on empty string
-        if conf["MAINTAINER"] != None:
-            if not is_maintainer(
-                conf["MAINTAINER"], join(conf["PORTDIR"], cp, "metadata.xml")
-            ):
-                continue
+        if maintained is not None and cp not in maintained:
+            continue
 
-        cpvrs = conf["portdb"].dbapi.match(cp)
+        cpvrs = dbapi.match(cp)
 
         for cpvr in cpvrs:
-            slot = conf["portdb"].dbapi.aux_get(cpvr, ["SLOT"])[0]
+            # KEYWORDS, SLOT and the ebuild's mtime in one read, kept for
+            # get_imlate()
+            kwds, slot, mtime = dbapi.aux_get(cpvr, AUX_KEYS)
+            if aux is not None:
+                aux[cpvr] = (kwds, slot, mtime)
             if not slot in slots:
                 slots[slot] = []
             slots[slot].append(cpvr)
@@ -250,10 +221,10 @@ def get_packages(conf):
 # compare get_packages() against MAIN_ARCH
 
 
-def get_imlate(conf, pkgs):
-    _portage_settings(
-        "ACCEPT_KEYWORDS", ("-* %s" % str(conf["MAIN_ARCH"])), conf["portdb"].settings
-    )
+def get_imlate(conf, pkgs, aux=None):
+    dbapi = conf["main_dbapi"]
+    if aux is None:
+        aux = {}
 
     stable = str(conf["MAIN_ARCH"].lstrip("~"))
     testing = "~%s" % stable
@@ -284,10 +255,13 @@ def get_imlate(conf, pkgs):
                 abs_pkg = join(conf["PORTDIR"], cat, pkg, basename(cpvr))
                 abs_pkg = "%s.ebuild" % str(abs_pkg)
 
-                kwds = conf["portdb"].dbapi.aux_get(cpvr, ["KEYWORDS"])[0]
+                if cpvr in aux:
+                    kwds, slot, ebuild_mtime = aux[cpvr]
+                else:
+                    kwds, slot, ebuild_mtime = dbapi.aux_get(cpvr, AUX_KEYS)
 
                 # FIXME: %s is bad.. maybe even cast it, else there are issues because its unicode
-                slot = ":%s" % conf["portdb"].dbapi.aux_get(cpvr, ["SLOT"])[0]
+                slot = ":%s" % slot
                 if slot == ":0":
                     slot = ""
 
@@ -318,14 +292,16 @@ def get_imlate(conf, pkgs):
                 # drop "stable candidates" with mtime < 30 days
                 # Shall we use gmtime/UTC here?
                 if kwd_type == 1:
-                    mtime = int((time() - stat(abs_pkg).st_mtime) / 60 / 60 / 24)
+                    # Portage stats the ebuild for _mtime_ anyway, unless
+                    # it has the metadata in memory
+                    if not ebuild_mtime:
+                        ebuild_mtime = stat(abs_pkg).st_mtime
+                    mtime = int((time() - int(ebuild_mtime)) / 60 / 60 / 24)
                     if mtime < conf["MTIME"]:
                         continue
 
                 # look for an existing stable version
-                our = portage.versions.best(
-                    conf["portdb"].dbapi.match("%s/%s%s" % (cat, pkg, slot))
-                )
+                our = portage.versions.best(dbapi.match("%s/%s%s" % (cat, pkg, slot)))
                 if our:
                     _foo = portage.versions.pkgsplit(our)
                     our_ver = _foo[1]
@@ -349,6 +325,77 @@ def get_imlate(conf, pkgs):
     return imlate
 
 
+# get_packages() and get_imlate() of all categories, sharded across processes
+
+
+def find_imlate(conf, jobs=1):
+    categories = list(conf["target_dbapi"].settings.categories)
+    # once for all workers
+    _get_maintained(conf)
+
+    results = fork_map(
+        _check_shard_category,
+        categories,
+        jobs,
+        MIN_SHARD_SIZE,
+        initializer=_init_shard_worker,
+        initargs=(conf,),
+    )
+    if results is None:
+        results = [_check_category(conf, cat) for cat in categories]
+
+    imlate = {}
+    for _imlate, stable_sum, keyword_sum in results:
+        imlate.update(_imlate)
+        conf["STABLE_SUM"] += stable_sum
+        conf["KEYWORD_SUM"] += keyword_sum
+    return imlate
+
+
+def _get_maintained(conf):
+    # None is important to match also on empty string
+    if conf["MAINTAINER"] == None:
+        return None
+    if conf.get("MAINTAINED") is None:
+        index = MaintainerIndex(conf["PORTDIR"]).refresh()
+        conf["MAINTAINED"] = set(
+            index.find(conf["MAINTAINER"].split(","), upstream=True)
+        )
+        index.save()
+    return conf["MAINTAINED"]
+
+
+def _check_category(conf, cat):
+    # own counters, merged by find_imlate()
+    conf = dict(conf, STABLE_SUM=0, KEYWORD_SUM=0)
+    aux = {}
+    imlate = get_imlate(conf, get_packages(conf, [cat], aux), aux)
+    return imlate, conf["STABLE_SUM"], conf["KEYWORD_SUM"]
+
+
+def _init_shard_worker(conf):
+    global _shard_conf
+    _shard_conf = conf
+
+
+def _check_shard_category(cat):
+    return _check_category(_shard_conf, cat)
+
+
+# a dbapi of the main repository accepting just arch
+
+
+def _arch_dbapi(settings, arch):
+    settings = portage.config(clone=settings)
+    _portage_settings("ACCEPT_KEYWORDS", ("-* %s" % str(arch)), settings)
+    dbapi = portage.dbapi.porttree.portdbapi(mysettings=settings)
+    dbapi.porttrees = [portage.portdb.porttree_root]
+    # does it make sense to remove _all_ useless stuff or just leave it as it is?
+    # dbapi._aux_cache_keys.clear()
+    # dbapi._aux_cache_keys.update(["EAPI", "KEYWORDS", "SLOT"])
+    return dbapi
+
+
 # fetch portage related settings
 
 
@@ -384,17 +431,11 @@ def get_settings(conf=None):
 
     # maybe thats not necessary because we override porttrees below..
     _portage_settings("PORTDIR_OVERLAY", "", mysettings)
-    trees = portage.create_trees()
-    trees["/"]["porttree"].settings = mysettings
-    portdb = trees["/"]["porttree"]
-    portdb.dbapi.settings = mysettings
-    portdb.dbapi.porttrees = [portage.portdb.porttree_root]
-    # does it make sense to remove _all_ useless stuff or just leave it as it is?
-    # portdb.dbapi._aux_cache_keys.clear()
-    # portdb.dbapi._aux_cache_keys.update(["EAPI", "KEYWORDS", "SLOT"])
+    # one config per arch, instead of switching ACCEPT_KEYWORDS back and forth
+    conf["target_dbapi"] = _arch_dbapi(mysettings, conf["TARGET_ARCH"])
+    conf["main_dbapi"] = _arch_dbapi(mysettings, conf["MAIN_ARCH"])
 
     conf["PORTDIR"] = portage.settings["PORTDIR"]
-    conf["portdb"] = portdb
 
     return conf
 
@@ -488,6 +529,34 @@ def main():
         help="just check in the specified category/categories (comma separated) [default: %default]",
     )
 
+    parser.add_option(
+        "-j",
+        "--jobs",
+        dest="jobs",
+        action="store",
+        type="int",
+        default=os.cpu_count() or 1,
+        metavar="JOBS",
+        help="number of processes to check the categories with [default: %default]",
+    )
+
+    parser.add_option(
+        "--profile",
+        dest="profile",
+        action="store",
+        default=None,
+        metavar="FILE",
+        help="write cProfile statistics to FILE",
+    )
+
+    parser.add_option(
+        "--timings",
+        dest="timings",
+        action="store_true",
+        default=False,
+        help="print the time spent per phase to stderr",
+    )
+
     (options, args) = parser.parse_args()
 
     if len(args) > 0:
@@ -533,12 +602,16 @@ def main():
 
     conf["MAINTAINER"] = options.maintainer
 
-    # append to our existing
-    conf = get_settings(conf)
-    pkgs = get_packages(conf)
-    pkgs = get_imlate(conf, pkgs)
+    instrument.configure(profile=options.profile, timings=options.timings)
+    with instrument.session("imlate"):
+        # append to our existing
+        with instrument.phase("settings"):
+            conf = get_settings(conf)
+        with instrument.phase("find imlate"):
+            pkgs = find_imlate(conf, options.jobs)
 
-    show_result(conf, pkgs)
+        with instrument.phase("output"):
+            show_result(conf, pkgs)
 
 
 if __name__ == "__main__":
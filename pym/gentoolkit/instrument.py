@@ -0,0 +1,260 @@
+# Copyright(c) 2026, Gentoo Foundation
+#
+# Licensed under the GNU General Public License, v2
+
+"""Profiling and phase timing shared by the gentoolkit tools.
+
+Every tool accepts --profile=FILE, which writes cProfile statistics of the
+run to FILE (read them with python -m pstats FILE), and --timings, which
+prints a table of the wall clock and CPU time spent in each phase of the
+run to stderr once it is done.
+
+Phases are marked in the code with L{phase}, as a context manager, or
+L{timed}, as a decorator. They nest, and a phase entered several times
+is reported once with the number of calls. Without --timings both are
+next to free:
+
+    >>> from gentoolkit import instrument
+    >>> with instrument.phase("parse CONTENTS"):
+    ...     pass
+
+The tools wrap their work in L{session}, which starts the profiler and
+reports the results. The first row of the table, startup, is the time
+spent before the session began: starting Python and importing Portage.
+"""
+
+__all__ = (
+    "Stopwatch",
+    "Timings",
+    "configure",
+    "phase",
+    "session",
+    "timed",
+)
+__docformat__ = "epytext"
+
+# =======
+# Imports
+# =======
+
+import os
+import sys
+import time
+from contextlib import contextmanager, nullcontext
+from functools import wraps
+
+# =======
+# Globals
+# =======
+
+_NULL_PHASE = nullcontext()
+
+# Timings of this run, or None if --timings was not given
+_timings = None
+
+# Where to write cProfile statistics, or None
+_profile = None
+
+# =======
+# Classes
+# =======
+
+
+class Stopwatch:
+    """Measure the wall clock time since creation or the last restart."""
+
+    def __init__(self):
+        self.restart()
+
+    def restart(self):
+        """Start measuring from now."""
+
+        self._start = time.perf_counter()
+
+    @property
+    def seconds(self):
+        """Elapsed time in seconds."""
+
+        return time.perf_counter() - self._start
+
+    @property
+    def milliseconds(self):
+        """Elapsed time in whole milliseconds."""
+
+        return int(round(self.seconds * 1000))
+
+
+class Timings:
+    """Wall clock and CPU time accounting per named phase.
+
+    CPU time is user plus system time of this process and of the child
+    processes it has waited for, so it includes worker processes.
+    """
+
+    def __init__(self):
+        # {name: [depth, calls, wall, cpu]}, in order of first entry
+        self.phases = {}
+        self._active = []
+
+    def add(self, name, wall, cpu, depth=0):
+        """Account wall and cpu seconds to a phase."""
+
+        entry = self._entry(name, depth)
+        entry[1] += 1
+        entry[2] += wall
+        entry[3] += cpu
+
+    @contextmanager
+    def phase(self, name):
+        """Account the time spent in the enclosed block to name."""
+
+        if name in self._active:
+            # Recursion, the outer call already accounts for it
+            yield
+            return
+        # Create the entry now, so that it is listed before nested phases
+        depth = len(self._active)
+        self._entry(name, depth)
+        self._active.append(name)
+        wall, cpu = time.perf_counter(), _cpu_time()
+        try:
+            yield
+        finally:
+            self._active.pop()
+            self.add(name, time.perf_counter() - wall, _cpu_time() - cpu, depth)
+
+    def _entry(self, name, depth):
+        try:
+            return self.phases[name]
+        except KeyError:
+            entry = self.phases[name] = [depth, 0, 0.0, 0.0]
+            return entry
+
+    def format(self):
+        """Return the timings as a table.
+
+        @rtype: str
+        """
+
+        lines = [" * Timings", "    wall s     cpu s    calls  phase"]
+        for name, (depth, calls, wall, cpu) in self.phases.items():
+            lines.append(
+                "%10.3f %9.3f %8d  %s%s" % (wall, cpu, calls, "  " * depth, name)
+            )
+        age = _process_age()
+        lines.append(
+            "%10s %9.3f %8s  total"
+            % ("-" if age is None else "%.3f" % age, _cpu_time(), "")
+        )
+        return "\n".join(lines) + "\n"
+
+
+# =========
+# Functions
+# =========
+
+
+def configure(profile=None, timings=None):
+    """Set up instrumentation from the command line options. Settings
+    given as None are left unchanged.
+
+    @type profile: str
+    @param profile: file to write cProfile statistics to, or "" for none
+    @type timings: bool
+    @param timings: collect and print per-phase timings
+    """
+
+    global _profile, _timings
+
+    if profile is not None:
+        _profile = profile or None
+    if timings is not None:
+        _timings = (_timings or Timings()) if timings else None
+
+
+def phase(name):
+    """Account the time spent in a block to a phase, if --timings is on.
+
+    @type name: str
+    @param name: phase name, as shown in the timings table
+    @rtype: context manager
+    """
+
+    if _timings is None:
+        return _NULL_PHASE
+    return _timings.phase(name)
+
+
+def timed(name):
+    """Decorate a function to account its calls to a phase.
+
+    @type name: str
+    @param name: phase name, as shown in the timings table
+    """
+
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if _timings is None:
+                return func(*args, **kwargs)
+            with _timings.phase(name):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+@contextmanager
+def session(name, out=None):
+    """Run the enclosed block as a tool's main work and report on it.
+
+    @type name: str
+    @param name: name of the top level phase, usually the tool's
+    @type out: file
+    @param out: where to print the timings table, defaults to sys.stderr
+    """
+
+    profiler = None
+    if _timings is not None and "startup" not in _timings.phases:
+        age = _process_age()
+        _timings.add("startup", 0.0 if age is None else age, _cpu_time())
+    if _profile is not None:
+        import cProfile
+
+        profiler = cProfile.Profile()
+        profiler.enable()
+    try:
+        with phase(name):
+            yield
+    finally:
+        if profiler is not None:
+            profiler.disable()
+            try:
+                profiler.dump_stats(_profile)
+            except OSError as err:
+                sys.stderr.write("Could not write profile %s: %s\n" % (_profile, err))
+        if _timings is not None:
+            (out or sys.stderr).write(_timings.format())
+
+
+def _cpu_time():
+    times = os.times()
+    return times.user + times.system + times.children_user + times.children_system
+
+
+def _process_age():
+    """Return the wall clock seconds since this process started, or None."""
+
+    try:
+        with open("/proc/self/stat") as stat:
+            # Field 22, counted after the parenthesized command name
+            start = int(stat.read().rsplit(")", 1)[1].split()[19])
+        with open("/proc/uptime") as uptime:
+            now = float(uptime.read().split()[0])
+        return now - start / os.sysconf("SC_CLK_TCK")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+# vim: set ts=4 sw=4 tw=79:
@@ -0,0 +1,256 @@
+# Copyright(c) 2026, Gentoo Foundation
+#
+# Licensed under the GNU General Public License, v2
+
+"""The KEYWORDS of every ebuild of a repository, queried by arch.
+
+A L{KeywordMatrix} reads KEYWORDS from the repository's md5-cache and keeps,
+for each arch, one bitset of the ebuilds keyworded stable, testing (~arch)
+or disabled (-arch) on it, bit i standing for the i-th ebuild. Questions
+about the whole repository then come down to a few operations on integers:
+
+    >>> from gentoolkit.keywordmatrix import KeywordMatrix
+    >>> matrix = KeywordMatrix('/var/db/repos/gentoo').load()
+    >>> matrix.select(matrix.query('amd64 & !arm64'))[:2]
+    ['acct-group/abrt-0-r3', 'acct-group/adm-0-r2']
+
+A query combines terms with & (and), | (or), ! (not) and parentheses. A
+term is an arch for stable keywords, ~arch for testing ones, -arch for
+disabled ones, ?arch for any of the three, -* for ebuilds with -* in
+KEYWORDS, and * for all ebuilds. The ebuilds lacking ~riscv are
+"!~riscv", those not keyworded on riscv at all "!?riscv".
+
+The md5-cache is what egencache generated, changes to ebuilds made since
+are not seen.
+"""
+
+__all__ = ("KeywordMatrix",)
+__docformat__ = "epytext"
+
+# =======
+# Imports
+# =======
+
+import os
+import re
+
+from portage.versions import catpkgsplit
+
+from gentoolkit import instrument
+from gentoolkit.profile import load_profile_data
+
+# =======
+# Globals
+# =======
+
+_TOKEN_RE = re.compile(r"\s*([()&|!]|[^\s()&|!]+)")
+
+# =======
+# Classes
+# =======
+
+
+class KeywordMatrix:
+    """KEYWORDS of the ebuilds of a repository as bitsets per arch
+
+    @type location: str
+    @param location: the repository's directory
+    @type arches: list
+    @param arches: the arches to accept in queries, defaults to those of
+            the repository's profiles
+    """
+
+    def __init__(self, location, arches=None):
+        self.location = location
+        if arches is None:
+            arches = [arch for arch in load_profile_data(portdir=location)]
+        self.arches = [arch for arch in arches if arch != "all"]
+        # ['cat/pkg-ver', ...], the ebuild of each bit
+        self.cpvs = []
+        # {arch: bitset}
+        self.stable = {}
+        self.testing = {}
+        self.disabled = {}
+        # ebuilds with -*
+        self.disabled_all = 0
+
+    def load(self):
+        """Read the KEYWORDS of every ebuild from the md5-cache.
+
+        @rtype: L{KeywordMatrix}
+        @return: self
+        """
+
+        cache_dir = os.path.join(self.location, "metadata", "md5-cache")
+        with instrument.phase("load keyword matrix"):
+            try:
+                categories = sorted(os.listdir(cache_dir))
+            except OSError:
+                categories = []
+            for cat in categories:
+                try:
+                    entries = sorted(os.listdir(os.path.join(cache_dir, cat)))
+                except OSError:
+                    continue
+                for pf in entries:
+                    keywords = _read_keywords(os.path.join(cache_dir, cat, pf))
+                    if keywords is not None:
+                        self.add("%s/%s" % (cat, pf), keywords)
+        return self
+
+    def add(self, cpv, keywords):
+        """Add an ebuild to the matrix.
+
+        @type cpv: str
+        @param cpv: cat/pkg-ver of the ebuild
+        @type keywords: str
+        @param keywords: its KEYWORDS
+        """
+
+        bit = 1 << len(self.cpvs)
+        self.cpvs.append(cpv)
+        for keyword in keywords.split():
+            if keyword == "-*":
+                self.disabled_all |= bit
+            elif keyword[0] == "~":
+                self.testing[keyword[1:]] = self.testing.get(keyword[1:], 0) | bit
+            elif keyword[0] == "-":
+                self.disabled[keyword[1:]] = self.disabled.get(keyword[1:], 0) | bit
+            else:
+                self.stable[keyword] = self.stable.get(keyword, 0) | bit
+
+    def all(self):
+        """Return the bitset of all ebuilds.
+
+        @rtype: int
+        """
+
+        return (1 << len(self.cpvs)) - 1
+
+    def query(self, expression):
+        """Return the bitset of the ebuilds matching a query.
+
+        @type expression: str
+        @param expression: e.g. '~amd64 & !?riscv', see the module's
+                documentation
+        @rtype: int
+        @raise ValueError: on syntax errors and unknown arches
+        """
+
+        tokens = _TOKEN_RE.findall(expression)
+        bits, pos = self._parse_or(tokens, 0)
+        if pos != len(tokens):
+            raise ValueError("invalid query: %s" % expression)
+        return bits
+
+    def select(self, bits):
+        """Return the ebuilds of a bitset.
+
+        @type bits: int
+        @rtype: list
+        @return: ['cat/pkg-ver', ...] in the order of L{cpvs}
+        """
+
+        # One character per bit, lowest first
+        flags = bin(bits)[:1:-1]
+        return [cpv for cpv, flag in zip(self.cpvs, flags) if flag == "1"]
+
+    def ebuilds(self, bits):
+        """Return the paths of the ebuilds of a bitset.
+
+        Ebuilds removed since the md5-cache was generated are left out.
+
+        @type bits: int
+        @rtype: list
+        """
+
+        paths = []
+        for cpv in self.select(bits):
+            cat, pkg = catpkgsplit(cpv)[:2]
+            pf = cpv.split("/", 1)[1]
+            path = os.path.join(self.location, cat, pkg, pf + ".ebuild")
+            if os.path.exists(path):
+                paths.append(path)
+        return paths
+
+    def _term(self, token):
+        if token == "*":
+            return self.all()
+        if token == "-*":
+            return self.disabled_all
+        prefix = token[0] if token[0] in "~-?" else ""
+        arch = token[len(prefix) :]
+        if arch not in self.arches and not any(
+            arch in table for table in (self.stable, self.testing, self.disabled)
+        ):
+            raise ValueError("unknown arch: %s" % arch)
+        if prefix == "~":
+            return self.testing.get(arch, 0)
+        if prefix == "-":
+            return self.disabled.get(arch, 0)
+        if prefix == "?":
+            return (
+                self.stable.get(arch, 0)
+                | self.testing.get(arch, 0)
+                | self.disabled.get(arch, 0)
+            )
+        return self.stable.get(arch, 0)
+
+    def _parse_or(self, tokens, pos):
+        bits, pos = self._parse_and(tokens, pos)
+        while pos < len(tokens) and tokens[pos] == "|":
+            other, pos = self._parse_and(tokens, pos + 1)
+            bits |= other
+        return bits, pos
+
+    def _parse_and(self, tokens, pos):
+        bits, pos = self._parse_not(tokens, pos)
+        while pos < len(tokens) and tokens[pos] == "&":
+            other, pos = self._parse_not(tokens, pos + 1)
+            bits &= other
+        return bits, pos
+
+    def _parse_not(self, tokens, pos):
+        if pos >= len(tokens):
+            raise ValueError("incomplete query")
+        token = tokens[pos]
+        if token == "!":
+            bits, pos = self._parse_not(tokens, pos + 1)
+            return self.all() & ~bits, pos
+        if token == "(":
+            bits, pos = self._parse_or(tokens, pos + 1)
+            if pos >= len(tokens) or tokens[pos] != ")":
+                raise ValueError("missing ')' in query")
+            return bits, pos + 1
+        if token in ")&|":
+            raise ValueError("unexpected '%s' in query" % token)
+        return self._term(token), pos + 1
+
+
+# =========
+# Functions
+# =========
+
+
+def _read_keywords(path):
+    """Return the KEYWORDS of an md5-cache entry, or None if unreadable."""
+
+    try:
+        with open(path, "rb") as entry:
+            data = entry.read()
+    except OSError:
+        return None
+    if data.startswith(b"KEYWORDS="):
+        start = 9
+    else:
+        start = data.find(b"\nKEYWORDS=")
+        if start < 0:
+            return ""
+        start += 10
+    end = data.find(b"\n", start)
+    if end < 0:
+        end = len(data)
+    return data[start:end].decode("utf-8", "replace")
+
+
+# vim: set ts=4 sw=4 tw=79:
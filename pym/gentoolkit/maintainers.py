@@ -0,0 +1,175 @@
+# Copyright(c) 2026, Gentoo Foundation
+#
+# Licensed under the GNU General Public License, v2
+
+"""An index of the packages of a repository by maintainer.
+
+The index maps every cat/pkg of a repository to the email addresses of the
+maintainers, people and projects alike, in its metadata.xml. It is built
+from the maintainers kept by the L{gentoolkit.metadata.MetadataCache}, so
+only the files that changed since they were cached are parsed:
+
+    >>> from gentoolkit.maintainers import MaintainerIndex
+    >>> index = MaintainerIndex('/var/db/repos/gentoo').refresh()
+    >>> index.find(['python@gentoo.org'])[:2]
+    ['app-admin/awscli', 'app-admin/pass_import']
+    >>> index.save()
+"""
+
+__all__ = ("MaintainerIndex", "match_maintainers")
+__docformat__ = "epytext"
+
+# =======
+# Imports
+# =======
+
+import os
+
+from gentoolkit import errors, instrument
+from gentoolkit.metadata import (
+    MetaData,
+    get_metadata_cache,
+    load_repository,
+    repository_files,
+)
+
+# =======
+# Globals
+# =======
+
+# The fields of metadata.xml the index is built from
+FIELDS = ("maintainers", "upstream")
+
+# =======
+# Classes
+# =======
+
+
+class MaintainerIndex:
+    """cat/pkg keys of a repository by the maintainers in their metadata.xml
+
+    @type location: str
+    @param location: the repository's directory
+    """
+
+    def __init__(self, location):
+        self.location = location
+        # {cp: ([email, ...], [upstream email, ...])}
+        self.entries = {}
+
+    def refresh(self):
+        """Bring the index up to date with the repository.
+
+        @rtype: L{MaintainerIndex}
+        @return: self
+        @raise GentoolkitFatalError: if a metadata.xml is not valid XML
+        """
+
+        with instrument.phase("refresh maintainer index"):
+            files = repository_files(self.location)
+            # Parse the files not cached yet in parallel first
+            load_repository(self.location, fields=FIELDS, files=files)
+            cache = get_metadata_cache()
+            prefix = os.path.join(self.location, "")
+            entries = {}
+            for path, stamp in files:
+                fields = cache.get(path, stamp)
+                if fields is None or not all(field in fields for field in FIELDS):
+                    fields = _parse(path)
+                    if fields is None:
+                        # Removed since
+                        continue
+                upstream = []
+                for up in fields["upstream"]:
+                    upstream.extend(_emails(up["maintainers"]))
+                cp = os.path.dirname(path)[len(prefix) :]
+                entries[cp] = (_emails(fields["maintainers"]), upstream)
+            self.entries = entries
+        return self
+
+    def find(self, contacts, upstream=False):
+        """Find the packages maintained by any of contacts.
+
+        @type contacts: list
+        @param contacts: email addresses, or their beginnings
+        @type upstream: bool
+        @param upstream: also search the upstream maintainers
+        @rtype: list
+        @return: sorted cat/pkg keys
+        """
+
+        contacts = list(contacts)
+        return sorted(
+            cp
+            for cp, (emails, upstream_emails) in self.entries.items()
+            if match_maintainers(
+                contacts, emails + upstream_emails if upstream else emails
+            )
+        )
+
+    def maintainers(self, cp):
+        """Return the email addresses of the maintainers of cp.
+
+        @rtype: list
+        """
+
+        try:
+            return list(self.entries[cp][0])
+        except KeyError:
+            return []
+
+    def save(self):
+        """Write the maintainers parsed by L{refresh} to the metadata
+        cache."""
+
+        get_metadata_cache().save()
+
+
+# =========
+# Functions
+# =========
+
+
+def match_maintainers(contacts, emails):
+    """Return whether any email address starts with any of contacts.
+
+    An empty contact matches every package, including one without
+    maintainers.
+
+    @type contacts: list
+    @param contacts: email addresses, or their beginnings
+    @type emails: list
+    @param emails: email addresses of a package's maintainers
+    @rtype: bool
+    """
+
+    if not emails:
+        return not any(contacts)
+    return any(email.startswith(contact) for email in emails for contact in contacts)
+
+
+def _emails(maintainers):
+    """Return the email addresses of maintainers in the form kept by the
+    L{gentoolkit.metadata.MetadataCache}."""
+
+    return [maint["email"] for maint in maintainers if maint.get("email")]
+
+
+def _parse(path):
+    """Parse the fields of a metadata.xml that load_repository() could
+    not, to report why.
+
+    @rtype: dict or None
+    @return: the fields, or None if the file was removed
+    @raise GentoolkitFatalError: if the file is not valid XML
+    """
+
+    try:
+        return MetaData(path).fields()
+    except SyntaxError as err:
+        raise errors.GentoolkitFatalError("%s: %s" % (path, err))
+    except OSError:
+        return None
+
+
+# vim: set ts=4 sw=4 tw=79:
@@ -30,17 +30,55 @@
      'remoteids': [('espeak-ng/espeak-ng', 'github')]}>]
     >>> upstream[0].maintainers[0].name
     'Reece H. Dunn'
+
+The fields read from every metadata.xml are kept in a L{MetadataCache}
+in gentoolkit's cache directory, validated by the file's mtime and size,
+so that other runs do not have to parse it again for them. L{load_repository}
+warms it for a whole repository with several processes.
 """
 
-__all__ = ("MetaData",)
+__all__ = (
+    "MetaData",
+    "MetadataCache",
+    "clear_metadata_cache",
+    "get_metadata_cache",
+    "load_repository",
+    "repository_files",
+)
 __docformat__ = "epytext"
 
 # =======
 # Imports
 # =======
 
+import json
+import mmap
+import os
 import re
 import xml.etree.cElementTree as etree
+from functools import partial
+
+from gentoolkit.helpers import (
+    find_sorted_line,
+    fork_map,
+    get_cache_path,
+    write_cache_file,
+)
+
+# =======
+# Globals
+# =======
+
+_MAGIC = b"gentoolkit-metadata 1\n"
+
+# The fields kept by the MetadataCache, named after the MetaData methods
+# which return them
+FIELDS = ("descriptions", "maintainers", "use", "upstream")
+
+# Fewest files worth handing to a worker process of load_repository()
+MIN_CHUNK_SIZE = 200
+
+_metadata_cache = None
 
 # =======
 # Classes
@@ -170,7 +208,8 @@ class MetaData:
     """Access metadata.xml"""
 
     def __init__(self, metadata_path):
-        """Parse a valid metadata.xml file.
+        """Parse a valid metadata.xml file, unless the L{MetadataCache}
+        has fields of it.
 
         @type metadata_path: str
         @param metadata_path: path to a valid metadata.xml file
@@ -178,7 +217,11 @@ class MetaData:
         """
 
         self.metadata_path = metadata_path
-        self._xml_tree = etree.parse(metadata_path)
+        st = os.stat(metadata_path)
+        self._stamp = (st.st_mtime_ns, st.st_size)
+        self._tree = None
+        if get_metadata_cache().get(metadata_path, self._stamp) is None:
+            self._tree = etree.parse(metadata_path)
 
         # Used for caching
         self._descriptions = None
@@ -189,6 +232,34 @@ class MetaData:
     def __repr__(self):
         return "<%s %r>" % (self.__class__.__name__, self.metadata_path)
 
+    @property
+    def _xml_tree(self):
+        if self._tree is None:
+            self._tree = etree.parse(self.metadata_path)
+        return self._tree
+
+    def _cached(self, field):
+        """Return a field in the form kept by the L{MetadataCache}, or
+        None if it is not cached."""
+
+        fields = get_metadata_cache().get(self.metadata_path, self._stamp)
+        if fields is None:
+            return None
+        return fields.get(field)
+
+    def _cache(self, field, value):
+        get_metadata_cache().store(self.metadata_path, self._stamp, field, value)
+
+    def fields(self):
+        """Return all fields, in the form kept by the L{MetadataCache}.
+
+        @rtype: dict
+        """
+
+        for field in FIELDS:
+            getattr(self, field)()
+        return {field: self._cached(field) for field in FIELDS}
+
     def descriptions(self):
         """Return a list of text nodes for <longdescription>.
 
@@ -200,8 +271,11 @@ class MetaData:
         if self._descriptions is not None:
             return self._descriptions
 
-        long_descriptions = self._xml_tree.findall("longdescription")
-        self._descriptions = [e.text for e in long_descriptions]
+        self._descriptions = self._cached("descriptions")
+        if self._descriptions is None:
+            long_descriptions = self._xml_tree.findall("longdescription")
+            self._descriptions = [e.text for e in long_descriptions]
+            self._cache("descriptions", self._descriptions)
         return self._descriptions
 
     def maintainers(self):
@@ -214,10 +288,16 @@ class MetaData:
         if self._maintainers is not None:
             return self._maintainers
 
+        cached = self._cached("maintainers")
+        if cached is not None:
+            self._maintainers = [_restore(_Maintainer, m) for m in cached]
+            return self._maintainers
+
         self._maintainers = []
         for node in self._xml_tree.findall("maintainer"):
             self._maintainers.append(_Maintainer(node))
 
+        self._cache("maintainers", [vars(maint) for maint in self._maintainers])
         return self._maintainers
 
     def use(self):
@@ -230,10 +310,16 @@ class MetaData:
         if self._useflags is not None:
             return self._useflags
 
+        cached = self._cached("use")
+        if cached is not None:
+            self._useflags = [_restore(_Useflag, flag) for flag in cached]
+            return self._useflags
+
         self._useflags = []
         for node in self._xml_tree.iter("flag"):
             self._useflags.append(_Useflag(node))
 
+        self._cache("use", [vars(flag) for flag in self._useflags])
         return self._useflags
 
     def upstream(self):
@@ -246,11 +332,300 @@ class MetaData:
         if self._upstream is not None:
             return self._upstream
 
+        cached = self._cached("upstream")
+        if cached is not None:
+            self._upstream = [_restore_upstream(upstream) for upstream in cached]
+            return self._upstream
+
         self._upstream = []
         for node in self._xml_tree.findall("upstream"):
             self._upstream.append(_Upstream(node))
 
+        self._cache(
+            "upstream",
+            [
+                {
+                    "maintainers": [vars(maint) for maint in upstream.maintainers],
+                    "changelogs": upstream.changelogs,
+                    "docs": upstream.docs,
+                    "bugtrackers": upstream.bugtrackers,
+                    "remoteids": upstream.remoteids,
+                }
+                for upstream in self._upstream
+            ],
+        )
         return self._upstream
 
 
+class MetadataCache:
+    """The fields of parsed metadata.xml files, kept between runs.
+
+    Each field is cached when it is first read from a file, see
+    L{MetaData}. The file starts with a header line, followed by one line per
+    metadata.xml, "PATH<tab>MTIME_NS<tab>SIZE<tab>FIELDS", sorted by path,
+    with the fields as JSON. It is memory mapped and binary searched, so
+    a lookup only reads the line it needs. Files parsed in this run are
+    added with the next L{save}.
+
+    @type path: str
+    @param path: the cache file, defaults to metadata.idx in gentoolkit's
+            cache directory
+    """
+
+    def __init__(self, path=None):
+        self.path = path or get_cache_path("metadata.idx")
+        # {metadata.xml path: (mtime_ns, size, fields)} parsed in this run
+        self.parsed = {}
+        # The same, of entries read from the file in this run
+        self._read = {}
+        self._mmap = None
+        self._start = 0
+        self._load()
+
+    def get(self, path, stamp):
+        """Return the cached fields of path, or None if missing or stale.
+        Only the fields read from the file so far are cached.
+
+        @type stamp: tuple
+        @param stamp: (mtime_ns, size) of the file now
+        """
+
+        entry = self._entry(path)
+        if entry is None or entry[:2] != stamp:
+            return None
+        if isinstance(entry[2], str):
+            entry = self._read[path] = entry[:2] + (json.loads(entry[2]),)
+        return entry[2]
+
+    def is_current(self, path, stamp, fields=()):
+        """Return whether the cached fields of path are up to date.
+
+        @type stamp: tuple
+        @param stamp: (mtime_ns, size) of the file now
+        @type fields: tuple
+        @param fields: names of fields which must be cached too
+        """
+
+        cached = self.get(path, stamp)
+        return cached is not None and all(field in cached for field in fields)
+
+    def store(self, path, stamp, field, value):
+        """Cache one field of path, which was read at stamp.
+
+        @type stamp: tuple
+        @param stamp: (mtime_ns, size) of the file when read
+        """
+
+        entry = self.parsed.get(path)
+        if entry is None or entry[:2] != stamp:
+            fields = dict(self.get(path, stamp) or {})
+            entry = self.parsed[path] = stamp + (fields,)
+        entry[2][field] = value
+
+    def _entry(self, path):
+        """Return (mtime_ns, size, fields) of path, with the fields still
+        as JSON if not decoded yet, or None if not cached."""
+
+        entry = self.parsed.get(path) or self._read.get(path)
+        if entry is not None or self._mmap is None:
+            return entry
+        key = path.encode("utf-8") + b"\t"
+        start = find_sorted_line(self._mmap, key, self._start)
+        if self._mmap[start : start + len(key)] != key:
+            return None
+        end = self._mmap.find(b"\n", start)
+        line = self._mmap[start + len(key) : end].decode("utf-8")
+        mtime, size, fields = line.split("\t", 2)
+        entry = self._read[path] = (int(mtime), int(size), fields)
+        return entry
+
+    def read_all(self):
+        """Read every entry of the cache file now, instead of looking
+        them up one by one when needed."""
+
+        if self._mmap is None:
+            return
+        for line in self._mmap[self._start :].decode("utf-8").splitlines():
+            path, mtime, size, fields = line.split("\t", 3)
+            if path not in self._read:
+                self._read[path] = (int(mtime), int(size), fields)
+
+    def save(self):
+        """Add the files parsed in this run to the cache file."""
+
+        if not self.parsed:
+            return
+        lines = {}
+        for path, (mtime, size, fields) in self.parsed.items():
+            lines[path.encode("utf-8")] = (
+                "%s\t%d\t%d\t%s\n"
+                % (path, mtime, size, json.dumps(fields, separators=(",", ":")))
+            ).encode("utf-8")
+        if self._mmap is not None:
+            self._mmap.seek(self._start)
+            for line in iter(self._mmap.readline, b""):
+                lines.setdefault(line.split(b"\t", 1)[0], line)
+
+        def write(cache):
+            cache.write(_MAGIC)
+            for key in sorted(lines):
+                cache.write(lines[key])
+
+        if not write_cache_file(self.path, write, binary=True):
+            return
+        self.parsed.clear()
+        self._read.clear()
+        self._load()
+
+    def _load(self):
+        self._mmap = None
+        try:
+            with open(self.path, "rb") as cache:
+                if cache.readline() != _MAGIC:
+                    return
+                self._start = cache.tell()
+                self._mmap = mmap.mmap(cache.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            return
+
+
+# =========
+# Functions
+# =========
+
+
+def get_metadata_cache():
+    """Return the L{MetadataCache} used by L{MetaData}.
+
+    The cache is loaded on first use and reused for the rest of the
+    process.
+
+    @rtype: L{MetadataCache}
+    """
+
+    global _metadata_cache
+
+    if _metadata_cache is None:
+        _metadata_cache = MetadataCache()
+    return _metadata_cache
+
+
+def clear_metadata_cache():
+    """Forget the loaded L{MetadataCache}, without saving it."""
+
+    global _metadata_cache
+
+    _metadata_cache = None
+
+
+def repository_files(location):
+    """List the metadata.xml of every package of a repository.
+
+    @type location: str
+    @param location: the repository's directory
+    @rtype: list
+    @return: sorted (path, (mtime_ns, size)) tuples
+    """
+
+    files = []
+    for category in _listdir(location):
+        for package in _listdir(category.path):
+            path = os.path.join(package.path, "metadata.xml")
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            files.append((path, (st.st_mtime_ns, st.st_size)))
+    files.sort()
+    return files
+
+
+def load_repository(location, jobs=None, fields=FIELDS, files=None):
+    """Parse the metadata.xml of every package of a repository into the
+    L{MetadataCache}, if not cached yet.
+
+    @type location: str
+    @param location: the repository's directory
+    @type jobs: int
+    @param jobs: number of processes to parse with, defaults to the
+            number of CPUs
+    @type fields: tuple
+    @param fields: names of the fields to cache, see L{FIELDS}
+    @type files: list
+    @param files: the result of L{repository_files}, if already listed
+    @rtype: int
+    @return: the number of files parsed
+    """
+
+    if files is None:
+        files = repository_files(location)
+    cache = get_metadata_cache()
+    # Cheaper than looking up most of them one by one
+    cache.read_all()
+    stale = [path for path, stamp in files if not cache.is_current(path, stamp, fields)]
+
+    parse = partial(_parse_fields, fields=fields)
+    results = fork_map(parse, stale, jobs or os.cpu_count() or 1, MIN_CHUNK_SIZE)
+    if results is None:
+        for path in stale:
+            parse(path)
+        return len(stale)
+
+    for path, entry in zip(stale, results):
+        if entry is not None:
+            cache.parsed[path] = entry
+    return len(stale)
+
+
+def _listdir(path):
+    """Return the directories in path, without hidden ones."""
+
+    try:
+        with os.scandir(path) as entries:
+            return [
+                entry
+                for entry in entries
+                if entry.is_dir() and not entry.name.startswith(".")
+            ]
+    except OSError:
+        return []
+
+
+def _parse_fields(path, fields):
+    """Parse fields of a metadata.xml into the cache.
+
+    @rtype: tuple
+    @return: the (mtime_ns, size, fields) cache entry, or None if the
+            file can not be parsed
+    """
+
+    try:
+        metadata = MetaData(path)
+        for field in fields:
+            getattr(metadata, field)()
+    except (OSError, SyntaxError):
+        # Not valid XML, the error is raised again when it is used
+        return None
+    return get_metadata_cache().parsed.get(path)
+
+
+def _restore(cls, fields):
+    """Create an instance of cls with the attributes in fields."""
+
+    obj = cls.__new__(cls)
+    obj.__dict__.update(fields)
+    return obj
+
+
+def _restore_upstream(fields):
+    """Create an L{_Upstream} from its form in the L{MetadataCache}."""
+
+    upstream = _restore(_Upstream, fields)
+    upstream.node = None
+    upstream.maintainers = [_restore(_Maintainer, m) for m in upstream.maintainers]
+    upstream.docs = [tuple(doc) for doc in upstream.docs]
+    upstream.remoteids = [tuple(remoteid) for remoteid in upstream.remoteids]
+    return upstream
+
+
 # vim: set ts=4 sw=4 tw=79:
@@ -51,14 +51,16 @@ from string import Template
 
 import portage
 from portage.util import LazyItemsDict
-from portage import _encodings, _unicode_encode
 
 import gentoolkit.pprinter as pp
 from gentoolkit import errors
+from gentoolkit import instrument
+from gentoolkit.contents import get_contents
 from gentoolkit.cpv import CPV
 from gentoolkit.keyword import determine_keyword
 from gentoolkit.flag import get_flags
 from gentoolkit.eprefix import EPREFIX
+from gentoolkit.sizes import stat_files
 
 # =======
 # Settings
@@ -362,52 +364,49 @@ class Package(CPV):
         iuse, final_flags = get_flags(self.cpv, final_setting=True)
         return final_flags
 
+    @instrument.timed("read CONTENTS")
     def parsed_contents(self, prefix_root=False):
         """Returns the parsed CONTENTS file.
 
+        The CONTENTS file is parsed once per process, see
+        L{gentoolkit.contents.get_contents}, and each call returns a new
+        copy of it which the caller may modify.
+
+        @type prefix_root: bool
+        @param prefix_root: prepend ROOT to the paths
         @rtype: dict
-        @return: {'/full/path/to/obj': ['type', 'timestamp', 'md5sum'], ...}
+        @return: {'/full/path/to/obj': ('type', 'timestamp', 'md5sum'), ...},
+                like portage.dblink.getcontents()
         """
 
-        contents = self.dblink.getcontents()
+        return dict(self._contents(prefix_root))
 
-        # Portage will automatically prepend ROOT.  Undo that.
-        if not prefix_root:
-            myroot = self._settings["ROOT"]
-            if myroot != "/":
-                ret = {}
-                for key, val in self.dblink.getcontents().items():
-                    ret["/" + os.path.relpath(key, myroot)] = val
-                contents = ret
+    def _contents(self, prefix_root=False):
+        """Return the parsed CONTENTS file shared by the whole process,
+        with tuple entries, which must not be modified."""
 
-        return contents
+        vardb = portage.db[portage.root]["vartree"].dbapi
+        root = self._settings["ROOT"] if prefix_root else os.sep
+        return get_contents(
+            vardb.getpath(self.cpv, filename="CONTENTS"),
+            root,
+            self._settings["EPREFIX"],
+        )
 
+    @instrument.timed("stat files")
     def size(self):
         """Estimates the installed size of the contents of this package.
 
+        Files shared with other packages are counted too, see
+        L{gentoolkit.sizes.SizeIndex} for sizes which add up over packages.
+
         @rtype: tuple
         @return: (size, number of files in total, number of uncounted files)
         """
 
-        seen = set()
-        size = n_files = n_uncounted = 0
-        for path in self.parsed_contents(prefix_root=True):
-            try:
-                st = os.lstat(_unicode_encode(path, encoding=_encodings["fs"]))
-            except OSError:
-                continue
-
-            # Remove hardlinks by checking for duplicate inodes. Bug #301026.
-            file_inode = st.st_ino
-            if file_inode in seen:
-                continue
-            seen.add(file_inode)
-
-            try:
-                size += st.st_size
-                n_files += 1
-            except OSError:
-                n_uncounted += 1
+        n_uncounted, inodes = stat_files(self._contents(prefix_root=True))
+        size = sum(sum(values[1::2]) for values in inodes.values())
+        n_files = sum(len(values) // 2 for values in inodes.values())
 
         return (size, n_files, n_uncounted)
 
@@ -556,6 +555,23 @@ class PackageFormatter:
 
         return "".join(result)
 
+    def record(self):
+        """Describe the package as a record for machine-readable output.
+
+        @rtype: dict
+        @return: {'cpv': str, 'location': str (see format_package_location),
+                'mask': list or None (see format_mask_status), 'slot': str,
+                'repo': str}
+        """
+
+        return {
+            "cpv": str(self.pkg.cpv),
+            "location": self.location,
+            "mask": self.pkg.mask_status(),
+            "slot": self.pkg.environment("SLOT"),
+            "repo": self.pkg.repo_name(),
+        }
+
     def format_mask_status(self):
         """Get the mask status of a given package.
 
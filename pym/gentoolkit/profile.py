@@ -9,12 +9,21 @@
 __all__ = ("load_profile_data",)
 
 
+import json
 import os.path
 import portage
 import sys
 
 from portage import _encodings, _unicode_encode
 
+from gentoolkit.helpers import get_cache_path, write_cache_file
+
+# The files load_profile_data reads, relative to the repository
+PROFILE_FILES = ("arch.list", "profiles.desc", "arches.desc")
+
+# {portdir: [stamps, arch_status]} loaded in this process
+_profile_data = {}
+
 
 def warning(msg):
     """Write |msg| as a warning to stderr"""
@@ -24,6 +33,9 @@ def warning(msg):
 def load_profile_data(portdir=None, repo="gentoo"):
     """Load the list of known arches from the tree
 
+    The result is cached in gentoolkit's cache directory, and reused for as
+    long as the profile files of the repository do not change.
+
     Args:
       portdir: The repository to load all data from (and ignore |repo|)
       repo: Look up this repository by name to locate profile data
@@ -37,6 +49,55 @@ def load_profile_data(portdir=None, repo="gentoo"):
             portage.db[portage.root]["vartree"].settings.repositories[repo].location
         )
 
+    stamps = _profile_stamps(portdir)
+    cached = _profile_data.get(portdir)
+    if cached is None:
+        cached = _read_profile_cache().get(portdir)
+    if cached is not None and cached[0] == stamps:
+        _profile_data[portdir] = cached
+        return {arch: tuple(status) for arch, status in cached[1].items()}
+
+    arch_status = _read_profile_data(portdir)
+    if arch_status:
+        # Without any profile files there are warnings to show every time
+        _profile_data[portdir] = [stamps, arch_status]
+        _write_profile_cache(portdir, stamps, arch_status)
+    return dict(arch_status)
+
+
+def _profile_stamps(portdir):
+    """Return the [mtime_ns, size] of each of PROFILE_FILES, or None"""
+    stamps = []
+    for name in PROFILE_FILES:
+        try:
+            st = os.stat(os.path.join(portdir, "profiles", name))
+        except OSError:
+            stamps.append(None)
+        else:
+            stamps.append([st.st_mtime_ns, st.st_size])
+    return stamps
+
+
+def _read_profile_cache():
+    """Return the cached {portdir: [stamps, arch_status]} of all repositories"""
+    try:
+        with open(get_cache_path("profile-data.json"), encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return data if isinstance(data, dict) else {}
+
+
+def _write_profile_cache(portdir, stamps, arch_status):
+    """Update the cached profile data of |portdir|"""
+    path = get_cache_path("profile-data.json")
+    data = _read_profile_cache()
+    data[portdir] = [stamps, arch_status]
+    write_cache_file(path, lambda f: json.dump(data, f, separators=(",", ":")))
+
+
+def _read_profile_data(portdir):
+    """Read the arch status of load_profile_data from the profile files"""
     arch_status = {}
 
     try:
@@ -6,7 +6,7 @@
 
 """Provides common methods on a package query."""
 
-__all__ = ("Query",)
+__all__ = ("Query", "QueryBatch")
 
 # =======
 # Imports
@@ -15,13 +15,15 @@ __all__ = ("Query",)
 import fnmatch
 import re
 from functools import partial
-from string import ascii_letters, digits
+from string import ascii_letters, ascii_lowercase, digits
 
 import portage
+from portage.versions import cpv_getkey
 
 from gentoolkit import CONFIG
 from gentoolkit import errors
 from gentoolkit import helpers
+from gentoolkit import instrument
 from gentoolkit import pprinter as pp
 from gentoolkit.atom import Atom
 from gentoolkit.cpv import CPV
@@ -107,6 +109,7 @@ class Query(CPV):
 
         pp.uprint(" * Searching%s for %s %s..." % (repo, pkg_str, cat_str))
 
+    @instrument.timed("find packages")
     def smart_find(
         self,
         in_installed=True,
@@ -138,24 +141,23 @@ class Query(CPV):
                 simple_package_finder = partial(
                     self.find, include_masked=include_masked
                 )
-                complex_package_finder = helpers.get_cpvs
             else:
                 simple_package_finder = self.find_installed
-                complex_package_finder = helpers.get_installed_cpvs
         elif in_porttree or in_overlay:
             simple_package_finder = partial(
                 self.find, include_masked=include_masked, in_installed=False
             )
-            complex_package_finder = helpers.get_uninstalled_cpvs
-        else:
-            raise errors.GentoolkitFatalError(
-                "Not searching in installed, Portage tree, or overlay. "
-                "Nothing to do."
-            )
+        complex_package_finder = _get_complex_finder(
+            in_installed, in_porttree, in_overlay
+        )
 
         if self.query_type == "set":
-            self.package_finder = simple_package_finder
-            matches = self._do_set_lookup(show_progress=show_progress)
+            matches = self._do_set_lookup(
+                in_installed=in_installed,
+                in_porttree=in_porttree or in_overlay,
+                include_masked=include_masked,
+                show_progress=show_progress,
+            )
         elif self.query_type == "simple":
             self.package_finder = simple_package_finder
             matches = self._do_simple_lookup(
@@ -163,7 +165,22 @@ class Query(CPV):
             )
         else:
             self.package_finder = complex_package_finder
-            matches = self._do_complex_lookup(show_progress=show_progress)
+            matches = self._do_complex_lookup(
+                show_progress=show_progress, in_installed=in_installed
+            )
+
+        return self._filter_matches(
+            matches,
+            in_installed=in_installed,
+            in_porttree=in_porttree,
+            in_overlay=in_overlay,
+            no_matches_fatal=no_matches_fatal,
+        )
+
+    def _filter_matches(
+        self, matches, in_installed, in_porttree, in_overlay, no_matches_fatal
+    ):
+        """Apply the repository filter and check that something matched."""
 
         if self.repo_filter is not None:
             matches = self._filter_by_repository(matches)
@@ -306,7 +323,7 @@ class Query(CPV):
 
         return result
 
-    def _do_complex_lookup(self, show_progress=True):
+    def _do_complex_lookup(self, show_progress=True, in_installed=True):
         """Find matches for a query which is a regex or includes globbing."""
 
         result = []
@@ -314,27 +331,52 @@ class Query(CPV):
         if show_progress and not CONFIG["piping"]:
             self.print_summary()
 
+        cat_predicate, cp_predicate, predicate = self._get_complex_predicates(
+            in_installed=in_installed
+        )
+        result = self.package_finder(
+            predicate=predicate, cat_predicate=cat_predicate, cp_predicate=cp_predicate
+        )
+
+        return [Package(x) for x in result]
+
+    def _get_complex_predicates(self, in_installed=True):
+        """Return the predicates a regex or globbing query is matched with.
+
+        A repository filter is part of them, so that the packages of
+        other repositories are dropped while the cpvs are listed.
+
+        @type in_installed: bool
+        @param in_installed: whether installed packages are searched too,
+                otherwise only the cat/pkgs of the filtered repository are
+                listed
+        @rtype: tuple
+        @return: (cat_predicate, cp_predicate, predicate), either of the
+                first two may be None
+        """
+
         try:
             cat = CPV(self.query).category
         except errors.GentoolkitInvalidCPV:
             cat = ""
 
-        pre_filter = []
         # The "get_" functions can pre-filter against the whole package key,
         # but since we allow globbing now, we run into issues like:
         # >>> portage.dep.dep_getkey("sys-apps/portage-*")
         # 'sys-apps/portage-'
-        # So the only way to guarantee we don't overrun the key is to
-        # prefilter by cat only.
+        # So categories are matched against the category part of the query
+        # and, for globs, cat/pkg keys are kept only if the query can still
+        # match one of their versions (see _CPGlobFilter).
+        cat_predicate = None
         if cat:
             if self.is_regex:
                 cat_re = cat
             else:
                 cat_re = fnmatch.translate(cat)
-            predicate = lambda x: re.match(cat_re, x.split("/", 1)[0])
-            pre_filter = self.package_finder(predicate=predicate)
+            cat_predicate = lambda x: re.match(cat_re, x)
 
         # Post-filter
+        cp_predicate = None
         if self.is_regex:
             try:
                 re.compile(self.query)
@@ -343,50 +385,82 @@ class Query(CPV):
             predicate = lambda x: re.search(self.query, x)
         else:
             if cat:
-                query_re = fnmatch.translate(self.query)
+                query_glob = self.query
             else:
-                query_re = fnmatch.translate("*/%s" % self.query)
+                query_glob = "*/%s" % self.query
+            query_re = fnmatch.translate(query_glob)
             predicate = lambda x: re.search(query_re, x)
-        if pre_filter:
-            result = [x for x in pre_filter if predicate(x)]
-        else:
-            result = self.package_finder(predicate=predicate)
+            # re.search lets the match start anywhere in the cpv
+            cp_predicate = _CPGlobFilter("*" + query_glob)
 
-        return [Package(x) for x in result]
+        if self.repo_filter is not None:
+            cp_predicate, predicate = self._get_repository_predicates(
+                cp_predicate, predicate, in_installed
+            )
+
+        return (cat_predicate, cp_predicate, predicate)
+
+    def _get_repository_predicates(self, cp_predicate, predicate, in_installed):
+        """Add self.repo_filter to the cp and cpv predicates."""
+
+        repo_names = helpers.get_repo_names()
+        match_predicate = predicate
 
-    def _do_set_lookup(self, show_progress=True):
-        """Find matches for a query that is a package set."""
+        def predicate(cpv):
+            return match_predicate(cpv) and self._in_repository(repo_names(cpv))
+
+        if in_installed or self.repo_filter in ("unknown", "null"):
+            return cp_predicate, predicate
+
+        # Only packages of the repository itself can be from it
+        portdb = portage.db[portage.root]["porttree"].dbapi
+        location = portdb.getRepositoryPath(self.repo_filter)
+        repo_cps = set(portdb.cp_all(trees=[location])) if location else set()
+        match_cp_predicate = cp_predicate
+
+        def cp_predicate(cp):
+            return cp in repo_cps and (
+                match_cp_predicate is None or match_cp_predicate(cp)
+            )
+
+        return cp_predicate, predicate
+
+    def _in_repository(self, repo_name):
+        """Return True if a package of repo_name passes self.repo_filter."""
+
+        if repo_name == self.repo_filter:
+            return True
+        return not repo_name and self.repo_filter in ("unknown", "null")
+
+    def _do_set_lookup(
+        self,
+        in_installed=True,
+        in_porttree=True,
+        include_masked=True,
+        show_progress=True,
+    ):
+        """Find matches for a query that is a package set.
+
+        The atoms of the set are matched by cat/pkg, see L{_match_atoms}.
+        """
 
         if show_progress and not CONFIG["piping"]:
             self.print_summary()
 
         setname = self.query[len(SETPREFIX) :]
-        result = []
         try:
             atoms = get_set_atoms(setname)
         except errors.GentoolkitSetNotFound:
-            return result
+            return []
 
-        q = self.query
-        for atom in atoms:
-            self.query = str(atom)
-            result.extend(self._do_simple_lookup(show_progress=False))
-        self.query = q
-
-        return result
+        matches = _match_atoms(atoms, in_installed, in_porttree, include_masked)
+        return [Package(x) for x in sorted(matches)]
 
     def _filter_by_repository(self, matches):
         """Filter out packages which do not belong to self.repo_filter."""
 
-        result = []
-        for match in matches:
-            repo_name = match.repo_name()
-            if repo_name == self.repo_filter:
-                result.append(match)
-            elif not repo_name and self.repo_filter in ("unknown", "null"):
-                result.append(match)
-
-        return result
+        repo_names = helpers.get_repo_names().resolve(x.cpv for x in matches)
+        return [x for x in matches if self._in_repository(repo_names[x.cpv])]
 
     def _get_query_type(self):
         """Determine of what type the query is."""
@@ -396,3 +470,368 @@ class Query(CPV):
         elif self.is_regex or self.uses_globbing():
             return "complex"
         return "simple"
+
+
+class QueryBatch:
+    """Evaluate many queries at once.
+
+    Simple atoms and sets are still matched directly against the dbapis,
+    but all queries which use globbing or regexes are answered by a single
+    pass over the cpvs instead of one full walk per query.
+
+    Example usage:
+            >>> from gentoolkit.query import Query, QueryBatch
+            >>> batch = QueryBatch([Query('*python*'), Query('portage')])
+            >>> for query in batch:
+            ...     matches = batch.smart_find(query)
+
+    @see: L{Query.smart_find} for the keyword arguments.
+    """
+
+    def __init__(
+        self,
+        queries,
+        in_installed=True,
+        in_porttree=True,
+        in_overlay=True,
+        include_masked=True,
+        show_progress=True,
+        no_matches_fatal=True,
+        **kwargs
+    ):
+        self.queries = list(queries)
+        self.in_installed = in_installed
+        self.in_porttree = in_porttree
+        self.in_overlay = in_overlay
+        self.include_masked = include_masked
+        self.show_progress = show_progress
+        self.no_matches_fatal = no_matches_fatal
+
+        # Filled in on first use, keyed by id(query)
+        self._complex_matches = None
+
+    def __iter__(self):
+        return iter(self.queries)
+
+    def __len__(self):
+        return len(self.queries)
+
+    def smart_find(self, query):
+        """Return the matches for one of the queries of this batch.
+
+        @type query: L{Query}
+        @param query: a query, as found in self.queries
+        @rtype: list
+        @return: Package objects matching query
+        @raise errors.GentoolkitNoMatches: if no_matches_fatal and nothing
+                matched
+        """
+
+        if query.query_type != "complex" or not any(x is query for x in self.queries):
+            return query.smart_find(
+                in_installed=self.in_installed,
+                in_porttree=self.in_porttree,
+                in_overlay=self.in_overlay,
+                include_masked=self.include_masked,
+                show_progress=self.show_progress,
+                no_matches_fatal=self.no_matches_fatal,
+            )
+
+        if self._complex_matches is None:
+            self._complex_matches = self._find_complex()
+
+        if self.show_progress and not CONFIG["piping"]:
+            query.print_summary()
+
+        matches = [Package(x) for x in self._complex_matches[id(query)]]
+        return query._filter_matches(
+            matches,
+            in_installed=self.in_installed,
+            in_porttree=self.in_porttree,
+            in_overlay=self.in_overlay,
+            no_matches_fatal=self.no_matches_fatal,
+        )
+
+    @instrument.timed("find packages")
+    def _find_complex(self):
+        """Match all complex queries in one pass over the cpvs.
+
+        @rtype: dict
+        @return: {id(query): [cpv, ...], ...}
+        """
+
+        queries = [x for x in self.queries if x.query_type == "complex"]
+        predicates = [
+            x._get_complex_predicates(in_installed=self.in_installed) for x in queries
+        ]
+        package_finder = _get_complex_finder(
+            self.in_installed, self.in_porttree, self.in_overlay
+        )
+
+        # Indexes of the queries which may match a cp, and which did match
+        # a cpv.
+        cp_hits = {}
+        cpv_hits = {}
+
+        def cat_predicate(cat):
+            return any(x[0] is None or x[0](cat) for x in predicates)
+
+        def cp_predicate(cp):
+            hits = cp_hits.get(cp)
+            if hits is None:
+                cat = cp.split("/", 1)[0]
+                hits = cp_hits[cp] = [
+                    i
+                    for i, (cat_pred, cp_pred, _) in enumerate(predicates)
+                    if (cat_pred is None or cat_pred(cat))
+                    and (cp_pred is None or cp_pred(cp))
+                ]
+            return bool(hits)
+
+        def predicate(cpv):
+            hits = cpv_hits.get(cpv)
+            if hits is None:
+                hits = cpv_hits[cpv] = [
+                    i for i in cp_hits[cpv_getkey(cpv)] if predicates[i][2](cpv)
+                ]
+            return bool(hits)
+
+        result = dict((id(x), []) for x in queries)
+        for cpv in package_finder(
+            predicate=predicate, cat_predicate=cat_predicate, cp_predicate=cp_predicate
+        ):
+            for i in cpv_hits[cpv]:
+                result[id(queries[i])].append(cpv)
+
+        return result
+
+
+class _CPGlobFilter:
+    """Decide whether a cpv glob can match any version of a cat/pkg key.
+
+    Matching the glob against a cp is not enough, since the glob may only
+    match once a version is appended. Instead, the glob is run as an NFA over
+    'cat/pkg-' and the states reached are checked against an automaton of
+    valid Portage version strings. Only cps which pass need their versions
+    listed.
+
+    Example usage:
+            >>> from gentoolkit.query import _CPGlobFilter
+            >>> cp_filter = _CPGlobFilter('*/*python*')
+            >>> cp_filter('dev-lang/python'), cp_filter('dev-python/lxml')
+            (True, False)
+            >>> _CPGlobFilter('*/lxml-4*')('dev-python/lxml')
+            True
+    """
+
+    def __init__(self, pattern):
+        """Compile the glob.
+
+        @type pattern: str
+        @param pattern: an fnmatch style glob matched against whole cpvs
+        """
+        self.tokens = _tokenize_glob(pattern)
+        self._start = self._closure({0})
+        self._cat_states = {}
+        self._feasible = {}
+
+    def __call__(self, cp):
+        cat, name = cp.split("/", 1)
+        states = self._cat_states.get(cat)
+        if states is None:
+            states = self._advance(self._start, cat + "/")
+            self._cat_states[cat] = states
+        states = self._advance(states, name + "-")
+        return any(self._matches_version(x) for x in states)
+
+    def _closure(self, states):
+        """Add the states reachable by letting a '*' match nothing."""
+
+        result = set(states)
+        for i in sorted(states):
+            while i < len(self.tokens) and self.tokens[i] is None:
+                i += 1
+                result.add(i)
+        return frozenset(result)
+
+    def _step(self, states, char):
+        """Return the states reached by consuming one character."""
+
+        result = set()
+        for i in states:
+            if i == len(self.tokens):
+                continue
+            token = self.tokens[i]
+            if token is None:
+                result.add(i)
+            elif token(char):
+                result.add(i + 1)
+        return self._closure(result)
+
+    def _advance(self, states, string):
+        for char in string:
+            if not states:
+                break
+            states = self._step(states, char)
+        return states
+
+    def _matches_version(self, start):
+        """Return True if the glob, from token start, can match a version."""
+
+        if start not in self._feasible:
+            seen = set()
+            todo = [(start, "start")]
+            found = False
+            while todo and not found:
+                pos, vstate = todo.pop()
+                if (pos, vstate) in seen:
+                    continue
+                seen.add((pos, vstate))
+                if pos == len(self.tokens) and vstate in _VERSION_ACCEPT:
+                    found = True
+                    break
+                for chars, next_vstate in _VERSION_DFA[vstate]:
+                    for char in chars:
+                        for next_pos in self._step((pos,), char):
+                            todo.append((next_pos, next_vstate))
+            self._feasible[start] = found
+
+        return self._feasible[start]
+
+
+def _match_atoms(atoms, in_installed, in_porttree, include_masked):
+    """Return the cpvs matching any of many atoms.
+
+    The atoms are grouped by cat/pkg. A cat/pkg whose plain atom is among
+    them is looked up once, the other atoms of it could only match a
+    subset of its versions.
+
+    @type atoms: iterable
+    @param atoms: L{gentoolkit.atom.Atom} instances, with category
+    @rtype: set
+    @return: matching cpvs of the installed packages if in_installed, and
+            of the repositories if in_porttree, including masked ones if
+            include_masked
+    """
+
+    groups = {}
+    for atom in atoms:
+        groups.setdefault(atom.cp, set()).add(atom.atom)
+
+    vardb = portage.db[portage.root]["vartree"].dbapi
+    portdb = portage.db[portage.root]["porttree"].dbapi
+    matches = set()
+    with instrument.phase("match set atoms"):
+        for cp, group in groups.items():
+            for atom in [cp] if cp in group else sorted(group):
+                try:
+                    if in_porttree:
+                        if include_masked:
+                            matches.update(portdb.xmatch("match-all", atom))
+                        else:
+                            matches.update(portdb.match(atom))
+                    if in_installed:
+                        matches.update(vardb.match(atom))
+                except portage.exception.InvalidAtom as err:
+                    raise errors.GentoolkitInvalidAtom(str(err))
+    return matches
+
+
+def _get_complex_finder(in_installed, in_porttree, in_overlay):
+    """Return the helpers function listing cpvs for a complex query."""
+
+    if in_installed:
+        if in_porttree or in_overlay:
+            return helpers.get_cpvs
+        return helpers.get_installed_cpvs
+    elif in_porttree or in_overlay:
+        return helpers.get_uninstalled_cpvs
+    raise errors.GentoolkitFatalError(
+        "Not searching in installed, Portage tree, or overlay. Nothing to do."
+    )
+
+
+def _tokenize_glob(pattern):
+    """Split an fnmatch style glob into a list of single character matchers.
+
+    '*' is represented by None, everything else by a callable which takes a
+    character and returns True if it matches.
+    """
+
+    tokens = []
+    i, n = 0, len(pattern)
+    while i < n:
+        char = pattern[i]
+        i += 1
+        if char == "*":
+            if not tokens or tokens[-1] is not None:
+                tokens.append(None)
+        elif char == "?":
+            tokens.append(lambda x: True)
+        elif char == "[":
+            # Mirror fnmatch.translate's idea of where the set ends
+            j = i
+            if j < n and pattern[j] == "!":
+                j += 1
+            if j < n and pattern[j] == "]":
+                j += 1
+            while j < n and pattern[j] != "]":
+                j += 1
+            if j >= n:
+                tokens.append("[".__eq__)
+            else:
+                char_set = re.compile(fnmatch.translate(pattern[i - 1 : j + 1]))
+                tokens.append(char_set.match)
+                i = j + 1
+        else:
+            tokens.append(char.__eq__)
+
+    return tokens
+
+
+def _build_version_dfa():
+    """Build a DFA for Portage version strings, e.g. cvs.1.2b_pre3_p1-r2
+
+    @rtype: tuple
+    @return: (transitions, accepting states), transitions maps a state to a
+            list of (chars, next state) pairs
+    """
+
+    suffixes = ("pre", "p", "beta", "alpha", "rc")
+    after_number = [(digits, "num"), (".", "dot"), (ascii_lowercase, "letter")]
+    after_part = [("_", "_"), ("-", "-")]
+
+    dfa = {
+        "start": [(digits, "num"), ("c", "c")],
+        "c": [("v", "cv")],
+        "cv": [("s", "cvs")],
+        "cvs": [(".", "cvs.")],
+        "cvs.": [(digits, "num")],
+        "num": after_number + after_part,
+        "dot": [(digits, "num")],
+        "letter": after_part,
+        "suffixnum": [(digits, "suffixnum")] + after_part,
+        "-": [("r", "-r")],
+        "-r": [(digits, "rev")],
+        # Prefix revisions look like -r01.2
+        "rev": [(digits, "rev"), (".", "rev")],
+    }
+    accept = set(["num", "letter", "suffixnum", "rev"])
+
+    dfa["_"] = []
+    for suffix in suffixes:
+        for i in range(len(suffix)):
+            state = "_" + suffix[:i]
+            next_state = "_" + suffix[: i + 1]
+            dfa.setdefault(state, [])
+            if (suffix[i], next_state) not in dfa[state]:
+                dfa[state].append((suffix[i], next_state))
+            dfa.setdefault(next_state, [])
+    for suffix in suffixes:
+        dfa["_" + suffix] += [(digits, "suffixnum")] + after_part
+        accept.add("_" + suffix)
+
+    return dfa, frozenset(accept)
+
+
+_VERSION_DFA, _VERSION_ACCEPT = _build_version_dfa()
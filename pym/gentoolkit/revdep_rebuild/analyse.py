@@ -4,11 +4,13 @@
 
 import os
 import re
-import time
 
 from portage import _encodings, _unicode_encode
 from portage.output import bold, blue, yellow, green
 
+from gentoolkit import instrument
+from gentoolkit.instrument import Stopwatch
+
 from .stuff import scan
 from .collect import (
     prepare_search_dirs,
@@ -19,9 +21,8 @@ from .collect import (
 from .assign import assign_packages
 from .cache import save_cache
 
-current_milli_time = lambda: int(round(time.time() * 1000))
-
 
+@instrument.timed("scan files")
 def scan_files(libs_and_bins, cmd_max_args, logger, searchbits):
     """Calls stuff.scan() and processes the data into a dictionary
     of scanned files information.
@@ -31,15 +32,14 @@ def scan_files(libs_and_bins, cmd_max_args, logger, searchbits):
     @param logger: python style Logging function to use for output.
     @returns dict: {bit_length: {soname: {filename: set(needed)}}}
     """
-    stime = current_milli_time()
+    watch = Stopwatch()
     scanned_files = {}  # {bits: {soname: (filename, needed), ...}, ...}
     lines = scan(["-BF", "%F;%f;%S;%n;%M"], libs_and_bins, cmd_max_args, logger)
-    ftime = current_milli_time()
     logger.debug(
         "\tscan_files(); total time to get scanelf data is "
-        "%d milliseconds" % (ftime - stime)
+        "%d milliseconds" % watch.milliseconds
     )
-    stime = current_milli_time()
+    watch.restart()
     count = 0
     for line in lines:
         parts = line.split(";")
@@ -65,10 +65,9 @@ def scan_files(libs_and_bins, cmd_max_args, logger, searchbits):
             count += 1
         else:
             scanned_files[bits][soname][filename].update(needed)
-    ftime = current_milli_time()
     logger.debug(
         "\tscan_files(); total filenames found: %d in %d milliseconds"
-        % (count, ftime - stime)
+        % (count, watch.milliseconds)
     )
     return scanned_files
 
@@ -219,7 +218,7 @@ class LibCheck:
                         scan_files(). Defaults to the class instance of scanned_files
         @ returns: dict: {bit_length: {found_lib: set(file_paths)}}.
         """
-        stime = current_milli_time()
+        watch = Stopwatch()
         count = 0
         fcount = 0
         if not scanned_files:
@@ -263,9 +262,8 @@ class LibCheck:
                                 "\tLibCheck.search(); FOUND:"
                                 " %sbit, %s, %s" % (bits, l, filename)
                             )
-        ftime = current_milli_time()
         self.logger.debug(
-            self.sfmsg % {"count": count, "deps": fcount, "time": ftime - stime}
+            self.sfmsg % {"count": count, "deps": fcount, "time": watch.milliseconds}
         )
         return found_libs
 
@@ -286,7 +284,7 @@ class LibCheck:
                         scan_files().  Defaults to the class instance of scanned_files
         @ returns: list: of filepaths from teh search results.
         """
-        stime = current_milli_time()
+        watch = Stopwatch()
         if not scanned_files:
             scanned_files = self.scanned_files
         found_pathes = []
@@ -296,10 +294,9 @@ class LibCheck:
                 for fp in sorted(files):
                     self.logger.info("\t" + yellow("* ") + fp)
                     found_pathes.append(fp)
-        ftime = current_milli_time()
         self.logger.debug(
             "\tLibCheck.process_results(); total filepaths found: "
-            "%d in %d milliseconds" % (len(found_pathes), ftime - stime)
+            "%d in %d milliseconds" % (len(found_pathes), watch.milliseconds)
         )
         return found_pathes
 
@@ -361,7 +358,7 @@ def analyse(
         # TODO: add partial cache (for ex. only libraries)
         # when found for some reason
 
-        stime = current_milli_time()
+        watch = Stopwatch()
         logger.warning(green(" * ") + bold("Collecting system binaries and libraries"))
         bin_dirs, lib_dirs = prepare_search_dirs(logger, settings)
 
@@ -381,17 +378,16 @@ def analyse(
         for x in sorted(masked_files):
             logger.debug("\t\t%s" % (x))
 
-        ftime = current_milli_time()
-        logger.debug("\ttime to complete task: %d milliseconds" % (ftime - stime))
-        stime = current_milli_time()
+        logger.debug("\ttime to complete task: %d milliseconds" % watch.milliseconds)
+        watch.restart()
         logger.info(green(" * ") + bold("Collecting dynamic linking informations"))
 
-        libraries, la_libraries, libraries_links = collect_libraries_from_dir(
-            lib_dirs, all_masks, logger
-        )
-        binaries = collect_binaries_from_dir(bin_dirs, all_masks, logger)
-        ftime = current_milli_time()
-        logger.debug("\ttime to complete task: %d milliseconds" % (ftime - stime))
+        with instrument.phase("collect files"):
+            libraries, la_libraries, libraries_links = collect_libraries_from_dir(
+                lib_dirs, all_masks, logger
+            )
+            binaries = collect_binaries_from_dir(bin_dirs, all_masks, logger)
+        logger.debug("\ttime to complete task: %d milliseconds" % watch.milliseconds)
 
         if settings["USE_TMP_FILES"]:
             save_cache(
@@ -427,16 +423,18 @@ def analyse(
         scanned_files, logger, _libs_to_check, searchbits, all_masks, masked_dirs
     )
 
-    broken_pathes = libcheck.process_results(libcheck.search())
+    with instrument.phase("check linking"):
+        broken_pathes = libcheck.process_results(libcheck.search())
 
-    broken_la = extract_dependencies_from_la(
-        la_libraries, libraries.union(libraries_links), _libs_to_check, logger
-    )
-    broken_pathes += broken_la
+        broken_la = extract_dependencies_from_la(
+            la_libraries, libraries.union(libraries_links), _libs_to_check, logger
+        )
+        broken_pathes += broken_la
 
     if broken_pathes:
         logger.warning(green(" * ") + bold("Assign files to packages"))
-        return assign_packages(broken_pathes, logger, settings)
+        with instrument.phase("assign packages"):
+            return assign_packages(broken_pathes, logger, settings)
     return None, None  # no need to assign anything
 
 
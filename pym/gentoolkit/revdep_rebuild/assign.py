@@ -8,14 +8,13 @@ import errno
 import os
 import io
 import re
-import time
-
-current_milli_time = lambda: int(round(time.time() * 1000))
 
 import portage
 from portage import portdb
 from portage.output import bold, red, yellow, green
 
+from gentoolkit.instrument import Stopwatch
+
 
 class _file_matcher:
     """
@@ -66,7 +65,7 @@ def assign_packages(broken, logger, settings):
     """Finds and returns packages that owns files placed in broken.
     Broken is list of files
     """
-    stime = current_milli_time()
+    watch = Stopwatch()
 
     broken_matcher = _file_matcher()
     for filename in broken:
@@ -103,11 +102,10 @@ def assign_packages(broken, logger, settings):
 
     broken_filenames = set(broken)
     orphaned = broken_filenames.difference(assigned_filenames)
-    ftime = current_milli_time()
     logger.debug(
         "\tassign_packages(); assigned "
         "%d packages, %d orphans in %d milliseconds"
-        % (len(assigned_pkgs), len(orphaned), ftime - stime)
+        % (len(assigned_pkgs), len(orphaned), watch.milliseconds)
     )
 
     return (assigned_pkgs, orphaned)
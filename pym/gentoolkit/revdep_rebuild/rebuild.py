@@ -18,13 +18,13 @@ import os
 import sys
 import logging
 import subprocess
-import time
-
-current_milli_time = lambda: int(round(time.time() * 1000))
 
 
 from portage.output import bold, red, blue, yellow, nocolor
 
+from gentoolkit import instrument
+from gentoolkit.instrument import Stopwatch
+
 from .analyse import analyse
 from .cache import check_temp_files, read_cache
 from .assign import get_slotted_cps
@@ -91,13 +91,13 @@ def rebuild(logger, assigned, settings):
         + bold(" ".join(emerge_command))
     )
 
-    stime = current_milli_time()
+    watch = Stopwatch()
     _args = ["emerge"] + args + ["--oneshot", "--complete-graph=y"] + emerge_command
-    success = subprocess.call(_args)
-    ftime = current_milli_time()
+    with instrument.phase("emerge"):
+        success = subprocess.call(_args)
     logger.debug(
         "\trebuild(); emerge call for %d ebuilds took: %s seconds"
-        % (len(_assigned), str((ftime - stime) / 1000.0))
+        % (len(_assigned), str(watch.milliseconds / 1000.0))
     )
     return success
 
@@ -142,47 +142,51 @@ def main(settings=None, logger=None):
 
     logger.debug("\tmain(), _libs_to_check = %s" % str(_libs_to_check))
 
-    if settings["USE_TMP_FILES"] and check_temp_files(
-        settings["DEFAULT_TMP_DIR"], logger=logger
-    ):
-        libraries, la_libraries, libraries_links, binaries = read_cache(
-            settings["DEFAULT_TMP_DIR"]
-        )
-        assigned, orphaned = analyse(
-            settings=settings,
-            logger=logger,
-            libraries=libraries,
-            la_libraries=la_libraries,
-            libraries_links=libraries_links,
-            binaries=binaries,
-            _libs_to_check=_libs_to_check,
-        )
-    else:
-        assigned, orphaned = analyse(settings, logger, _libs_to_check=_libs_to_check)
-
-    if not assigned and not orphaned:
-        logger.warning("\n" + bold("Your system is consistent"))
-        # return the correct exit code
-        return 0
-    elif orphaned:
-        # blank line for beter visibility of the following lines
-        logger.warning("")
-        if settings["library"]:
-            logger.warning(
-                red(" !!! Dependant orphaned files: ")
-                + bold("No installed package was found for the following:")
+    instrument.configure(profile=settings["profile"], timings=settings["timings"])
+    with instrument.session("revdep-rebuild"):
+        if settings["USE_TMP_FILES"] and check_temp_files(
+            settings["DEFAULT_TMP_DIR"], logger=logger
+        ):
+            libraries, la_libraries, libraries_links, binaries = read_cache(
+                settings["DEFAULT_TMP_DIR"]
+            )
+            assigned, orphaned = analyse(
+                settings=settings,
+                logger=logger,
+                libraries=libraries,
+                la_libraries=la_libraries,
+                libraries_links=libraries_links,
+                binaries=binaries,
+                _libs_to_check=_libs_to_check,
             )
         else:
-            logger.warning(
-                red(" !!! Broken orphaned files: ")
-                + bold("No installed package was found for the following:")
+            assigned, orphaned = analyse(
+                settings, logger, _libs_to_check=_libs_to_check
             )
-        for filename in orphaned:
-            logger.warning(red("\t* ") + filename)
 
-    success = rebuild(logger, assigned, settings)
-    logger.debug("rebuild return code = %i" % success)
-    return success
+        if not assigned and not orphaned:
+            logger.warning("\n" + bold("Your system is consistent"))
+            # return the correct exit code
+            return 0
+        elif orphaned:
+            # blank line for beter visibility of the following lines
+            logger.warning("")
+            if settings["library"]:
+                logger.warning(
+                    red(" !!! Dependant orphaned files: ")
+                    + bold("No installed package was found for the following:")
+                )
+            else:
+                logger.warning(
+                    red(" !!! Broken orphaned files: ")
+                    + bold("No installed package was found for the following:")
+                )
+            for filename in orphaned:
+                logger.warning(red("\t* ") + filename)
+
+        success = rebuild(logger, assigned, settings)
+        logger.debug("rebuild return code = %i" % success)
+        return success
 
 
 if __name__ == "__main__":
@@ -34,6 +34,8 @@ DEFAULTS = {
     "library": set(),
     "no-progress": False,
     "debug": False,
+    "profile": None,
+    "timings": False,
     "no-ld-path": False,
     "no-order": False,
     "pass_through_options": [],
@@ -118,6 +120,14 @@ def parse_options():
     parser.add_argument(
         "-d", "--debug", action="store_true", help="Print debug informations"
     )
+    parser.add_argument(
+        "--profile", metavar="FILE", help="Write cProfile statistics to FILE"
+    )
+    parser.add_argument(
+        "--timings",
+        action="store_true",
+        help="Print the time spent per phase to stderr",
+    )
 
     parser.add_argument("portage_options", nargs="*")
 
@@ -128,6 +138,8 @@ def parse_options():
     settings["quiet"] = args.quiet
     settings["PRETEND"] = args.pretend
     settings["nocolor"] = args.nocolor
+    settings["profile"] = args.profile
+    settings["timings"] = args.timings
     if args.library:
         settings["library"] = set(settings["library"]) | set(args.library)
     settings["USE_TMP_FILES"] = not args.ignore
@@ -6,7 +6,11 @@
 
 __docformat__ = "epytext"
 
+import json
+import os
+
 import portage
+from portage.const import USER_CONFIG_PATH, WORLD_FILE, WORLD_SETS_FILE
 
 try:
     # Per commit 25d8427b3b29cbcee97279186983dae818495f8f in portage,
@@ -20,11 +24,26 @@ except ImportError:
     SETPREFIX = "@"
 
 from gentoolkit import errors
+from gentoolkit import instrument
 from gentoolkit.atom import Atom
-
+from gentoolkit.helpers import get_cache_path, write_cache_file
+
+# Sets made of the world files and the profiles only, whose atoms can be
+# cached as long as those files do not change
+CACHED_SETS = (
+    "profile",
+    "selected",
+    "selected-packages",
+    "selected-sets",
+    "system",
+    "world",
+)
 
 _set_config = None
 
+# {setname: (stamps, frozenset of atoms)}
+_set_atoms = {}
+
 
 def _init_set_config():
     global _set_config
@@ -46,19 +65,116 @@ def get_available_sets():
 def get_set_atoms(setname):
     """Return atoms belonging to the given set
 
+    The atoms of the L{CACHED_SETS} are kept for the rest of the process
+    and in gentoolkit's cache directory, until the world files, sets
+    configuration or profile change.
+
     @type setname: string
     @param setname: Name of the set
-    @rtype list
-    @return: List of atoms in the given set
+    @rtype set
+    @return: Set of atoms in the given set
     """
 
-    if _sets_available:
+    if not _sets_available:
+        raise errors.GentoolkitSetNotFound(setname)
+
+    stamps = None
+    if setname in CACHED_SETS:
+        stamps = _set_stamps()
+        cached = _set_atoms.get(setname)
+        if cached is not None and cached[0] == stamps:
+            return set(cached[1])
+        cached = _read_set_cache().get(setname)
+        if cached is not None and cached[0] == stamps:
+            atoms = frozenset(Atom(x) for x in cached[1])
+            _set_atoms[setname] = (stamps, atoms)
+            return set(atoms)
+
+    with instrument.phase("expand set"):
         _init_set_config()
         try:
-            return set([Atom(str(x)) for x in _set_config.getSetAtoms(setname)])
+            names = sorted(str(x) for x in _set_config.getSetAtoms(setname))
         except portage._sets.PackageSetNotFound:
             raise errors.GentoolkitSetNotFound(setname)
-    raise errors.GentoolkitSetNotFound(setname)
+    atoms = frozenset(Atom(x) for x in names)
+    if stamps is not None:
+        _set_atoms[setname] = (stamps, atoms)
+        _write_set_cache(setname, stamps, names)
+    return set(atoms)
+
+
+def clear_set_atoms_cache():
+    """Forget the atoms of the sets expanded in this process."""
+
+    _set_atoms.clear()
+
+
+def _set_stamps():
+    """Return what the atoms of the L{CACHED_SETS} depend on: the portage
+    version, the profiles and the [path, mtime_ns, size] of the files
+    they are read from."""
+
+    settings = portage.settings
+    config_path = os.path.join(settings["PORTAGE_CONFIGROOT"], USER_CONFIG_PATH)
+    paths = [
+        os.path.join(settings["EROOT"], WORLD_FILE),
+        os.path.join(settings["EROOT"], WORLD_SETS_FILE),
+        os.path.join(config_path, "sets.conf"),
+    ]
+    for dirpath, dirnames, filenames in os.walk(os.path.join(config_path, "sets")):
+        dirnames.sort()
+        paths.extend(os.path.join(dirpath, x) for x in sorted(filenames))
+    dbapi = portage.db[portage.root]["porttree"].dbapi
+    for repo in dbapi.getRepositories():
+        paths.append(os.path.join(dbapi.getRepositoryPath(repo), "sets.conf"))
+    paths.extend(os.path.join(x, "packages") for x in settings.profiles)
+
+    stamps = [portage.VERSION, list(settings.profiles)]
+    for path in paths:
+        try:
+            st = os.stat(path)
+        except OSError:
+            stamps.append([path, None, None])
+        else:
+            stamps.append([path, st.st_mtime_ns, st.st_size])
+    return stamps
+
+
+def _set_cache_key():
+    settings = portage.settings
+    return "%s:%s" % (settings["PORTAGE_CONFIGROOT"], settings["EROOT"])
+
+
+def _read_set_cache():
+    """Return the cached {setname: [stamps, atoms]} of this system"""
+
+    try:
+        with open(get_cache_path("sets.json"), encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if not isinstance(data, dict):
+        return {}
+    sets = data.get(_set_cache_key())
+    return sets if isinstance(sets, dict) else {}
+
+
+def _write_set_cache(setname, stamps, atoms):
+    """Update the cached atoms of setname"""
+
+    path = get_cache_path("sets.json")
+    try:
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        data = {}
+    if not isinstance(data, dict):
+        data = {}
+    sets = data.setdefault(_set_cache_key(), {})
+    if not isinstance(sets, dict):
+        sets = data[_set_cache_key()] = {}
+    sets[setname] = [stamps, atoms]
+    write_cache_file(path, lambda f: json.dump(data, f, separators=(",", ":")))
 
 
 # vim: set ts=4 sw=4 tw=79:
@@ -0,0 +1,204 @@
+# Copyright(c) 2026, Gentoo Foundation
+#
+# Licensed under the GNU General Public License, v2
+
+"""Installed sizes of many packages, stat'ed in parallel.
+
+L{package_sizes} returns what L{Package.size<gentoolkit.package.Package.size>}
+does for each package, with the files of the packages stat'ed by a pool of
+threads. That size counts the hardlinks of a package once, but a directory
+or file installed by several packages is counted for each of them.
+
+A L{SizeIndex} counts every (device, inode) once instead, for the installed
+package with the lowest cpv string that has it, so that the sizes of all
+installed packages add up to what they use on disk and the size of a
+package does not depend on which others were asked about. That takes the
+files of all installed packages:
+
+    >>> from gentoolkit.query import Query
+    >>> from gentoolkit.sizes import SizeIndex
+    >>> sizes = SizeIndex().sizes(Query('*').find_installed())
+    >>> sizes['sys-apps/portage-3.0.63']
+    (11234567, 1234, 0)
+"""
+
+__all__ = ("SizeIndex", "package_sizes", "stat_files")
+__docformat__ = "epytext"
+
+# =======
+# Imports
+# =======
+
+import errno
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import portage
+from portage import _encodings, _unicode_encode
+
+from gentoolkit import instrument
+
+# =======
+# Classes
+# =======
+
+
+class SizeIndex:
+    """The files of installed packages by (device, inode), with their sizes
+
+    The files of a package are stat'ed on first use and kept for the life
+    of the index.
+
+    @type jobs: int
+    @param jobs: number of threads to stat files with, defaults to the
+            default of L{concurrent.futures.ThreadPoolExecutor}
+    """
+
+    def __init__(self, jobs=None):
+        self.jobs = jobs
+        # {cpv: (inaccessible files, {device: [inode, size, ...]})}
+        self.entries = {}
+
+    def sizes(self, pkgs):
+        """Return the installed sizes of packages.
+
+        A file installed by more than one package, by path or through
+        hardlinks, counts for the installed package with the lowest cpv
+        string only, whether that is one of pkgs or not.
+
+        @type pkgs: iterable
+        @param pkgs: installed L{gentoolkit.package.Package}s
+        @rtype: dict
+        @return: {cpv: (size, number of files, number of inaccessible files)}
+        """
+
+        pkgs = {str(pkg.cpv): pkg for pkg in pkgs}
+        vardb = portage.db[portage.root]["vartree"].dbapi
+        installed = set(vardb.cpv_all())
+        installed.update(pkgs)
+        stale = [
+            pkgs.get(cpv) or _get_package(cpv)
+            for cpv in installed
+            if cpv not in self.entries
+        ]
+        if stale:
+            with instrument.phase("stat files"):
+                results = _map_contents(stat_files, stale, self.jobs)
+                for pkg, result in zip(stale, results):
+                    self.entries[str(pkg.cpv)] = result
+
+        # The inodes of pkgs, and which package they count for
+        owners = {}
+        for cpv in pkgs:
+            for dev, values in self.entries[cpv][1].items():
+                owners.update(((dev, ino), None) for ino in values[::2])
+        unowned = len(owners)
+        for cpv in sorted(installed):
+            for dev, values in self.entries[cpv][1].items():
+                for ino in values[::2]:
+                    key = (dev, ino)
+                    if key in owners and owners[key] is None:
+                        owners[key] = cpv
+                        unowned -= 1
+            if not unowned:
+                break
+
+        result = {}
+        for cpv in pkgs:
+            uncounted, inodes = self.entries[cpv]
+            size = n_files = 0
+            for dev, values in inodes.items():
+                values = iter(values)
+                for ino, file_size in zip(values, values):
+                    if owners[(dev, ino)] == cpv:
+                        size += file_size
+                        n_files += 1
+            result[cpv] = (size, n_files, uncounted)
+        return result
+
+
+# =========
+# Functions
+# =========
+
+
+def package_sizes(pkgs, jobs=None):
+    """Return the installed sizes of packages, each on its own.
+
+    @type pkgs: iterable
+    @param pkgs: installed L{gentoolkit.package.Package}s
+    @type jobs: int
+    @param jobs: number of threads to stat files with, defaults to the
+            default of L{concurrent.futures.ThreadPoolExecutor}
+    @rtype: dict
+    @return: {cpv: (size, number of files, number of inaccessible files)},
+            see L{Package.size<gentoolkit.package.Package.size>}
+    """
+
+    pkgs = list(pkgs)
+    with instrument.phase("stat files"):
+        results = _map_contents(_size, pkgs, jobs)
+        return {str(pkg.cpv): result for pkg, result in zip(pkgs, results)}
+
+
+def stat_files(paths):
+    """Find the inodes and sizes of files, hardlinks counted once.
+
+    Files which do not exist are left out, those which can not be stat'ed
+    for another reason are counted as inaccessible.
+
+    @type paths: iterable
+    @param paths: paths with ROOT prepended
+    @rtype: tuple
+    @return: (number of inaccessible files,
+            {device: [inode, size, inode, size, ...]})
+    """
+
+    seen = set()
+    inodes = {}
+    uncounted = 0
+    for path in paths:
+        try:
+            st = os.lstat(_unicode_encode(path, encoding=_encodings["fs"]))
+        except OSError as err:
+            if err.errno not in (errno.ENOENT, errno.ENOTDIR):
+                uncounted += 1
+            continue
+
+        # Remove hardlinks by checking for duplicate inodes. Bug #301026.
+        if (st.st_dev, st.st_ino) in seen:
+            continue
+        seen.add((st.st_dev, st.st_ino))
+        inodes.setdefault(st.st_dev, []).extend((st.st_ino, st.st_size))
+    return uncounted, inodes
+
+
+def _map_contents(func, pkgs, jobs):
+    """Return func of the files of each package, in a pool of threads if
+    there is more than one package."""
+
+    contents = (pkg.parsed_contents(prefix_root=True) for pkg in pkgs)
+    if len(pkgs) < 2 or jobs == 1:
+        return list(map(func, contents))
+    with ThreadPoolExecutor(jobs) as executor:
+        return list(executor.map(func, contents))
+
+
+def _size(paths):
+    """Return (size, number of files, number of inaccessible files) of
+    paths, like Package.size()."""
+
+    uncounted, inodes = stat_files(paths)
+    size = sum(sum(values[1::2]) for values in inodes.values())
+    n_files = sum(len(values) // 2 for values in inodes.values())
+    return (size, n_files, uncounted)
+
+
+def _get_package(cpv):
+    # gentoolkit.package uses stat_files
+    from gentoolkit.package import Package
+
+    return Package(cpv)
+
+
+# vim: set ts=4 sw=4 tw=79:
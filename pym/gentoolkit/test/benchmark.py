@@ -0,0 +1,565 @@
+# Copyright(c) 2026, Gentoo Foundation
+#
+# Licensed under the GNU General Public License, v2
+
+"""Benchmark the hot paths of gentoolkit on a synthetic system.
+
+The benchmarks run against a tree written by L{synthetic}, which is kept
+between runs, and the results are saved as JSON:
+
+    $ python -m gentoolkit.test.benchmark run -o new.json
+
+To benchmark another checkout, run this file as a script with that
+checkout first in PYTHONPATH:
+
+    $ PYTHONPATH=/path/to/old/pym \\
+    >     python pym/gentoolkit/test/benchmark.py run -o old.json
+
+and compare both results. The exit status is 1 when a benchmark got
+slower than the threshold:
+
+    $ python -m gentoolkit.test.benchmark compare old.json new.json
+
+Each benchmark is timed --repeat times in one process; the first run
+pays for cold caches, so it is reported apart from the median. Benchmarks
+of code the checkout does not have yet are reported as skipped.
+"""
+
+__all__ = ("BENCHMARKS", "benchmark", "compare", "main", "run")
+__docformat__ = "epytext"
+
+# =======
+# Imports
+# =======
+
+import argparse
+import json
+import logging
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from statistics import median
+
+if __package__:
+    from gentoolkit.test import synthetic
+else:
+    # Run as a script, gentoolkit may come from another checkout
+    import synthetic
+
+# =======
+# Globals
+# =======
+
+# {name: (description, setup function)}, in order of definition
+BENCHMARKS = {}
+
+# Version of the result format
+FORMAT = 1
+
+# =======
+# Classes
+# =======
+
+
+class Fixture:
+    """What the benchmarks get to prepare their work from.
+
+    @type tree: L{synthetic.SyntheticTree}
+    @ivar tree: the synthetic system, planned and on disk
+    @type rand: random.Random
+    @ivar rand: seeded, so that every run picks the same samples
+    """
+
+    def __init__(self, tree, seed=0):
+        self.tree = tree
+        self.rand = random.Random(seed)
+        self.logger = logging.getLogger("gentoolkit.benchmark")
+        self.logger.addHandler(logging.NullHandler())
+        self.logger.propagate = False
+
+    def sample(self, population, count):
+        """Return a sorted random sample of at most count items."""
+
+        return sorted(self.rand.sample(population, min(count, len(population))))
+
+    def contents(self, cpv):
+        """Return the (type, path) entries of an installed package."""
+
+        with open(os.path.join(self.tree.vdb, cpv, "CONTENTS")) as contents:
+            return [tuple(line.split()[:2]) for line in contents]
+
+    def installed_files(self, count, prefix=""):
+        """Return the paths of files of count random installed packages,
+        optionally only those below prefix."""
+
+        prefix = synthetic.EPREFIX.rstrip(os.sep) + prefix
+        paths = []
+        for cpv in self.sample(self.tree.installed, count):
+            files = [
+                path
+                for kind, path in self.contents(cpv)
+                if kind == "obj" and path.startswith(prefix)
+            ]
+            if files:
+                paths.append(self.rand.choice(files))
+        return paths
+
+
+# =========
+# Functions
+# =========
+
+
+def benchmark(name, description):
+    """Register a benchmark.
+
+    The decorated function gets a L{Fixture}, does its setup and returns
+    the callable to time.
+    """
+
+    def decorator(setup):
+        BENCHMARKS[name] = (description, setup)
+        return setup
+
+    return decorator
+
+
+@benchmark("file_owner", "FileOwner on 100 installed files")
+def _file_owner(fixture):
+    from gentoolkit.helpers import FileOwner
+
+    paths = fixture.installed_files(100)
+    return lambda: FileOwner()(paths)
+
+
+@benchmark("graph_depends", "graph_depends of 5 packages, 3 levels deep")
+def _graph_depends(fixture):
+    from gentoolkit.dependencies import Dependencies
+
+    cpvs = fixture.sample(fixture.tree.installed, 5)
+
+    def work():
+        for cpv in cpvs:
+            Dependencies(cpv).graph_depends(max_depth=3)
+
+    return work
+
+
+@benchmark("graph_reverse_depends", "direct reverse deps of 10 packages")
+def _graph_reverse_depends(fixture):
+    from portage.versions import cpv_getkey
+    from gentoolkit.dependencies import Dependencies
+    from gentoolkit.helpers import get_installed_cpvs
+
+    cps = [cpv_getkey(cpv) for cpv in fixture.sample(fixture.tree.installed, 10)]
+
+    def work():
+        pkgset = sorted(get_installed_cpvs())
+        for cp in cps:
+            Dependencies(cp).graph_reverse_depends(pkgset=pkgset)
+
+    return work
+
+
+@benchmark("split_cpvs", "split_cpvs of 100k cpvs, the cache cleared first")
+def _split_cpvs(fixture):
+    try:
+        from gentoolkit.cpv import clear_split_cpv_cache, split_cpvs
+    except ImportError:
+        # Before the cache, time what split_cpvs replaced
+        from gentoolkit.cpv import split_cpv
+
+        def clear_split_cpv_cache():
+            pass
+
+        def split_cpvs(cpvs):
+            return [split_cpv(cpv) for cpv in cpvs]
+
+    cpvs = [
+        "%s-%s" % (cp, version)
+        for cp, versions in fixture.tree.packages
+        for version in versions
+    ]
+    # Walks of a tree meet the same cpvs more than once
+    cpvs = [fixture.rand.choice(cpvs) for i in range(100000)]
+
+    def work():
+        clear_split_cpv_cache()
+        split_cpvs(cpvs)
+
+    return work
+
+
+@benchmark("smart_find", "smart_find of glob queries in the VDB and repository")
+def _smart_find(fixture):
+    from gentoolkit.query import Query
+
+    queries = ("syn-cat00*/*", "*/pkg*7", "syn-cat*/pkg0*1*", "*")
+
+    def work():
+        for query in queries:
+            Query(query).smart_find(show_progress=False, no_matches_fatal=False)
+
+    return work
+
+
+@benchmark("verify_contents", "VerifyContents of 100 installed packages")
+def _verify_contents(fixture):
+    from gentoolkit.equery.check import VerifyContents
+    from gentoolkit.package import Package
+
+    cpvs = fixture.sample(fixture.tree.installed, 100)
+    return lambda: VerifyContents()([Package(cpv) for cpv in cpvs])
+
+
+@benchmark("dblink_contents", "dblink.getcontents of the whole VDB")
+def _dblink_contents(fixture):
+    import portage
+
+    settings = portage.settings
+
+    def work():
+        for cpv in fixture.tree.installed:
+            cat, pf = cpv.split("/")
+            portage.dblink(cat, pf, settings["ROOT"], settings).getcontents()
+
+    return work
+
+
+@benchmark("read_contents", "parsed_contents of the whole VDB, not cached")
+def _read_contents(fixture):
+    try:
+        from gentoolkit.contents import clear_contents_cache
+    except ImportError:
+
+        def clear_contents_cache():
+            # parsed_contents goes through a dblink, which keeps nothing
+            pass
+
+    from gentoolkit.package import Package
+
+    def work():
+        clear_contents_cache()
+        for cpv in fixture.tree.installed:
+            Package(cpv).parsed_contents(prefix_root=True)
+
+    return work
+
+
+@benchmark("find_distfiles", "DistfilesSearch.findDistfiles")
+def _find_distfiles(fixture):
+    from gentoolkit.eclean.search import DistfilesSearch
+
+    def work():
+        DistfilesSearch(lambda x: None).findDistfiles(_distdir=fixture.tree.distdir)
+
+    return work
+
+
+@benchmark("find_packages", "findPackages, destructive")
+def _find_packages(fixture):
+    from gentoolkit.eclean.search import findPackages
+
+    options = {
+        "changed-deps": False,
+        "ignore-failure": False,
+        "unique-use": False,
+    }
+    return lambda: findPackages(options, destructive=True, pkgdir=fixture.tree.pkgdir)
+
+
+@benchmark("gather_flags_info", "gather_flags_info of the whole VDB")
+def _gather_flags_info(fixture):
+    import portage
+    from gentoolkit.enalyze.analyze import gather_flags_info
+
+    system_flags = portage.settings["USE"].split()
+    return lambda: gather_flags_info(system_flags=system_flags, include_unset=True)
+
+
+@benchmark("libcheck_search", "LibCheck.search for broken libraries")
+def _libcheck_search(fixture):
+    from gentoolkit.revdep_rebuild.analyse import LibCheck
+
+    # The installed libraries are not ELF objects, so make up what
+    # scan_files() would find: every library needs a few others, some of
+    # which are not installed.
+    scanned = {}
+    sonames = []
+    for cpv in fixture.tree.installed:
+        for kind, path in fixture.contents(cpv):
+            if kind == "obj" and path.endswith(".so.1"):
+                sonames.append(os.path.basename(path))
+                scanned[sonames[-1]] = {path: set()}
+    missing = ["libmissing%d.so.1" % i for i in range(len(sonames) // 20 + 1)]
+    for soname, files in scanned.items():
+        for needed in files.values():
+            needed.update(fixture.rand.sample(sonames + missing, 3))
+    scanned_files = {"64": scanned}
+
+    def work():
+        LibCheck(
+            scanned_files,
+            fixture.logger,
+            searchbits=["64"],
+            all_masks=set(),
+            masked_dirs=set(),
+        ).search()
+
+    return work
+
+
+@benchmark("assign_packages", "assign_packages of 100 broken files")
+def _assign_packages(fixture):
+    from gentoolkit.revdep_rebuild.assign import assign_packages
+
+    broken = fixture.installed_files(100, "/usr/lib64")
+    settings = {"PKG_DIR": fixture.tree.vdb + os.sep}
+    return lambda: assign_packages(broken, fixture.logger, settings)
+
+
+def prepare(root, scale="small", seed=0):
+    """Write the synthetic tree for the benchmarks, unless it is there.
+
+    @rtype: L{synthetic.SyntheticTree}
+    @return: the tree, with Portage's environment pointing at it
+    """
+
+    tree = synthetic.SyntheticTree(root, seed=seed, **synthetic.SCALES[scale])
+
+    stamp = os.path.join(tree.root, "benchmark.json")
+    wanted = {"seed": seed, "options": tree.options}
+    try:
+        with open(stamp) as stamp_file:
+            current = json.load(stamp_file)
+    except (OSError, ValueError):
+        current = None
+    if current == wanted:
+        # Only plan it again, all that is on disk already
+        tree._plan(random.Random(seed))
+    else:
+        sys.stderr.write("Generating the synthetic tree in %s\n" % tree.root)
+        tree.generate()
+        with open(stamp, "w") as stamp_file:
+            json.dump(wanted, stamp_file)
+
+    # Portage reads its environment on first use, which comes after this
+    os.environ.update(tree.environ)
+    os.environ.pop("EPREFIX", None)
+    return tree
+
+
+def run(tree, names=None, repeat=5, seed=0, out=None):
+    """Run benchmarks and return the results.
+
+    @type tree: L{synthetic.SyntheticTree}
+    @param tree: as returned by L{prepare}
+    @type names: list
+    @param names: the benchmarks to run, defaults to all
+    @type repeat: int
+    @param repeat: how often to time each benchmark
+    @rtype: dict
+    @return: the results, with the reason instead of times for benchmarks
+            whose setup failed to import what they time
+    """
+
+    import gentoolkit
+
+    results = {}
+    for name in names or BENCHMARKS:
+        description, setup = BENCHMARKS[name]
+        if out is not None:
+            out.write("%-24s" % name)
+            out.flush()
+        try:
+            work = setup(Fixture(tree, seed))
+        except ImportError as err:
+            # Code an older checkout does not have
+            results[name] = {"description": description, "skipped": str(err)}
+            if out is not None:
+                out.write(" skipped: %s\n" % err)
+            continue
+        times = []
+        for i in range(repeat):
+            start = time.perf_counter()
+            work()
+            times.append(time.perf_counter() - start)
+        results[name] = {
+            "description": description,
+            "first": times[0],
+            "median": median(times[1:] or times),
+            "min": min(times),
+            "times": times,
+        }
+        if out is not None:
+            out.write(
+                " first %8.3fs  median %8.3fs\n" % (times[0], results[name]["median"])
+            )
+
+    checkout = os.path.dirname(os.path.abspath(gentoolkit.__file__))
+    return {
+        "format": FORMAT,
+        "date": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "gentoolkit": checkout,
+        "commit": _git_head(checkout),
+        "tree": {"seed": seed, "options": tree.options},
+        "repeat": repeat,
+        "results": results,
+    }
+
+
+def compare(old, new, threshold=10.0, key="median", out=sys.stdout):
+    """Print how the benchmarks changed between two results.
+
+    @type old: dict
+    @param old: results of L{run}, the reference
+    @type new: dict
+    @param new: results of L{run}
+    @type threshold: float
+    @param threshold: slow down, in percent, that counts as a regression
+    @type key: str
+    @param key: the time to compare, one of first, median and min
+    @rtype: list
+    @return: the names of the benchmarks that regressed
+    """
+
+    if old.get("tree") != new.get("tree"):
+        out.write("Warning: the results were taken on different trees\n")
+
+    regressions = []
+    out.write("%-24s %10s %10s %9s\n" % ("benchmark", "old s", "new s", "change"))
+    for name in sorted(set(old["results"]) | set(new["results"])):
+        if any("skipped" in x["results"].get(name, {}) for x in (old, new)):
+            out.write("%-24s %31s\n" % (name, "skipped"))
+            continue
+        try:
+            before = old["results"][name][key]
+            after = new["results"][name][key]
+        except KeyError:
+            out.write("%-24s %31s\n" % (name, "only in one result"))
+            continue
+        change = (after - before) / before * 100 if before else 0.0
+        line = "%-24s %10.3f %10.3f %+8.1f%%" % (name, before, after, change)
+        if change > threshold:
+            regressions.append(name)
+            line += "  REGRESSION"
+        out.write(line + "\n")
+    return regressions
+
+
+def _git_head(path):
+    try:
+        return subprocess.run(
+            ["git", "-C", path, "rev-parse", "HEAD"],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            check=True,
+            universal_newlines=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(argv=None):
+    """Run or compare benchmarks from the command line."""
+
+    parser = argparse.ArgumentParser(
+        prog="python -m gentoolkit.test.benchmark",
+        description="Benchmark gentoolkit on a synthetic system.",
+    )
+    commands = parser.add_subparsers(dest="command")
+    commands.required = True
+
+    run_parser = commands.add_parser("run", help="run benchmarks")
+    run_parser.add_argument(
+        "names",
+        nargs="*",
+        metavar="NAME",
+        help="benchmarks to run (default: all)",
+    )
+    run_parser.add_argument(
+        "--root",
+        default=None,
+        help="where to keep the synthetic tree "
+        "(default: gentoolkit-benchmark-SCALE in the temporary directory)",
+    )
+    run_parser.add_argument(
+        "--scale",
+        choices=sorted(synthetic.SCALES),
+        default="small",
+        help="size of the synthetic tree (default: %(default)s)",
+    )
+    run_parser.add_argument("--seed", type=int, default=0, help="random seed")
+    run_parser.add_argument(
+        "--repeat",
+        type=int,
+        default=5,
+        help="runs per benchmark (default: %(default)s)",
+    )
+    run_parser.add_argument(
+        "-o", "--output", help="write the results to this file (default: stdout)"
+    )
+
+    commands.add_parser("list", help="list the benchmarks")
+
+    compare_parser = commands.add_parser(
+        "compare", help="compare two results, exit with 1 on regressions"
+    )
+    compare_parser.add_argument("old", help="the reference results")
+    compare_parser.add_argument("new", help="the results to check")
+    compare_parser.add_argument(
+        "-t",
+        "--threshold",
+        type=float,
+        default=10.0,
+        help="slow down in percent that is a regression (default: %(default)s)",
+    )
+    compare_parser.add_argument(
+        "--key",
+        choices=("first", "median", "min"),
+        default="median",
+        help="the time to compare (default: %(default)s)",
+    )
+
+    args = parser.parse_args(argv)
+
+    if args.command == "list":
+        for name, (description, setup) in BENCHMARKS.items():
+            print("%-24s %s" % (name, description))
+        return 0
+
+    if args.command == "compare":
+        with open(args.old) as old, open(args.new) as new:
+            regressions = compare(
+                json.load(old), json.load(new), args.threshold, args.key
+            )
+        return 1 if regressions else 0
+
+    unknown = [name for name in args.names if name not in BENCHMARKS]
+    if unknown:
+        parser.error("unknown benchmark: %s" % ", ".join(unknown))
+    if args.repeat < 1:
+        parser.error("--repeat must be at least 1")
+    root = args.root or os.path.join(
+        tempfile.gettempdir(), "gentoolkit-benchmark-" + args.scale
+    )
+    tree = prepare(root, args.scale, args.seed)
+    results = run(tree, args.names, args.repeat, args.seed, out=sys.stderr)
+    data = json.dumps(results, indent=2, sort_keys=True) + "\n"
+    if args.output:
+        with open(args.output, "w") as output:
+            output.write(data)
+    else:
+        sys.stdout.write(data)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
+
+# vim: set ts=4 sw=4 tw=79:
@@ -0,0 +1,76 @@
+import os
+import unittest
+from unittest import mock
+
+from gentoolkit.equery import files
+
+CONTENTS = {
+    "/etc": ("dir",),
+    "/etc/foo.conf": ("obj", "1", "md5"),
+    "/etc/env.d": ("dir",),
+    "/etc/env.d/50foo": ("obj", "1", "md5"),
+    "/etcx": ("dir",),
+    "/etcx/bar": ("obj", "1", "md5"),
+    "/usr": ("dir",),
+    "/usr/bin": ("dir",),
+    "/usr/bin/foo": ("obj", "1", "md5"),
+    "/usr/bin/bar": ("sym", "1", "foo"),
+    "/usr/lib": ("dir",),
+    "/usr/lib/empty": ("dir",),
+    "/usr/lib64": ("dir",),
+    "/usr/lib64/libfoo.so": ("obj", "1", "md5"),
+    "/usr/share": ("dir",),
+    "/usr/share/man": ("dir",),
+    "/usr/share/man/foo.1": ("obj", "1", "md5"),
+    "/run/foo": ("fif",),
+}
+
+
+class TestContentsFilter(unittest.TestCase):
+    def setUp(self):
+        settings = {"CONFIG_PROTECT": "/etc/", "CONFIG_PROTECT_MASK": "/etc/env.d"}
+        patches = [
+            mock.patch.dict(os.environ, {"PATH": "/usr/sbin:/usr/bin/"}),
+            mock.patch.object(files.portage, "settings", settings),
+            mock.patch.dict(files.QUERY_OPTS, {"type_filter": None}),
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def select(self, *rules):
+        return sorted(files.ContentsFilter(rules)(CONTENTS))
+
+    def test_rules(self):
+        self.assertEqual(self.select("sym", "fifo"), ["/run/foo", "/usr/bin/bar"])
+        self.assertEqual(self.select("cmd"), ["/usr/bin/bar", "/usr/bin/foo"])
+        self.assertEqual(self.select("conf"), ["/etc/foo.conf", "/etcx/bar"])
+        self.assertEqual(self.select("man", "info"), ["/usr/share/man/foo.1"])
+        # The topmost directories with files, "/etc" hides "/etcx" too
+        self.assertEqual(
+            self.select("path"), ["/etc", "/usr/bin", "/usr/lib64", "/usr/share/man"]
+        )
+        self.assertEqual(
+            self.select("path", "dir", "obj"),
+            sorted(x for x in CONTENTS if CONTENTS[x][0] in ("dir", "obj")),
+        )
+
+    def test_filter_contents(self):
+        self.assertIs(files.filter_contents(CONTENTS), CONTENTS)
+        files.QUERY_OPTS["type_filter"] = ["cmd"]
+        self.assertEqual(len(files.filter_contents(CONTENTS)), 2)
+        os.environ["PATH"] = "/usr/sbin"
+        self.assertEqual(files.filter_contents(CONTENTS), {})
+        self.assertEqual(sorted(files.filter_by_conf(CONTENTS)), self.select("conf"))
+
+
+def test_main():
+    suite = unittest.TestLoader().loadTestsFromTestCase(TestContentsFilter)
+    unittest.TextTestRunner(verbosity=2).run(suite)
+
+
+test_main.__test__ = False
+
+
+if __name__ == "__main__":
+    test_main()
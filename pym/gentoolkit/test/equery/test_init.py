@@ -1,6 +1,25 @@
+import io
+import json
 import unittest
+from contextlib import redirect_stdout
+from unittest import mock
 
 from gentoolkit import equery
+from gentoolkit.equery import depgraph
+
+
+class FakePackage:
+    def __init__(self, cpv, mask, keywords):
+        self.cpv = cpv
+        self._mask = mask
+        self._keywords = keywords
+
+    def mask_status(self):
+        return self._mask
+
+    def environment(self, var):
+        assert var == "KEYWORDS"
+        return self._keywords
 
 
 class TestEqueryInit(unittest.TestCase):
@@ -35,6 +54,76 @@ class TestEqueryInit(unittest.TestCase):
         for key in unused_keys:
             self.assertRaises(KeyError, equery.expand_module_name, key)
 
+    def test_filetype_record(self):
+        self.assertEqual(
+            equery.filetype_record("/usr/bin/foo", ["obj", "1234", "abcdef"]),
+            {"path": "/usr/bin/foo", "type": "file", "mtime": 1234, "md5": "abcdef"},
+        )
+        self.assertEqual(
+            equery.filetype_record("/usr/lib/foo.so", ["sym", "1234", "foo.so.1 5"]),
+            {
+                "path": "/usr/lib/foo.so",
+                "type": "sym",
+                "mtime": 1234,
+                "target": "foo.so.1",
+            },
+        )
+        self.assertEqual(
+            equery.filetype_record("/usr/bin", ["dir"]),
+            {"path": "/usr/bin", "type": "dir"},
+        )
+        self.assertEqual(
+            equery.filetype_record("/run/foo", ["fif"]),
+            {"path": "/run/foo", "type": "fifo"},
+        )
+
+    def test_print_record(self):
+        out = io.StringIO()
+        with redirect_stdout(out):
+            equery.print_record({"cpv": "app-misc/foo-1", "size": 10})
+            equery.print_record({"cpv": "app-misc/bar-2", "errors": ["a b"]})
+        lines = out.getvalue().splitlines()
+        self.assertEqual(lines[0], '{"cpv":"app-misc/foo-1","size":10}')
+        self.assertEqual(
+            [json.loads(line) for line in lines],
+            [
+                {"cpv": "app-misc/foo-1", "size": 10},
+                {"cpv": "app-misc/bar-2", "errors": ["a b"]},
+            ],
+        )
+
+    def test_depgraph_record(self):
+        settings = {"ARCH": "amd64", "ACCEPT_KEYWORDS": "amd64 ~amd64"}
+        out = io.StringIO()
+        with mock.patch.object(depgraph.portage, "settings", settings):
+            with redirect_stdout(out):
+                for pkg in (
+                    FakePackage("app-misc/foo-1", [], "amd64 x86"),
+                    FakePackage("app-misc/foo-2", ["~amd64 keyword"], "~amd64"),
+                    None,
+                ):
+                    depgraph.depgraph_record(1, pkg, None, no_atom=True, no_use=True)
+        self.assertEqual(
+            [json.loads(line) for line in out.getvalue().splitlines()],
+            [
+                {
+                    "root": None,
+                    "depth": 1,
+                    "cpv": "app-misc/foo-1",
+                    "mask": [],
+                    "keyword": "amd64",
+                },
+                {
+                    "root": None,
+                    "depth": 1,
+                    "cpv": "app-misc/foo-2",
+                    "mask": ["~amd64 keyword"],
+                    "keyword": "~amd64",
+                },
+                {"root": None, "depth": 1, "cpv": None, "mask": None, "keyword": None},
+            ],
+        )
+
 
 def test_main():
     suite = unittest.TestLoader().loadTestsFromTestCase(TestEqueryInit)
@@ -0,0 +1,602 @@
+# Copyright(c) 2026, Gentoo Foundation
+#
+# Licensed under the GNU General Public License, v2
+
+"""Generate a synthetic Gentoo system for scale benchmarks.
+
+The fixtures of the test suite are a handful of packages. This writes a
+repository (ebuilds, metadata.xml and md5-cache), a VDB (CONTENTS, USE,
+IUSE, KEYWORDS, *DEPEND, BUILD_TIME, COUNTER, ...), a DISTDIR and a PKGDIR
+with a Packages index below a temporary ROOT, at any size. The default
+scale is that of a full Gentoo tree: 30000 ebuilds and 3000 installed
+packages. Everything is derived from a seed, so a given set of options
+always gives the same tree.
+
+The configuration is in ROOT/etc/portage, everything else below ROOT +
+EPREFIX, as gentoolkit uses Portage's compiled in EPREFIX. Point Portage at the result with the variables of
+L{SyntheticTree.environ}:
+
+    $ python -m gentoolkit.test.synthetic --scale small /tmp/synth
+    $ eval "$(python -m gentoolkit.test.synthetic --env /tmp/synth)"
+    $ equery list '*'
+
+Installed files are small plain files, not ELF objects, and binary
+packages and distfiles are sparse files of the recorded size.
+"""
+
+__all__ = ("SCALES", "SyntheticTree", "main")
+__docformat__ = "epytext"
+
+# =======
+# Imports
+# =======
+
+import argparse
+import grp
+import hashlib
+import os
+import pwd
+import random
+import shlex
+import sys
+
+from portage.const import EPREFIX
+
+# =======
+# Globals
+# =======
+
+# Options for each --scale, the default is "gentoo"
+SCALES = {
+    "tiny": {
+        "categories": 3,
+        "packages": 20,
+        "versions": 2,
+        "installed": 10,
+        "files": 5,
+        "binpkgs": 5,
+    },
+    "small": {
+        "categories": 30,
+        "packages": 1000,
+        "versions": 3,
+        "installed": 300,
+        "files": 20,
+        "binpkgs": 100,
+    },
+    "gentoo": {
+        "categories": 150,
+        "packages": 10000,
+        "versions": 3,
+        "installed": 3000,
+        "files": 30,
+        "binpkgs": 1000,
+    },
+}
+
+ARCHES = ("amd64", "arm64", "ppc64", "x86")
+
+REPO_NAME = "synthetic"
+
+# Build time of the oldest installed package
+EPOCH = 1700000000
+
+GLOBAL_FLAGS = 200
+LOCAL_FLAGS = 4
+MAINTAINERS = 300
+
+EBUILD = """\
+# Copyright 2026 Gentoo Authors
+# Distributed under the terms of the GNU General Public License v2
+
+EAPI=8
+
+DESCRIPTION="%(DESCRIPTION)s"
+HOMEPAGE="%(HOMEPAGE)s"
+SRC_URI="https://example.org/distfiles/${P}.tar.gz"
+
+LICENSE="%(LICENSE)s"
+SLOT="%(SLOT)s"
+KEYWORDS="%(KEYWORDS)s"
+IUSE="%(IUSE)s"
+
+RDEPEND="%(RDEPEND)s"
+DEPEND="${RDEPEND}"
+BDEPEND="%(BDEPEND)s"
+"""
+
+# =======
+# Classes
+# =======
+
+
+class SyntheticTree:
+    """A generated repository, VDB, DISTDIR and PKGDIR below a ROOT.
+
+    @type root: str
+    @param root: the ROOT to write to, it is created if needed
+    @type seed: int
+    @param seed: seed of the random choices
+    @param options: overrides of the L{SCALES}["gentoo"] options:
+        categories, packages (per repository), versions (per package),
+        installed (packages in the VDB), files (per installed package) and
+        binpkgs (binary packages)
+    """
+
+    def __init__(self, root, seed=0, **options):
+        self.root = os.path.abspath(root)
+        self.seed = seed
+        self.options = dict(SCALES["gentoo"])
+        for key, value in options.items():
+            if key not in self.options:
+                raise TypeError("unknown option %r" % key)
+            self.options[key] = value
+
+        self.eroot = os.path.join(self.root, EPREFIX.lstrip(os.sep))
+        # PORTAGE_CONFIGROOT is not prefixed
+        self.config = os.path.join(self.root, "etc", "portage")
+        self.repo = os.path.join(self.eroot, "var", "db", "repos", REPO_NAME)
+        self.vdb = os.path.join(self.eroot, "var", "db", "pkg")
+        self.distdir = os.path.join(self.eroot, "var", "cache", "distfiles")
+        self.pkgdir = os.path.join(self.eroot, "var", "cache", "binpkgs")
+
+        # [(cp, [version, ...])], filled in by generate()
+        self.packages = []
+        # [cpv, ...] of the VDB
+        self.installed = []
+
+    def __repr__(self):
+        return "<%s %r>" % (self.__class__.__name__, self.root)
+
+    @property
+    def environ(self):
+        """The environment variables pointing Portage at this tree.
+
+        @rtype: dict
+        """
+
+        return {
+            "ROOT": self.root,
+            "PORTAGE_CONFIGROOT": self.root,
+            "PORTAGE_REPOSITORIES": self._repos_conf(),
+            "PORTAGE_USERNAME": pwd.getpwuid(os.getuid()).pw_name,
+            "PORTAGE_GRPNAME": grp.getgrgid(os.getgid()).gr_name,
+        }
+
+    def generate(self):
+        """Write the whole tree.
+
+        @rtype: L{SyntheticTree}
+        @return: self
+        """
+
+        rand = random.Random(self.seed)
+        self._plan(rand)
+        self._write_config()
+        self._write_repo(rand)
+        self._write_vdb(rand)
+        self._write_distdir(rand)
+        self._write_pkgdir(rand)
+        return self
+
+    def _plan(self, rand):
+        """Pick the packages, versions and what is installed."""
+
+        opts = self.options
+        categories = ["syn-cat%03d" % i for i in range(opts["categories"])]
+        self.packages = []
+        for i in range(opts["packages"]):
+            cp = "%s/pkg%05d" % (categories[i % len(categories)], i)
+            major = rand.randint(0, 5)
+            versions = [
+                "%d.%d.%d" % (major, minor, rand.randint(0, 9))
+                for minor in range(opts["versions"])
+            ]
+            if rand.random() < 0.1:
+                versions[-1] += "-r1"
+            self.packages.append((cp, versions))
+
+        installed = rand.sample(
+            self.packages, min(opts["installed"], len(self.packages))
+        )
+        installed.sort()
+        # Most installed packages are at the newest version, the others
+        # have an upgrade available.
+        self.installed = [
+            "%s-%s" % (cp, versions[-1 if rand.random() < 0.7 else 0])
+            for cp, versions in installed
+        ]
+
+    def _write_config(self):
+        profile = os.path.join(self.repo, "profiles", "default")
+        _write(
+            os.path.join(self.config, "make.conf"),
+            'ACCEPT_LICENSE="*"\n'
+            'FEATURES="-sandbox -usersandbox -binpkg-multi-instance"\n'
+            'DISTDIR="%s"\n'
+            'PKGDIR="%s"\n' % (self.distdir, self.pkgdir),
+        )
+        _write(
+            os.path.join(self.config, "repos.conf", REPO_NAME + ".conf"),
+            self._repos_conf(),
+        )
+        link = os.path.join(self.config, "make.profile")
+        if os.path.lexists(link):
+            os.unlink(link)
+        os.symlink(profile, link)
+        _write(
+            os.path.join(profile, "make.defaults"),
+            'ARCH="amd64"\n'
+            'ACCEPT_KEYWORDS="amd64"\n'
+            'ELIBC="glibc"\nKERNEL="linux"\nUSERLAND="GNU"\n'
+            'CHOST="x86_64-pc-linux-gnu"\n',
+        )
+        _write(os.path.join(profile, "eapi"), "8\n")
+
+    def _repos_conf(self):
+        return "[DEFAULT]\nmain-repo = %s\n\n[%s]\nlocation = %s\n" % (
+            REPO_NAME,
+            REPO_NAME,
+            self.repo,
+        )
+
+    def _write_repo(self, rand):
+        profiles = os.path.join(self.repo, "profiles")
+        categories = sorted({cp.split("/")[0] for cp, versions in self.packages})
+        _write(os.path.join(profiles, "repo_name"), REPO_NAME + "\n")
+        _write(os.path.join(profiles, "categories"), "\n".join(categories) + "\n")
+        _write(os.path.join(profiles, "arch.list"), "\n".join(ARCHES) + "\n")
+        _write(
+            os.path.join(profiles, "use.desc"),
+            "".join(
+                "gflag%03d - Global flag number %d\n" % (i, i)
+                for i in range(GLOBAL_FLAGS)
+            ),
+        )
+        _write(
+            os.path.join(self.repo, "metadata", "layout.conf"),
+            "masters =\nuse-manifests = false\ncache-formats = md5-dict\n",
+        )
+
+        cp_list = [cp for cp, versions in self.packages]
+        for cp, versions in self.packages:
+            pkgdir = os.path.join(self.repo, cp)
+            pn = cp.split("/")[1]
+            local_flags = ["lflag%d" % i for i in range(rand.randint(0, LOCAL_FLAGS))]
+            _write(
+                os.path.join(pkgdir, "metadata.xml"),
+                _metadata_xml(rand, local_flags),
+            )
+            iuse = sorted(rand.sample(range(GLOBAL_FLAGS), rand.randint(0, 8)))
+            iuse = ["gflag%03d" % i for i in iuse] + local_flags
+            for n, version in enumerate(versions):
+                pv = version.split("-r")[0]
+                metadata = {
+                    "BDEPEND": _depend(rand, cp_list, cp, 0, 2, []),
+                    "DEFINED_PHASES": "-",
+                    "DESCRIPTION": "Synthetic package %s" % pn,
+                    "EAPI": "8",
+                    "HOMEPAGE": "https://example.org/%s" % pn,
+                    "IUSE": " ".join(
+                        ("+" + flag) if rand.random() < 0.3 else flag for flag in iuse
+                    ),
+                    "KEYWORDS": _keywords(rand, n == len(versions) - 1),
+                    "LICENSE": rand.choice(("GPL-2", "MIT", "BSD", "Apache-2.0")),
+                    "RDEPEND": _depend(rand, cp_list, cp, 0, 6, iuse),
+                    "SLOT": "0",
+                    "SRC_URI": "https://example.org/distfiles/%s-%s.tar.gz" % (pn, pv),
+                }
+                ebuild = EBUILD % metadata
+                _write(os.path.join(pkgdir, "%s-%s.ebuild" % (pn, version)), ebuild)
+
+                metadata["_md5_"] = hashlib.md5(ebuild.encode("utf_8")).hexdigest()
+                _write(
+                    os.path.join(
+                        self.repo, "metadata", "md5-cache", "%s-%s" % (cp, version)
+                    ),
+                    "".join(
+                        "%s=%s\n" % (key, metadata[key])
+                        for key in sorted(metadata)
+                        if metadata[key]
+                    ),
+                )
+
+    def _write_vdb(self, rand):
+        for counter, cpv in enumerate(self.installed, 1):
+            cat, pf = cpv.split("/")
+            pn = pf.split("-")[0]
+            ebuild = os.path.join(self.repo, cat, pn, pf + ".ebuild")
+            cache = os.path.join(self.repo, "metadata", "md5-cache", cpv)
+            with open(cache) as cache_file:
+                metadata = dict(line.rstrip("\n").split("=", 1) for line in cache_file)
+
+            iuse = [flag.lstrip("+") for flag in metadata.get("IUSE", "").split()]
+            use = sorted(rand.sample(iuse, rand.randint(0, len(iuse))) + ["amd64"])
+            contents, size = self._write_image(rand, pn, pf)
+
+            pkgdir = os.path.join(self.vdb, cpv)
+            entries = {
+                "BUILD_TIME": "%d" % _build_time(counter),
+                "CATEGORY": cat,
+                "CBUILD": "x86_64-pc-linux-gnu",
+                "CHOST": "x86_64-pc-linux-gnu",
+                "CONTENTS": contents,
+                "COUNTER": "%d" % counter,
+                "PF": pf,
+                "SIZE": "%d" % size,
+                "USE": " ".join(use),
+                "repository": REPO_NAME,
+            }
+            for key in (
+                "BDEPEND",
+                "DEFINED_PHASES",
+                "DEPEND",
+                "DESCRIPTION",
+                "EAPI",
+                "HOMEPAGE",
+                "IUSE",
+                "KEYWORDS",
+                "LICENSE",
+                "RDEPEND",
+                "SLOT",
+            ):
+                # DEPEND is ${RDEPEND} in every ebuild
+                value = metadata.get("RDEPEND" if key == "DEPEND" else key)
+                if value:
+                    entries[key] = value
+            for key, value in entries.items():
+                _write(os.path.join(pkgdir, key), value + "\n")
+            with open(ebuild) as source:
+                _write(os.path.join(pkgdir, pf + ".ebuild"), source.read())
+
+        _write(
+            os.path.join(self.eroot, "var", "cache", "edb", "counter"),
+            "%d" % len(self.installed),
+        )
+
+    def _write_image(self, rand, pn, pf):
+        """Install the files of a package and return (CONTENTS, size)."""
+
+        eprefix = EPREFIX.rstrip(os.sep)
+        dirs = ["/usr", "/usr/bin", "/usr/lib64", "/usr/share", "/usr/share/doc"]
+        dirs.append("/usr/share/doc/" + pf)
+        files = ["/usr/bin/" + pn]
+        links = []
+        for i in range(1, self.options["files"]):
+            kind = i % 3
+            if kind == 0:
+                files.append("/usr/share/doc/%s/file%03d.txt" % (pf, i))
+            elif kind == 1:
+                library = "/usr/lib64/lib%s_%d.so.1" % (pn, i)
+                files.append(library)
+                links.append((library[:-2], os.path.basename(library)))
+            else:
+                data = "/usr/share/%s" % pn
+                if data not in dirs:
+                    dirs.append(data)
+                files.append("%s/data%03d" % (data, i))
+
+        lines = []
+        size = 0
+        for path in dirs:
+            os.makedirs(self.root + eprefix + path, exist_ok=True)
+            lines.append("dir %s%s" % (eprefix, path))
+        for path in files:
+            data = ("%s %s\n" % (pf, path)).encode("utf_8") * rand.randint(1, 64)
+            mtime = EPOCH + rand.randint(0, 10**6)
+            target = self.root + eprefix + path
+            with open(target, "wb") as image_file:
+                image_file.write(data)
+            os.utime(target, (mtime, mtime))
+            size += len(data)
+            lines.append(
+                "obj %s%s %s %d" % (eprefix, path, hashlib.md5(data).hexdigest(), mtime)
+            )
+        for path, target in links:
+            link = self.root + eprefix + path
+            if os.path.lexists(link):
+                os.unlink(link)
+            os.symlink(target, link)
+            lines.append("sym %s%s -> %s %d" % (eprefix, path, target, EPOCH))
+        return "\n".join(lines), size
+
+    def _write_distdir(self, rand):
+        """Write the distfiles of the installed and of some other versions,
+        plus some which no ebuild refers to any more."""
+
+        names = set()
+        for cp, versions in self.packages:
+            pn = cp.split("/")[1]
+            for version in versions:
+                if rand.random() < 0.3:
+                    names.add("%s-%s.tar.gz" % (pn, version.split("-r")[0]))
+            if rand.random() < 0.1:
+                names.add("%s-0.0.1.tar.gz" % pn)
+        for cpv in self.installed:
+            names.add("%s.tar.gz" % cpv.split("/")[1].split("-r")[0])
+
+        os.makedirs(self.distdir, exist_ok=True)
+        for name in sorted(names):
+            _write_sparse(os.path.join(self.distdir, name), rand)
+
+    def _write_pkgdir(self, rand):
+        """Write binary packages of installed and older versions, and the
+        Packages index describing them."""
+
+        installed = set(self.installed)
+        candidates = sorted(
+            installed | {"%s-%s" % (cp, versions[0]) for cp, versions in self.packages}
+        )
+        count = min(self.options["binpkgs"], len(candidates))
+        cpvs = sorted(rand.sample(candidates, count))
+
+        counters = {cpv: n for n, cpv in enumerate(self.installed, 1)}
+        entries = []
+        for cpv in cpvs:
+            cat, pf = cpv.split("/")
+            path = "%s/%s.tbz2" % (cat, pf)
+            st = _write_sparse(os.path.join(self.pkgdir, path), rand)
+            cache = os.path.join(self.repo, "metadata", "md5-cache", cpv)
+            with open(cache) as cache_file:
+                metadata = dict(line.rstrip("\n").split("=", 1) for line in cache_file)
+            entries.append(
+                "BUILD_TIME: %d\nCPV: %s\nIUSE: %s\nKEYWORDS: %s\nLICENSE: %s\n"
+                "MD5: %s\n"
+                "MTIME: %d\nPATH: %s\nRDEPEND: %s\nREPO: %s\nSIZE: %d\n"
+                "SLOT: 0\n"
+                % (
+                    # The package of the installed version, or an older build
+                    _build_time(counters.get(cpv, 0)),
+                    cpv,
+                    metadata.get("IUSE", ""),
+                    metadata["KEYWORDS"],
+                    metadata["LICENSE"],
+                    hashlib.md5(cpv.encode("utf_8")).hexdigest(),
+                    st.st_mtime,
+                    path,
+                    metadata.get("RDEPEND", ""),
+                    REPO_NAME,
+                    st.st_size,
+                )
+            )
+
+        header = (
+            "ACCEPT_KEYWORDS: amd64\nARCH: amd64\nCBUILD: x86_64-pc-linux-gnu\n"
+            "CHOST: x86_64-pc-linux-gnu\nPACKAGES: %d\nPROFILE: default\n"
+            "TIMESTAMP: %d\nVERSION: 0\n" % (len(entries), EPOCH)
+        )
+        _write(
+            os.path.join(self.pkgdir, "Packages"),
+            "\n".join([header] + entries) + "\n",
+        )
+
+
+# =========
+# Functions
+# =========
+
+
+def _build_time(counter):
+    return EPOCH + counter * 60
+
+
+def _write(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf_8") as out:
+        out.write(data)
+
+
+def _write_sparse(path, rand):
+    """Create a sparse file of a random realistic size and return its stat."""
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as out:
+        out.truncate(rand.randint(10**4, 10**7))
+    return os.stat(path)
+
+
+def _keywords(rand, newest):
+    keywords = []
+    for arch in ARCHES:
+        chance = rand.random()
+        if chance < 0.15:
+            continue
+        if newest and chance < 0.6 or arch != "amd64" and chance < 0.3:
+            keywords.append("~" + arch)
+        else:
+            keywords.append(arch)
+    return " ".join(keywords)
+
+
+def _depend(rand, cp_list, cp, low, high, iuse):
+    """Return a dependency string on random other packages."""
+
+    atoms = []
+    for dep in rand.sample(cp_list, min(rand.randint(low, high), len(cp_list))):
+        if dep == cp:
+            continue
+        atom = dep
+        if rand.random() < 0.3:
+            atom = ">=%s-0.%d" % (dep, rand.randint(0, 9))
+        if iuse and rand.random() < 0.25:
+            atom = "%s? ( %s )" % (rand.choice(iuse), atom)
+        atoms.append(atom)
+    return " ".join(atoms)
+
+
+def _metadata_xml(rand, local_flags):
+    maintainers = []
+    for i in sorted(rand.sample(range(MAINTAINERS), rand.randint(1, 3))):
+        maintainers.append(
+            '\t<maintainer type="person">\n'
+            "\t\t<email>dev%03d@example.org</email>\n"
+            "\t\t<name>Developer %d</name>\n"
+            "\t</maintainer>\n" % (i, i)
+        )
+    if rand.random() < 0.3:
+        maintainers.append(
+            '\t<maintainer type="project">\n'
+            "\t\t<email>team%02d@example.org</email>\n"
+            "\t</maintainer>\n" % rand.randint(0, 20)
+        )
+    use = ""
+    if local_flags:
+        use = (
+            "\t<use>\n"
+            + "".join(
+                '\t\t<flag name="%s">Local flag %s</flag>\n' % (flag, flag)
+                for flag in local_flags
+            )
+            + "\t</use>\n"
+        )
+    return (
+        '<?xml version="1.0" encoding="UTF-8"?>\n'
+        '<!DOCTYPE pkgmetadata SYSTEM "https://www.gentoo.org/dtd/metadata.dtd">\n'
+        "<pkgmetadata>\n%s%s</pkgmetadata>\n" % ("".join(maintainers), use)
+    )
+
+
+def main(argv=None):
+    """Generate a tree from the command line."""
+
+    parser = argparse.ArgumentParser(
+        prog="python -m gentoolkit.test.synthetic",
+        description="Generate a synthetic repository, VDB, DISTDIR and PKGDIR.",
+    )
+    parser.add_argument("root", help="ROOT to write the tree to")
+    parser.add_argument(
+        "--scale",
+        choices=sorted(SCALES),
+        default="gentoo",
+        help="preset sizes (default: %(default)s)",
+    )
+    parser.add_argument("--seed", type=int, default=0, help="random seed")
+    for key in SCALES["gentoo"]:
+        parser.add_argument("--" + key, type=int, help="override the preset")
+    parser.add_argument(
+        "--env",
+        action="store_true",
+        help="only print the shell commands pointing Portage at ROOT",
+    )
+    args = parser.parse_args(argv)
+
+    options = dict(SCALES[args.scale])
+    for key in options:
+        if getattr(args, key) is not None:
+            options[key] = getattr(args, key)
+    tree = SyntheticTree(args.root, seed=args.seed, **options)
+    if not args.env:
+        tree.generate()
+        sys.stderr.write(
+            "Wrote %d ebuilds, %d installed packages to %s\n"
+            % (sum(len(v) for cp, v in tree.packages), len(tree.installed), tree.root)
+        )
+    for key, value in sorted(tree.environ.items()):
+        print("export %s=%s" % (key, shlex.quote(value)))
+    print("unset EPREFIX")
+
+
+if __name__ == "__main__":
+    main()
+
+# vim: set ts=4 sw=4 tw=79:
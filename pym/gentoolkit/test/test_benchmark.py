@@ -0,0 +1,67 @@
+import unittest
+from io import StringIO
+from unittest import mock
+
+from gentoolkit.test import benchmark
+
+
+def make_results(**medians):
+    return {
+        "tree": {"seed": 0},
+        "results": {name: {"median": value} for name, value in medians.items()},
+    }
+
+
+class TestCompare(unittest.TestCase):
+    def test_regressions(self):
+        old = make_results(fast=1.0, slow=1.0, gone=1.0)
+        new = make_results(fast=0.5, slow=1.2, added=1.0)
+        out = StringIO()
+
+        self.assertEqual(benchmark.compare(old, new, 10, out=out), ["slow"])
+        lines = out.getvalue().splitlines()
+        self.assertIn("REGRESSION", [x for x in lines if x.startswith("slow")][0])
+        self.assertIn("only in one result", [x for x in lines if "gone" in x][0])
+
+    def test_threshold(self):
+        old = make_results(slow=1.0)
+        new = make_results(slow=1.2)
+
+        self.assertEqual(benchmark.compare(old, new, 25, out=StringIO()), [])
+
+    def test_skipped(self):
+        old = make_results(fast=1.0)
+        new = make_results()
+        new["results"]["fast"] = {"skipped": "cannot import name 'x'"}
+        out = StringIO()
+
+        self.assertEqual(benchmark.compare(old, new, 10, out=out), [])
+        self.assertIn("skipped", out.getvalue().splitlines()[1])
+
+    def test_run_skips_missing_code(self):
+        def setup(fixture):
+            from gentoolkit import no_such_module  # noqa: F401
+
+        benchmarks = {"missing": ("needs newer code", setup)}
+        out = StringIO()
+        with mock.patch.object(benchmark, "BENCHMARKS", benchmarks):
+            results = benchmark.run(mock.Mock(options={}), repeat=1, out=out)
+        self.assertIn("no_such_module", results["results"]["missing"]["skipped"])
+        self.assertIn("skipped", out.getvalue())
+
+    def test_registry(self):
+        for name in ("file_owner", "find_distfiles", "assign_packages"):
+            self.assertIn(name, benchmark.BENCHMARKS)
+
+
+def test_main():
+    suite = unittest.TestLoader()
+    suite.loadTestsFromTestCase(TestCompare)
+    unittest.TextTestRunner(verbosity=2).run(suite)
+
+
+test_main.__test__ = False
+
+
+if __name__ == "__main__":
+    test_main()
@@ -0,0 +1,111 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from gentoolkit import contents
+from gentoolkit.package import Package
+
+CONTENTS = """dir /usr
+dir /usr//lib/
+obj /usr/bin/a b 0123abcd 1700000000
+obj /usr/bin/bad md5
+sym /usr/lib/x -> y -> z 1700000001
+sym /usr/lib/old -> tgt (2, 3L, 4L, 5, 6, 7, 8L, 9, 1234, 11)
+fif /run/f
+garbage
+obj /opt/z\0 x 1
+"""
+
+
+class TestContents(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, "CONTENTS")
+        with open(self.path, "w") as f:
+            f.write(CONTENTS)
+        patch = mock.patch.object(contents, "writemsg")
+        self.writemsg = patch.start()
+        self.addCleanup(patch.stop)
+
+    def tearDown(self):
+        contents.clear_contents_cache()
+        shutil.rmtree(self.tmpdir)
+
+    def test_iter_contents(self):
+        self.assertEqual(
+            list(contents.iter_contents(self.path)),
+            [
+                ("/usr", "dir", None, None, None),
+                ("/usr/lib", "dir", None, None, None),
+                ("/usr/bin/a b", "obj", "1700000000", "0123abcd", None),
+                ("/usr/lib/x -> y", "sym", "1700000001", None, "z"),
+                ("/usr/lib/old", "sym", "1234", None, "tgt"),
+                ("/run/f", "fif", None, None, None),
+            ],
+        )
+        self.assertEqual(
+            [x[0][0] for x in self.writemsg.call_args_list],
+            [
+                "!!! Parse error in '%s'\n" % self.path,
+                "!!!   line 4: Unrecognized CONTENTS entry\n",
+                "!!!   line 8: Unrecognized CONTENTS entry\n",
+                "!!!   line 9: Null byte found in CONTENTS entry\n",
+            ],
+        )
+        self.assertEqual(list(contents.iter_contents(self.path + ".gone")), [])
+
+    def test_read_contents(self):
+        self.assertEqual(
+            contents.read_contents(self.path, "/root/"),
+            {
+                "/root/usr": ("dir",),
+                "/root/usr/lib": ("dir",),
+                "/root/usr/bin": ("dir",),
+                "/root/usr/bin/a b": ("obj", "1700000000", "0123abcd"),
+                "/root/usr/lib/x -> y": ("sym", "1700000001", "z"),
+                "/root/usr/lib/old": ("sym", "1234", "tgt"),
+                "/root/run": ("dir",),
+                "/root/run/f": ("fif",),
+            },
+        )
+        # No parents are made up for EPREFIX itself
+        self.assertNotIn("/run", contents.read_contents(self.path, eprefix="/run"))
+
+    def test_get_contents(self):
+        first = contents.get_contents(self.path)
+        self.assertIs(contents.get_contents(self.path), first)
+        self.assertIsNot(contents.get_contents(self.path, "/root"), first)
+
+        with open(self.path, "a") as f:
+            f.write("dev /dev/null\n")
+        self.assertEqual(contents.get_contents(self.path)["/dev/null"], ("dev",))
+
+        with mock.patch.object(contents, "CONTENTS_CACHE_SIZE", 1):
+            contents.get_contents(self.path, "/other")
+        self.assertEqual(len(contents._contents_cache), 1)
+
+    def test_parsed_contents(self):
+        pkg = mock.Mock()
+        pkg._contents.side_effect = lambda prefix_root: contents.get_contents(self.path)
+        parsed = Package.parsed_contents(pkg)
+        self.assertEqual(parsed["/usr/bin/a b"], ("obj", "1700000000", "0123abcd"))
+
+        # Each caller gets its own copy
+        del parsed["/run"]
+        parsed["/usr"] = ("dev",)
+        self.assertEqual(Package.parsed_contents(pkg)["/usr"], ("dir",))
+        self.assertIn("/run", contents.get_contents(self.path))
+
+
+def test_main():
+    suite = unittest.TestLoader().loadTestsFromTestCase(TestContents)
+    unittest.TextTestRunner(verbosity=2).run(suite)
+
+
+test_main.__test__ = False
+
+
+if __name__ == "__main__":
+    test_main()
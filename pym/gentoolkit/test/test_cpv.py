@@ -6,7 +6,9 @@
 
 import unittest
 
-from gentoolkit.cpv import CPV, compare_strs
+from gentoolkit import cpv as cpv_module
+from gentoolkit.cpv import CPV, compare_strs, split_cpv, split_cpvs
+from gentoolkit.errors import GentoolkitInvalidCPV
 
 
 class TestGentoolkitCPV(unittest.TestCase):
@@ -126,6 +128,33 @@ class TestGentoolkitCPV(unittest.TestCase):
             for k in keys:
                 self.assertEqual(getattr(cpv, k), test[1][k])
 
+    def test_split_cpvs(self):
+        cpvs = ["sys-apps/portage-2.2_rc10-r1", "c-portage", "cat/pkg-1-r1"]
+        self.assertEqual(split_cpvs(cpvs), [split_cpv(x) for x in cpvs])
+        self.assertEqual(split_cpvs(cpvs * 2, validate=False)[3:], split_cpvs(cpvs))
+        self.assertRaises(GentoolkitInvalidCPV, split_cpvs, ["cat/pkg-r1"])
+        self.assertRaises(GentoolkitInvalidCPV, split_cpv, "-cat/pkg-1")
+        self.assertEqual(split_cpv("-cat/pkg-1", validate=False)[0], "-cat")
+
+    def test_split_cache(self):
+        cpv_module.clear_split_cpv_cache()
+        chunks = split_cpv("cat/pkg-1")
+        self.assertIs(split_cpv("cat/pkg-1"), chunks)
+        self.assertIs(split_cpvs(["cat/pkg-1"])[0], chunks)
+
+        size = cpv_module.SPLIT_CACHE_SIZE
+        cpv_module.SPLIT_CACHE_SIZE = 2
+        try:
+            split_cpvs(["cat/pkg-2", "cat/pkg-3", "cat/pkg-4"])
+            split_cpv("cat/pkg-5")
+        finally:
+            cpv_module.SPLIT_CACHE_SIZE = size
+        self.assertEqual(
+            list(cpv_module._split_cache[True]), ["cat/pkg-4", "cat/pkg-5"]
+        )
+        cpv_module.clear_split_cpv_cache()
+        self.assertIsNot(split_cpv("cat/pkg-1"), chunks)
+
 
 def test_main():
     suite = unittest.TestLoader().loadTestsFromTestCase(TestGentoolkitCPV)
@@ -0,0 +1,105 @@
+import os
+import socket
+import threading
+import unittest
+from io import StringIO
+from unittest import mock
+from tempfile import mkdtemp
+
+from gentoolkit import daemon
+
+
+class TestDaemonClient(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = mkdtemp(prefix="equeryunittest")
+        self.socket_env = os.environ.get("EQUERY_SOCKET")
+
+    def tearDown(self):
+        if self.socket_env is None:
+            os.environ.pop("EQUERY_SOCKET", None)
+        else:
+            os.environ["EQUERY_SOCKET"] = self.socket_env
+        os.rmdir(self.tmpdir)
+
+    def test_get_socket_path(self):
+        os.environ["EQUERY_SOCKET"] = "/some/path"
+        self.assertEqual(daemon.get_socket_path(), "/some/path")
+        os.environ["EQUERY_SOCKET"] = ""
+        self.assertEqual(daemon.get_socket_path(), None)
+
+    def test_no_daemon(self):
+        # No socket, or nothing listening on it: run in-process
+        os.environ["EQUERY_SOCKET"] = os.path.join(self.tmpdir, "equery.socket")
+        self.assertEqual(daemon.run_client(["equery", "list", "*"]), None)
+
+        os.environ["EQUERY_SOCKET"] = self.tmpdir
+        self.assertEqual(daemon.run_client(["equery", "list", "*"]), None)
+
+        # The daemon itself never talks to a daemon
+        self.assertEqual(daemon.run_client(["equery", "--daemon"]), None)
+
+    def serve_once(self, *replies):
+        path = os.path.join(self.tmpdir, "equery.socket")
+        os.environ["EQUERY_SOCKET"] = path
+        server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        server.bind(path)
+        server.listen(1)
+
+        def answer():
+            conn = server.accept()[0]
+            request, fds = daemon._receive_request(conn)
+            for fd in fds:
+                os.close(fd)
+            for reply in replies:
+                conn.sendall(reply + b"\n")
+            conn.close()
+            server.close()
+            os.unlink(path)
+
+        thread = threading.Thread(target=answer)
+        thread.start()
+        self.addCleanup(thread.join)
+
+    def test_replies(self):
+        self.serve_once(b"pid 1", b"3")
+        self.assertEqual(daemon.run_client(["equery", "list", "*"]), 3)
+
+    def test_retry(self):
+        self.serve_once(daemon.RETRY)
+        self.assertEqual(daemon.run_client(["equery", "list", "*"]), None)
+
+    def test_no_status(self):
+        # The request may have run already, it must not run again
+        self.serve_once(b"pid 1")
+        with mock.patch("sys.stderr", new_callable=StringIO):
+            self.assertEqual(daemon.run_client(["equery", "list", "*"]), 1)
+
+
+class TestDaemonServer(unittest.TestCase):
+    def test_silent_client(self):
+        # A client which sends nothing must not block everyone else
+        conn, client = socket.socketpair()
+        with mock.patch.object(daemon, "REQUEST_TIMEOUT", 0.01):
+            daemon._handle(conn)
+        self.assertEqual(client.recv(64), b"")
+        client.close()
+
+        conn, client = socket.socketpair()
+        client.sendall(b'{"argv": ')
+        with mock.patch.object(daemon, "REQUEST_TIMEOUT", 0.01):
+            daemon._handle(conn)
+        self.assertEqual(client.recv(64), daemon.RETRY + b"\n")
+        client.close()
+
+
+def test_main():
+    suite = unittest.TestLoader().loadTestsFromTestCase(TestDaemonClient)
+    suite.addTests(unittest.TestLoader().loadTestsFromTestCase(TestDaemonServer))
+    unittest.TextTestRunner(verbosity=2).run(suite)
+
+
+test_main.__test__ = False
+
+
+if __name__ == "__main__":
+    test_main()
@@ -0,0 +1,185 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from gentoolkit.enalyze import lib
+from gentoolkit.enalyze.cache import ResultCache
+from gentoolkit.enalyze.lib import FlagAnalyzer, KeywordAnalyser
+
+
+def get_flags(cpv):
+    return ["+on", "off", "maybe"]
+
+
+def get_used(cpv, target):
+    return ["maybe"] if cpv.endswith("0-1") else ["on"]
+
+
+class TestFlagAnalyzer(unittest.TestCase):
+    def setUp(self):
+        self.cpvs = ["app-misc/pkg%03d-1" % i for i in range(2 * lib.MIN_SHARD_SIZE)]
+        self.flags = FlagAnalyzer(
+            ["off"], _get_flags=get_flags, _get_used=get_used, filter_defaults=True
+        )
+
+    def test_analyse_cpv(self):
+        self.assertEqual(
+            self.flags.analyse_cpv("app-misc/pkg000-1"),
+            ({"maybe"}, {"on", "off"}, set()),
+        )
+        self.assertEqual(
+            self.flags.analyse_cpv("app-misc/pkg001-1"), (set(), {"off"}, {"maybe"})
+        )
+
+    def test_analyse_cpvs(self):
+        serial = list(self.flags.analyse_cpvs(self.cpvs))
+        self.assertEqual([cpv for cpv, result in serial], self.cpvs)
+        self.assertEqual(list(self.flags.analyse_cpvs(self.cpvs, jobs=2)), serial)
+
+
+class FakeVardb:
+    installed = {
+        "app-misc/stable-1": ("amd64 ~x86", "amd64 foo"),
+        "app-misc/testing-1": ("~amd64 x86", "amd64"),
+        "app-misc/both-1": ("~amd64 amd64", "amd64"),
+        "app-misc/other-1": ("~x86", "x86"),
+        "app-misc/none-1": ("", "amd64"),
+    }
+
+    def aux_get(self, cpv, keys):
+        return list(self.installed[cpv])
+
+
+class TestKeywordAnalyser(unittest.TestCase):
+    def make_analyser(self):
+        analyser = KeywordAnalyser("amd64", ["amd64"], FakeVardb())
+        analyser.set_order(["amd64"])
+        return analyser
+
+    def test_get_inst_keywords(self):
+        cpvs = sorted(FakeVardb.installed)
+        single = self.make_analyser()
+        expected = [(cpv, single.get_inst_keyword_cpv(cpv)) for cpv in cpvs]
+        bulk = self.make_analyser()
+
+        self.assertEqual(list(bulk.get_inst_keywords(cpvs)), expected)
+        self.assertEqual(bulk.mismatched, ["app-misc/other-1"])
+        self.assertEqual(
+            dict(expected),
+            {
+                "app-misc/both-1": "amd64",
+                "app-misc/none-1": "-amd64",
+                "app-misc/other-1": "~x86",
+                "app-misc/stable-1": "amd64",
+                "app-misc/testing-1": "~amd64",
+            },
+        )
+
+
+class TempVardb:
+    def __init__(self, root):
+        self.root = root
+
+    def getpath(self, cpv):
+        return os.path.join(self.root, cpv)
+
+    def install(self, cpv, counter):
+        os.makedirs(self.getpath(cpv), exist_ok=True)
+        with open(os.path.join(self.getpath(cpv), "COUNTER"), "w") as f:
+            f.write("%d\n" % counter)
+
+
+class TempPortdb:
+    def __init__(self, location):
+        self.location = location
+
+    def findname2(self, cpv):
+        cat, pf = cpv.split("/")
+        ebuild = os.path.join(self.location, cat, pf.rsplit("-", 1)[0], pf + ".ebuild")
+        if not os.path.exists(ebuild):
+            return None, 0
+        return ebuild, self.location
+
+    def write(self, cpv, iuse):
+        path = os.path.join(self.location, "metadata", "md5-cache", cpv)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as f:
+            f.write("IUSE=%s\n" % iuse)
+        ebuild = self.findname2(cpv)[0] or os.path.join(
+            self.location, cpv.rsplit("-", 1)[0], cpv.split("/")[1] + ".ebuild"
+        )
+        os.makedirs(os.path.dirname(ebuild), exist_ok=True)
+        with open(ebuild, "w") as f:
+            f.write('IUSE="%s"\n' % iuse)
+
+
+class TestResultCache(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, "cache", "use.json")
+        self.vardb = TempVardb(os.path.join(self.tmpdir, "pkg"))
+        self.vardb.install("app-misc/a-1", 1)
+        self.vardb.install("app-misc/b-1", 2)
+        self.portdb = TempPortdb(os.path.join(self.tmpdir, "repo"))
+        self.portdb.write("app-misc/a-1", "foo")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def run_cache(self, cpvs, state="state"):
+        cache = ResultCache(self.path, state, self.vardb, self.portdb)
+        cache.load()
+        found, missing = cache.lookup(cpvs)
+        for cpv in missing:
+            cache.store(cpv, [cpv, "result"])
+        cache.save()
+        return found, missing
+
+    def test_lookup(self):
+        cpvs = ["app-misc/a-1", "app-misc/b-1"]
+        self.assertEqual(self.run_cache(cpvs), ({}, cpvs))
+        self.assertEqual(
+            self.run_cache(cpvs),
+            ({cpv: [cpv, "result"] for cpv in cpvs}, []),
+        )
+
+        # reinstalled
+        self.vardb.install("app-misc/b-1", 3)
+        found, missing = self.run_cache(cpvs)
+        self.assertEqual(list(found), ["app-misc/a-1"])
+        self.assertEqual(missing, ["app-misc/b-1"])
+
+        # the ebuild and its md5-cache entry changed, or it was added
+        self.portdb.write("app-misc/a-1", "foo bar")
+        self.portdb.write("app-misc/b-1", "foo")
+        self.assertEqual(self.run_cache(cpvs), ({}, cpvs))
+
+        # the configuration changed
+        self.assertEqual(self.run_cache(cpvs, state="other"), ({}, cpvs))
+
+    def test_uninstalled(self):
+        self.run_cache(["app-misc/a-1", "app-misc/b-1"])
+        self.run_cache(["app-misc/a-1"])
+        self.assertEqual(self.run_cache(["app-misc/b-1"]), ({}, ["app-misc/b-1"]))
+
+    def test_unreadable(self):
+        os.makedirs(os.path.dirname(self.path))
+        with open(self.path, "w") as f:
+            f.write("{")
+        self.assertEqual(self.run_cache(["app-misc/a-1"]), ({}, ["app-misc/a-1"]))
+
+
+def test_main():
+    suite = unittest.TestLoader()
+    suite.loadTestsFromTestCase(TestFlagAnalyzer)
+    suite.loadTestsFromTestCase(TestKeywordAnalyser)
+    suite.loadTestsFromTestCase(TestResultCache)
+    unittest.TextTestRunner(verbosity=2).run(suite)
+
+
+test_main.__test__ = False
+
+
+if __name__ == "__main__":
+    test_main()
@@ -1,7 +1,8 @@
 import os
+import shutil
 import unittest
 import warnings
-from tempfile import NamedTemporaryFile, mktemp
+from tempfile import NamedTemporaryFile, mkdtemp, mktemp
 
 from gentoolkit import helpers
 
@@ -64,9 +65,188 @@ class TestFileOwner(unittest.TestCase):
         self.assertRaises(AttributeError, extend_realpaths, set())
 
 
+class TestCPIndex(unittest.TestCase):
+    def test_index(self):
+        cps = ["dev-lang/python", "app-misc/foo", "dev-lang/perl", "app-misc/foo"]
+        index = helpers.CPIndex(cps)
+
+        self.assertEqual(index.categories, ["app-misc", "dev-lang"])
+        self.assertEqual(index.get_names("dev-lang"), ["perl", "python"])
+        self.assertEqual(index.get_names("dev-libs"), [])
+        self.assertEqual(len(index), 3)
+        self.assertEqual(
+            list(index), ["app-misc/foo", "dev-lang/perl", "dev-lang/python"]
+        )
+
+        cat_predicate = lambda x: x.startswith("dev-")
+        cp_predicate = lambda x: x.endswith("n")
+        self.assertEqual(
+            list(index.get_cps(cat_predicate=cat_predicate)),
+            ["dev-lang/perl", "dev-lang/python"],
+        )
+        self.assertEqual(
+            list(index.get_cps(cp_predicate=cp_predicate)),
+            ["dev-lang/python"],
+        )
+
+
+class FakeVardb:
+    def __init__(self, root):
+        self.root = root
+
+    def cpv_all(self):
+        return ["app-misc/foo-1", "app-misc/bar-2"]
+
+    def getpath(self, cpv):
+        return os.path.join(self.root, cpv)
+
+    def aux_get(self, cpv, keys):
+        return ["%s %s" % (cpv, key) for key in keys]
+
+
+class TestGetInstalledMetadata(unittest.TestCase):
+    def setUp(self):
+        self.root = mkdtemp()
+        os.makedirs(os.path.join(self.root, "app-misc", "foo-1"))
+        os.makedirs(os.path.join(self.root, "app-misc", "bar-2"))
+        with open(os.path.join(self.root, "app-misc", "foo-1", "USE"), "w") as f:
+            f.write("a  b\nc\n")
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def test_vdb(self):
+        vardb = FakeVardb(self.root)
+        self.assertEqual(
+            list(helpers.get_installed_metadata(("USE", "SLOT"), vardb=vardb)),
+            [("app-misc/foo-1", ["a b c", ""]), ("app-misc/bar-2", ["", ""])],
+        )
+
+    def test_aux_get(self):
+        class AuxOnly:
+            aux_get = FakeVardb.aux_get
+
+        self.assertEqual(
+            list(helpers.get_installed_metadata(["USE"], ["x/y-1"], AuxOnly())),
+            [("x/y-1", ["x/y-1 USE"])],
+        )
+
+
+class FakeRepoCpv(str):
+    def __new__(cls, cpv, repo):
+        self = str.__new__(cls, cpv)
+        self.repo = repo
+        return self
+
+
+class FakeRepoDbs:
+    def __init__(self):
+        self.calls = 0
+
+    def cp_list(self, cp):
+        self.calls += 1
+        if cp == "app-misc/foo":
+            return ["app-misc/foo-1"]
+        return []
+
+    def aux_get(self, cpv, keys):
+        return ["overlay"]
+
+
+class FakePortdb(FakeRepoDbs):
+    def cp_list(self, cp):
+        self.calls += 1
+        return [
+            FakeRepoCpv(cp + "-1", "gentoo"),
+            FakeRepoCpv(cp + "-2", "gentoo"),
+            FakeRepoCpv(cp + "-2", "overlay"),
+        ]
+
+
+class TestRepoNames(unittest.TestCase):
+    def test_resolve(self):
+        vardb, portdb = FakeRepoDbs(), FakePortdb()
+        repo_names = helpers.RepoNames(vardb, portdb)
+        self.assertEqual(
+            repo_names.resolve(["app-misc/foo-1", "app-misc/foo-2", "app-misc/foo-3"]),
+            {
+                "app-misc/foo-1": "overlay",
+                "app-misc/foo-2": "overlay",
+                "app-misc/foo-3": "",
+            },
+        )
+        self.assertEqual(repo_names("app-misc/bar-1"), "gentoo")
+        self.assertEqual(repo_names("app-misc/foo-1"), "overlay")
+        # One lookup per cat/pkg and database
+        self.assertEqual((vardb.calls, portdb.calls), (2, 2))
+
+
+class TestWriteCacheFile(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_write_cache_file(self):
+        path = os.path.join(self.tmpdir, "cache", "test.idx")
+        self.assertTrue(helpers.write_cache_file(path, lambda f: f.write("one")))
+        self.assertTrue(
+            helpers.write_cache_file(path, lambda f: f.write(b"two"), binary=True)
+        )
+        with open(path) as f:
+            self.assertEqual(f.read(), "two")
+
+        def fail(f):
+            f.write("three")
+            raise OSError("disk full")
+
+        self.assertFalse(helpers.write_cache_file(path, fail))
+        self.assertEqual(os.listdir(os.path.dirname(path)), ["test.idx"])
+        with open(path) as f:
+            self.assertEqual(f.read(), "two")
+
+
+_worker_offset = 0
+
+
+def _set_worker_offset(offset):
+    global _worker_offset
+    _worker_offset = offset
+
+
+def _add_worker_offset(item):
+    return (os.getpid(), item + _worker_offset)
+
+
+class TestForkMap(unittest.TestCase):
+    def test_fork_map(self):
+        items = list(range(20))
+        self.assertIsNone(helpers.fork_map(_add_worker_offset, items, 1))
+        self.assertIsNone(helpers.fork_map(_add_worker_offset, items, 4, 11))
+        results = helpers.fork_map(
+            _add_worker_offset,
+            items,
+            4,
+            5,
+            initializer=_set_worker_offset,
+            initargs=(100,),
+        )
+        if results is None:
+            self.skipTest("processes can not be forked")
+        results = list(results)
+        self.assertEqual([x[1] for x in results], list(range(100, 120)))
+        self.assertNotIn(os.getpid(), [x[0] for x in results])
+
+
 def test_main():
     suite = unittest.TestLoader()
     suite.loadTestsFromTestCase(TestFileOwner)
+    suite.loadTestsFromTestCase(TestCPIndex)
+    suite.loadTestsFromTestCase(TestGetInstalledMetadata)
+    suite.loadTestsFromTestCase(TestRepoNames)
+    suite.loadTestsFromTestCase(TestWriteCacheFile)
+    suite.loadTestsFromTestCase(TestForkMap)
     unittest.TextTestRunner(verbosity=2).run(suite)
 
 
@@ -0,0 +1,74 @@
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+
+import gentoolkit
+from gentoolkit.test.synthetic import SCALES, SyntheticTree
+
+# Run in a child, as Portage reads its environment once per process
+FIND_IMLATE = """
+import json, sys
+from gentoolkit.imlate import imlate
+
+imlate.MIN_SHARD_SIZE = 1
+results = []
+for jobs in (1, 3):
+    conf = imlate.get_settings(
+        {
+            "MAIN_ARCH": "amd64",
+            "TARGET_ARCH": "arm64",
+            "MTIME": 0,
+            "STABLE": True,
+            "KEYWORD": True,
+            "CATEGORIES": None,
+            "MAINTAINER": None,
+            "USER_PKGS": [],
+            "STABLE_SUM": 0,
+            "KEYWORD_SUM": 0,
+        }
+    )
+    found = imlate.find_imlate(conf, jobs)
+    results.append([found, conf["STABLE_SUM"], conf["KEYWORD_SUM"]])
+json.dump(results, sys.stdout)
+"""
+
+
+class TestFindImlate(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.tree = SyntheticTree(self.tmpdir, **SCALES["tiny"]).generate()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_jobs(self):
+        env = dict(os.environ, **self.tree.environ)
+        env.pop("EPREFIX", None)
+        env["XDG_CACHE_HOME"] = os.path.join(self.tmpdir, "cache")
+        env["PYTHONPATH"] = os.path.dirname(os.path.dirname(gentoolkit.__file__))
+        output = subprocess.run(
+            [sys.executable, "-c", FIND_IMLATE],
+            env=env,
+            stdout=subprocess.PIPE,
+            check=True,
+        ).stdout
+        serial, sharded = json.loads(output)
+        self.assertTrue(serial[0])
+        self.assertEqual(serial[1] + serial[2], sum(map(len, serial[0].values())))
+        self.assertEqual(sharded, serial)
+
+
+def test_main():
+    suite = unittest.TestLoader().loadTestsFromTestCase(TestFindImlate)
+    unittest.TextTestRunner(verbosity=2).run(suite)
+
+
+test_main.__test__ = False
+
+
+if __name__ == "__main__":
+    test_main()
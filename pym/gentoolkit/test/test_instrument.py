@@ -0,0 +1,113 @@
+import os
+import pstats
+import shutil
+import tempfile
+import unittest
+from io import StringIO
+
+from gentoolkit import instrument
+
+
+class TestTimings(unittest.TestCase):
+    def test_phase(self):
+        timings = instrument.Timings()
+        with timings.phase("outer"):
+            with timings.phase("inner"):
+                pass
+            with timings.phase("inner"):
+                pass
+
+        self.assertEqual(list(timings.phases), ["outer", "inner"])
+        self.assertEqual(timings.phases["outer"][:2], [0, 1])
+        self.assertEqual(timings.phases["inner"][:2], [1, 2])
+        self.assertTrue(timings.phases["outer"][2] >= timings.phases["inner"][2])
+
+    def test_recursion(self):
+        timings = instrument.Timings()
+        with timings.phase("walk"):
+            with timings.phase("walk"):
+                pass
+
+        self.assertEqual(timings.phases["walk"][:2], [0, 1])
+
+    def test_format(self):
+        timings = instrument.Timings()
+        timings.add("read CONTENTS", 1.5, 1.25)
+        table = timings.format().splitlines()
+
+        self.assertEqual(table[0], " * Timings")
+        self.assertTrue(table[2].endswith("  read CONTENTS"))
+        self.assertIn("1.500", table[2])
+        self.assertTrue(table[-1].endswith("total"))
+
+
+class TestInstrument(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        instrument.configure(profile="", timings=False)
+        shutil.rmtree(self.tmpdir)
+
+    def test_disabled(self):
+        instrument.configure(profile="", timings=False)
+        out = StringIO()
+        with instrument.session("tool", out=out):
+            with instrument.phase("work"):
+                pass
+
+        self.assertEqual(out.getvalue(), "")
+
+    def test_timed(self):
+        @instrument.timed("double")
+        def double(value):
+            return value * 2
+
+        instrument.configure(timings=True)
+        out = StringIO()
+        with instrument.session("tool", out=out):
+            self.assertEqual(double(2), 4)
+            self.assertEqual(double(3), 6)
+
+        rows = out.getvalue().splitlines()
+        self.assertTrue(rows[2].endswith("  startup"))
+        self.assertTrue(rows[3].endswith("  tool"))
+        self.assertTrue(rows[4].endswith("    double"))
+        self.assertEqual(rows[4].split()[2], "2")
+
+    def test_profile(self):
+        path = os.path.join(self.tmpdir, "tool.prof")
+        instrument.configure(profile=path)
+        with instrument.session("tool"):
+            sorted(range(10))
+
+        self.assertTrue(pstats.Stats(path).total_calls > 0)
+
+    def test_nested_tool(self):
+        # equery keywords runs eshowkw inside its own session
+        from gentoolkit import eshowkw
+
+        instrument.configure(timings=True)
+        out = StringIO()
+        with instrument.session("equery keywords", out=out):
+            with self.assertRaises(SystemExit):
+                eshowkw.main([], indirect=True)
+
+        rows = out.getvalue().splitlines()
+        self.assertEqual(rows.count(" * Timings"), 1)
+        self.assertTrue(rows[3].endswith("  equery keywords"))
+        self.assertTrue(rows[4].endswith("    eshowkw"))
+
+
+def test_main():
+    suite = unittest.TestLoader()
+    suite.loadTestsFromTestCase(TestTimings)
+    suite.loadTestsFromTestCase(TestInstrument)
+    unittest.TextTestRunner(verbosity=2).run(suite)
+
+
+test_main.__test__ = False
+
+
+if __name__ == "__main__":
+    test_main()
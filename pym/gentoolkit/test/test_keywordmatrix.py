@@ -0,0 +1,84 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from gentoolkit.keywordmatrix import KeywordMatrix
+
+EBUILDS = {
+    "app-misc/foo-1": "amd64 arm64 ~riscv",
+    "app-misc/foo-2": "~amd64 ~arm64",
+    "app-misc/bar-1": "-* amd64",
+    "dev-libs/baz-1.0-r1": "amd64 -arm64 x86",
+    "dev-libs/baz-2": "",
+}
+
+
+class TestKeywordMatrix(unittest.TestCase):
+    def setUp(self):
+        self.repo = tempfile.mkdtemp()
+        for cpv, keywords in EBUILDS.items():
+            cat, pf = cpv.split("/")
+            pn = pf.split("-")[0]
+            self.write("metadata/md5-cache/%s/%s" % (cat, pf), keywords)
+            self.write("%s/%s/%s.ebuild" % (cat, pn, pf), keywords)
+        self.matrix = KeywordMatrix(self.repo, ["amd64", "arm64", "riscv", "x86"])
+        self.matrix.load()
+
+    def tearDown(self):
+        shutil.rmtree(self.repo)
+
+    def write(self, name, keywords):
+        path = os.path.join(self.repo, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as f:
+            f.write("EAPI=8\nKEYWORDS=%s\nSLOT=0\n" % keywords)
+
+    def query(self, expression):
+        return self.matrix.select(self.matrix.query(expression))
+
+    def test_load(self):
+        self.assertEqual(sorted(self.matrix.cpvs), sorted(EBUILDS))
+        self.assertEqual(self.query("*"), self.matrix.cpvs)
+
+    def test_query(self):
+        self.assertEqual(
+            self.query("amd64 & !arm64"),
+            ["app-misc/bar-1", "dev-libs/baz-1.0-r1"],
+        )
+        self.assertEqual(self.query("-arm64 | -*"), self.query("(-*|-arm64)"))
+        self.assertEqual(len(self.query("!~riscv")), 4)
+        self.assertEqual(
+            self.query("!?riscv & !?arm64"),
+            ["app-misc/bar-1", "dev-libs/baz-2"],
+        )
+        self.assertEqual(
+            self.query("~amd64 & ~arm64 | x86"), self.query("!!?x86 | ~amd64")
+        )
+
+    def test_errors(self):
+        for expression in ("", "amd64 &", "(amd64", "amd64)", "| x86", "sparc"):
+            self.assertRaises(ValueError, self.matrix.query, expression)
+
+    def test_ebuilds(self):
+        os.unlink(os.path.join(self.repo, "app-misc", "foo", "foo-2.ebuild"))
+        self.assertEqual(
+            self.matrix.ebuilds(self.matrix.query("?amd64 & !x86")),
+            [
+                os.path.join(self.repo, "app-misc", "bar", "bar-1.ebuild"),
+                os.path.join(self.repo, "app-misc", "foo", "foo-1.ebuild"),
+            ],
+        )
+
+
+def test_main():
+    suite = unittest.TestLoader()
+    suite.loadTestsFromTestCase(TestKeywordMatrix)
+    unittest.TextTestRunner(verbosity=2).run(suite)
+
+
+test_main.__test__ = False
+
+
+if __name__ == "__main__":
+    test_main()
@@ -0,0 +1,102 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from gentoolkit import errors, metadata
+from gentoolkit.maintainers import MaintainerIndex, match_maintainers
+from gentoolkit.metadata import MetadataCache
+
+METADATA = """<?xml version="1.0" encoding="UTF-8"?>
+<pkgmetadata>
+%s
+	<upstream>
+		<maintainer><email>upstream@example.org</email></maintainer>
+	</upstream>
+</pkgmetadata>
+"""
+
+MAINTAINER = """	<maintainer type="person">
+		<email>%s</email>
+	</maintainer>"""
+
+
+class TestMaintainerIndex(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.repo = os.path.join(self.tmpdir, "repo")
+        self.cache_path = os.path.join(self.tmpdir, "md.idx")
+        metadata._metadata_cache = MetadataCache(self.cache_path)
+        self.write("app-misc/foo", "dev@example.org", "python@gentoo.org")
+        self.write("app-misc/bar", "dev@example.org")
+        self.write("dev-python/baz", "python@gentoo.org")
+        self.write("dev-python/orphan")
+
+    def tearDown(self):
+        metadata.clear_metadata_cache()
+        shutil.rmtree(self.tmpdir)
+
+    def write(self, cp, *emails):
+        path = os.path.join(self.repo, cp, "metadata.xml")
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as f:
+            f.write(METADATA % "\n".join(MAINTAINER % email for email in emails))
+        return path
+
+    def index(self):
+        return MaintainerIndex(self.repo).refresh()
+
+    def test_find(self):
+        index = self.index()
+        self.assertEqual(
+            index.find(["dev@example.org"]), ["app-misc/bar", "app-misc/foo"]
+        )
+        self.assertEqual(
+            index.find(["python@", "nobody"]), ["app-misc/foo", "dev-python/baz"]
+        )
+        self.assertEqual(index.find(["upstream@example.org"]), [])
+        self.assertEqual(len(index.find(["upstream@"], upstream=True)), 4)
+        self.assertEqual(len(index.find([""])), 4)
+        self.assertEqual(index.maintainers("dev-python/baz"), ["python@gentoo.org"])
+
+    def test_refresh(self):
+        self.index().save()
+        path = self.write("app-misc/bar", "other@example.org")
+        os.utime(path, ns=(1, 1))
+        shutil.rmtree(os.path.join(self.repo, "app-misc", "foo"))
+        new = self.write("app-misc/new", "dev@example.org")
+
+        metadata._metadata_cache = MetadataCache(self.cache_path)
+        index = self.index()
+        self.assertEqual(index.find(["dev@"]), ["app-misc/new"])
+        self.assertEqual(index.find(["other@"]), ["app-misc/bar"])
+        self.assertEqual(len(index.entries), 4)
+        self.assertEqual(sorted(metadata.get_metadata_cache().parsed), [path, new])
+
+    def test_invalid(self):
+        path = self.write("dev-python/orphan")
+        with open(path, "w") as f:
+            f.write("<pkgmetadata>")
+        with self.assertRaises(errors.GentoolkitFatalError) as cm:
+            self.index()
+        self.assertIn(path, str(cm.exception))
+
+    def test_match_maintainers(self):
+        self.assertTrue(match_maintainers(["a@b"], ["a@b"]))
+        self.assertTrue(match_maintainers(["x", "a@"], ["a@b"]))
+        self.assertFalse(match_maintainers(["b@"], ["a@b"]))
+        self.assertTrue(match_maintainers([""], []))
+        self.assertFalse(match_maintainers(["a@b"], []))
+
+
+def test_main():
+    suite = unittest.TestLoader()
+    suite.loadTestsFromTestCase(TestMaintainerIndex)
+    unittest.TextTestRunner(verbosity=2).run(suite)
+
+
+test_main.__test__ = False
+
+
+if __name__ == "__main__":
+    test_main()
@@ -0,0 +1,138 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from gentoolkit import metadata
+from gentoolkit.metadata import MetaData, MetadataCache
+
+METADATA = """<?xml version="1.0" encoding="UTF-8"?>
+<pkgmetadata>
+	<maintainer type="person" restrict="&gt;=app-misc/%(pn)s-2">
+		<email>%(pn)s@example.org</email>
+		<name>Maintainer</name>
+	</maintainer>
+	<longdescription>A package</longdescription>
+	<use>
+		<flag name="foo">Enable <pkg>app-misc/foo</pkg> support</flag>
+	</use>
+	<upstream>
+		<maintainer status="active"><email>up@example.org</email></maintainer>
+		<doc lang="en">https://example.org/doc</doc>
+		<remote-id type="github">example/%(pn)s</remote-id>
+	</upstream>
+</pkgmetadata>
+"""
+
+
+class TestMetadataCache(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.repo = os.path.join(self.tmpdir, "repo")
+        self.cache_path = os.path.join(self.tmpdir, "cache", "metadata.idx")
+        self.paths = [self.write(pn) for pn in ("aaa", "bbb", "ccc")]
+        self.new_cache()
+
+    def tearDown(self):
+        metadata.clear_metadata_cache()
+        shutil.rmtree(self.tmpdir)
+
+    def write(self, pn, template=METADATA):
+        path = os.path.join(self.repo, "app-misc", pn, "metadata.xml")
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as f:
+            f.write(template % {"pn": pn})
+        return path
+
+    def new_cache(self):
+        metadata._metadata_cache = MetadataCache(self.cache_path)
+        return metadata._metadata_cache
+
+    def test_fields(self):
+        parsed = MetaData(self.paths[0])
+        self.assertIsNotNone(parsed._tree)
+        self.assertEqual(parsed.maintainers()[0].email, "aaa@example.org")
+        self.assertEqual(parsed.maintainers()[0].restrict, ">=app-misc/aaa-2")
+        self.assertEqual(parsed.upstream()[0].maintainers[0].status, "active")
+        self.assertEqual(parsed.upstream()[0].docs, [("https://example.org/doc", "en")])
+
+        metadata.get_metadata_cache().save()
+        self.new_cache()
+        cached = MetaData(self.paths[0])
+        self.assertIsNone(cached._tree)
+        self.assertEqual(cached.fields(), parsed.fields())
+        self.assertEqual(cached.upstream()[0].remoteids, [("example/aaa", "github")])
+        self.assertEqual(cached.use()[0].description, parsed.use()[0].description)
+
+    def test_lazy(self):
+        self.assertEqual(MetaData(self.paths[0]).maintainers()[0].name, "Maintainer")
+        cache = metadata.get_metadata_cache()
+        self.assertEqual(list(cache.parsed[self.paths[0]][2]), ["maintainers"])
+        cache.save()
+
+        cache = self.new_cache()
+        cached = MetaData(self.paths[0])
+        self.assertIsNone(cached._tree)
+        self.assertEqual(cached.maintainers()[0].email, "aaa@example.org")
+        self.assertIsNone(cached._tree)
+        self.assertEqual(cached.use()[0].name, "foo")
+        self.assertIsNotNone(cached._tree)
+        self.assertEqual(sorted(cache.parsed[self.paths[0]][2]), ["maintainers", "use"])
+
+    def test_stale(self):
+        MetaData(self.paths[1])
+        metadata.get_metadata_cache().save()
+        self.write("bbb", METADATA.replace("Maintainer", "Someone else"))
+        os.utime(self.paths[1], ns=(1, 1))
+
+        self.new_cache()
+        self.assertEqual(MetaData(self.paths[1]).maintainers()[0].name, "Someone else")
+        self.assertIn(self.paths[1], metadata.get_metadata_cache().parsed)
+
+    def test_errors(self):
+        self.assertRaises(IOError, MetaData, os.path.join(self.repo, "missing.xml"))
+        self.assertRaises(SyntaxError, MetaData, self.write("bad", "<pkgmetadata>"))
+
+    def test_load_repository(self):
+        self.write("bad", "<pkgmetadata>")
+        self.assertEqual(metadata.load_repository(self.repo, jobs=1), 4)
+        serial = metadata.get_metadata_cache().parsed
+
+        cache = self.new_cache()
+        min_chunk_size = metadata.MIN_CHUNK_SIZE
+        metadata.MIN_CHUNK_SIZE = 1
+        try:
+            self.assertEqual(metadata.load_repository(self.repo, jobs=2), 4)
+        finally:
+            metadata.MIN_CHUNK_SIZE = min_chunk_size
+        self.assertEqual(cache.parsed, serial)
+        self.assertEqual(sorted(cache.parsed), sorted(self.paths))
+
+        cache.save()
+        self.assertEqual(metadata.load_repository(self.repo), 1)
+
+    def test_load_repository_fields(self):
+        self.assertEqual(
+            metadata.load_repository(self.repo, fields=("maintainers",)), 3
+        )
+        cache = metadata.get_metadata_cache()
+        self.assertEqual(
+            [list(entry[2]) for entry in cache.parsed.values()], [["maintainers"]] * 3
+        )
+        self.assertEqual(metadata.load_repository(self.repo, fields=("use",)), 3)
+        self.assertEqual(
+            metadata.load_repository(self.repo, fields=("maintainers", "use")), 0
+        )
+
+
+def test_main():
+    suite = unittest.TestLoader()
+    suite.loadTestsFromTestCase(TestMetadataCache)
+    unittest.TextTestRunner(verbosity=2).run(suite)
+
+
+test_main.__test__ = False
+
+
+if __name__ == "__main__":
+    test_main()
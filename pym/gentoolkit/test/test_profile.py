@@ -5,8 +5,12 @@
 # Licensed under the GNU General Public License, v2
 
 import os.path
+import shutil
+import tempfile
 import unittest
+from unittest import mock
 
+from gentoolkit import profile
 from gentoolkit.profile import load_profile_data
 
 
@@ -16,6 +20,17 @@ TESTDIR = os.path.join(os.path.dirname(__file__), "../ekeyword/tests")
 class TestLoadProfileData(unittest.TestCase):
     """Tests for load_profile_data"""
 
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.environ = mock.patch.dict(os.environ, XDG_CACHE_HOME=self.tmpdir)
+        self.environ.start()
+        profile._profile_data.clear()
+
+    def tearDown(self):
+        self.environ.stop()
+        profile._profile_data.clear()
+        shutil.rmtree(self.tmpdir)
+
     def _test(self, subdir):
         portdir = os.path.join(TESTDIR, "profiles", subdir)
         return load_profile_data(portdir=portdir)
@@ -59,3 +74,21 @@ class TestLoadProfileData(unittest.TestCase):
         """Test running when neither files exists"""
         ret = self._test("none")
         self.assertEqual(ret, {})
+
+    def testCache(self):
+        """Test reusing the data of an earlier run until the files change"""
+        portdir = os.path.join(self.tmpdir, "repo")
+        shutil.copytree(os.path.join(TESTDIR, "profiles", "both"), portdir)
+        ret = load_profile_data(portdir=portdir)
+        self.assertTrue(os.path.exists(profile.get_cache_path("profile-data.json")))
+
+        profile._profile_data.clear()
+        with mock.patch.object(profile, "_read_profile_data") as m:
+            self.assertEqual(load_profile_data(portdir=portdir), ret)
+        self.assertEqual(m.call_count, 0)
+
+        arch_list = os.path.join(portdir, "profiles", "arch.list")
+        with open(arch_list, "a") as f:
+            f.write("newarch\n")
+        os.utime(arch_list, ns=(1, 1))
+        self.assertEqual(load_profile_data(portdir=portdir)["newarch"], (None, "arch"))
@@ -1,7 +1,11 @@
 import unittest
+from unittest import mock
+
+from portage.versions import cpv_getkey
 
 from gentoolkit import query
 from gentoolkit import errors
+from gentoolkit.atom import Atom
 
 
 class TestQuery(unittest.TestCase):
@@ -87,9 +91,135 @@ class TestQuery(unittest.TestCase):
         for gt in globbing_tests:
             self.assertTrue(query.Query(gt[0]).uses_globbing() == gt[1])
 
+    def test_cp_glob_filter(self):
+        cp_filter_tests = [
+            ("*/*python*", "dev-lang/python", True),
+            ("*/*python*", "dev-python/lxml", False),
+            ("*/portage-2*", "sys-apps/portage", True),
+            ("*/portage-2*", "sys-apps/portage-utils", False),
+            ("*sys-*/*-2.1.6.13", "sys-devel/gcc", True),
+            ("*sys-*/*-2.1.6.13", "dev-lang/python", False),
+            # The glob may only match once a version is appended
+            ("*/*_pre*", "app-misc/foo", True),
+            ("*/*-r1", "app-misc/foo", True),
+            ("*/[lp]*", "dev-python/lxml", True),
+            ("*/[!l]*", "dev-python/lxml", False),
+        ]
+
+        for pattern, cp, expected in cp_filter_tests:
+            self.assertEqual(query._CPGlobFilter(pattern)(cp), expected)
+
+    def test_set_lookup(self):
+        atoms = [">=cat/pkg-2", "cat/pkg:1", "cat/pkg", ">=cat/other-1", "cat/other:2"]
+        calls = []
+
+        def match_atoms(atoms, in_installed, in_porttree, include_masked):
+            calls.append(sorted(x.atom for x in atoms))
+            return {"cat/pkg-2", "cat/other-1"}
+
+        q = query.Query("@world")
+        with mock.patch.object(
+            query, "get_set_atoms", lambda name: {Atom(x) for x in atoms}
+        ), mock.patch.object(query, "_match_atoms", match_atoms):
+            matches = q.smart_find(show_progress=False)
+        self.assertEqual(q.query, "@world")
+        self.assertEqual([x.cpv for x in matches], ["cat/other-1", "cat/pkg-2"])
+        self.assertEqual(calls, [sorted(atoms)])
+
+    def test_match_atoms(self):
+        class FakeDbapi:
+            def __init__(self):
+                self.calls = []
+
+            def match(self, atom):
+                self.calls.append(atom)
+                return [atom.split(":")[0].lstrip(">=") + "-1"]
+
+        vardb = FakeDbapi()
+        portdb = FakeDbapi()
+        db = {
+            "/": {
+                "vartree": mock.Mock(dbapi=vardb),
+                "porttree": mock.Mock(dbapi=portdb),
+            }
+        }
+        atoms = [
+            Atom(x) for x in (">=cat/pkg-2", "cat/pkg:1", "cat/pkg", "cat/other:2")
+        ]
+        with mock.patch.object(query.portage, "db", db), mock.patch.object(
+            query.portage, "root", "/"
+        ):
+            matches = query._match_atoms(atoms, True, True, False)
+        self.assertEqual(matches, {"cat/pkg-1", "cat/other-1"})
+        self.assertEqual(sorted(vardb.calls), ["cat/other:2", "cat/pkg"])
+        self.assertEqual(vardb.calls, portdb.calls)
+
+    def test_repository_predicates(self):
+        repo_names = {"app-misc/foo-1": "gentoo", "app-misc/foo-2": ""}.get
+        with mock.patch.object(
+            query.helpers, "get_repo_names", return_value=repo_names
+        ):
+            _cat, _cp, predicate = query.Query("foo*::gentoo")._get_complex_predicates()
+            self.assertTrue(predicate("app-misc/foo-1"))
+            self.assertFalse(predicate("app-misc/foo-2"))
+            self.assertFalse(predicate("app-misc/bar-1"))
+            _cat, _cp, predicate = query.Query("foo*::null")._get_complex_predicates()
+            self.assertFalse(predicate("app-misc/foo-1"))
+            self.assertTrue(predicate("app-misc/foo-2"))
+
+
+class TestQueryBatch(unittest.TestCase):
+    cpvs = [
+        "dev-lang/python-3.11.4",
+        "dev-lang/python-3.10.12-r1",
+        "dev-python/lxml-4.9.3",
+        "sys-apps/portage-3.0.30",
+        "sys-apps/portage-utils-0.95",
+    ]
+
+    def setUp(self):
+        self._get_complex_finder = query._get_complex_finder
+        query._get_complex_finder = lambda *args: self.package_finder
+        self.n_walks = 0
+
+    def tearDown(self):
+        query._get_complex_finder = self._get_complex_finder
+
+    def package_finder(self, predicate=None, cat_predicate=None, cp_predicate=None):
+        self.n_walks += 1
+        for cpv in self.cpvs:
+            cp = cpv_getkey(cpv)
+            if cat_predicate is not None and not cat_predicate(cp.split("/")[0]):
+                continue
+            if cp_predicate is not None and not cp_predicate(cp):
+                continue
+            if predicate(cpv):
+                yield cpv
+
+    def test_batch(self):
+        queries = [
+            query.Query("*python*"),
+            query.Query("dev-*/*"),
+            query.Query("portage.*", is_regex=True),
+            query.Query("*-3.10*"),
+        ]
+        batch = query.QueryBatch(queries, show_progress=False, no_matches_fatal=False)
+        result = [sorted(x.cpv for x in batch.smart_find(q)) for q in batch]
+        self.assertEqual(self.n_walks, 1)
+
+        expected = [
+            sorted(x.cpv for x in q.smart_find(show_progress=False)) for q in queries
+        ]
+        self.assertEqual(result, expected)
+        self.assertEqual(
+            result[0], ["dev-lang/python-3.10.12-r1", "dev-lang/python-3.11.4"]
+        )
+        self.assertEqual(result[3], ["dev-lang/python-3.10.12-r1"])
+
 
 def test_main():
     suite = unittest.TestLoader().loadTestsFromTestCase(TestQuery)
+    suite.addTests(unittest.TestLoader().loadTestsFromTestCase(TestQueryBatch))
     unittest.TextTestRunner(verbosity=2).run(suite)
 
 
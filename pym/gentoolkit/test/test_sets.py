@@ -0,0 +1,74 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from gentoolkit import sets
+
+
+class FakeSetConfig:
+    def __init__(self):
+        self.calls = []
+        self.atoms = {"world": ["cat/pkg", ">=cat/other-1"], "installed": ["cat/pkg"]}
+
+    def getSetAtoms(self, setname):
+        self.calls.append(setname)
+        return set(self.atoms[setname])
+
+
+class TestSetAtomsCache(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.config = FakeSetConfig()
+        self.stamps = ["stamps", 1]
+        patches = [
+            mock.patch.dict(os.environ, XDG_CACHE_HOME=self.tmpdir),
+            mock.patch.object(sets, "_sets_available", True),
+            mock.patch.object(sets, "_set_config", self.config),
+            mock.patch.object(sets, "_set_stamps", lambda: list(self.stamps)),
+            mock.patch.object(sets, "_set_cache_key", lambda: "root"),
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+        sets.clear_set_atoms_cache()
+        self.addCleanup(sets.clear_set_atoms_cache)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def atoms(self, setname):
+        return sorted(str(x) for x in sets.get_set_atoms(setname))
+
+    def test_cache(self):
+        self.assertEqual(self.atoms("world"), [">=cat/other-1", "cat/pkg"])
+        self.assertEqual(self.atoms("world"), [">=cat/other-1", "cat/pkg"])
+        self.assertEqual(self.config.calls, ["world"])
+
+        # The next process reads them from the disk
+        sets.clear_set_atoms_cache()
+        self.assertEqual(self.atoms("world"), [">=cat/other-1", "cat/pkg"])
+        self.assertEqual(self.config.calls, ["world"])
+
+        self.stamps[1] = 2
+        self.config.atoms["world"] = ["cat/new"]
+        self.assertEqual(self.atoms("world"), ["cat/new"])
+        self.assertEqual(self.config.calls, ["world", "world"])
+
+    def test_uncached_sets(self):
+        self.atoms("installed")
+        self.atoms("installed")
+        self.assertEqual(self.config.calls, ["installed", "installed"])
+
+
+def test_main():
+    suite = unittest.TestLoader().loadTestsFromTestCase(TestSetAtomsCache)
+    unittest.TextTestRunner(verbosity=2).run(suite)
+
+
+test_main.__test__ = False
+
+
+if __name__ == "__main__":
+    test_main()
@@ -0,0 +1,99 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from gentoolkit import sizes
+from gentoolkit.sizes import SizeIndex, package_sizes, stat_files
+
+
+class FakePackage:
+    def __init__(self, cpv, root, files):
+        self.cpv = cpv
+        self.files = [os.path.join(root, x) for x in files]
+        self.parsed = 0
+
+    def __lt__(self, other):
+        return self.cpv < other.cpv
+
+    def parsed_contents(self, prefix_root=False):
+        self.parsed += 1
+        return dict.fromkeys(self.files)
+
+
+class FakeVardb:
+    def __init__(self):
+        self.packages = {}
+
+    def cpv_all(self):
+        return list(self.packages)
+
+
+class TestSizeIndex(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.vardb = FakeVardb()
+        db = {"/": {"vartree": mock.Mock(dbapi=self.vardb)}}
+        self.patches = [
+            mock.patch.object(sizes.portage, "db", db),
+            mock.patch.object(sizes.portage, "root", "/"),
+            mock.patch.object(sizes, "_get_package", self.get_package),
+        ]
+        for patch in self.patches:
+            patch.start()
+        for name, size in (("a", 10), ("b", 20), ("c", 40)):
+            with open(os.path.join(self.root, name), "w") as f:
+                f.write("x" * size)
+        os.link(os.path.join(self.root, "a"), os.path.join(self.root, "a2"))
+        self.foo = FakePackage("app-misc/foo-1", self.root, ["a", "a2", "b", "gone"])
+        self.bar = FakePackage("app-misc/bar-1", self.root, ["b", "c"])
+        for pkg in (self.foo, self.bar):
+            self.vardb.packages[pkg.cpv] = pkg
+
+    def get_package(self, cpv):
+        return self.vardb.packages[cpv]
+
+    def tearDown(self):
+        for patch in self.patches:
+            patch.stop()
+        shutil.rmtree(self.root)
+
+    def test_stat_files(self):
+        uncounted, inodes = stat_files(self.foo.files)
+        self.assertEqual(uncounted, 0)
+        self.assertEqual(sorted(sum((v[1::2] for v in inodes.values()), [])), [10, 20])
+
+    def test_sizes(self):
+        index = SizeIndex(jobs=2)
+        sizes = index.sizes([self.foo, self.bar])
+        self.assertEqual(
+            sizes, {"app-misc/bar-1": (60, 2, 0), "app-misc/foo-1": (10, 1, 0)}
+        )
+        # Shared files count for the same package, whatever was asked for
+        self.assertEqual(index.sizes([self.foo]), {"app-misc/foo-1": (10, 1, 0)})
+        self.assertEqual((self.foo.parsed, self.bar.parsed), (1, 1))
+
+        # Until it is uninstalled
+        del self.vardb.packages["app-misc/bar-1"]
+        self.assertEqual(index.sizes([self.foo]), {"app-misc/foo-1": (30, 2, 0)})
+
+    def test_package_sizes(self):
+        # Each package on its own, shared files included
+        for jobs in (1, 2):
+            self.assertEqual(
+                package_sizes([self.foo, self.bar], jobs),
+                {"app-misc/foo-1": (30, 2, 0), "app-misc/bar-1": (60, 2, 0)},
+            )
+
+
+def test_main():
+    suite = unittest.TestLoader().loadTestsFromTestCase(TestSizeIndex)
+    unittest.TextTestRunner(verbosity=2).run(suite)
+
+
+test_main.__test__ = False
+
+
+if __name__ == "__main__":
+    test_main()
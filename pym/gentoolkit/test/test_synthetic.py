@@ -0,0 +1,75 @@
+import hashlib
+import os
+import random
+import shutil
+import tempfile
+import unittest
+
+from gentoolkit.test.synthetic import SCALES, SyntheticTree
+
+
+class TestSyntheticTree(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.tree = SyntheticTree(self.tmpdir, **SCALES["tiny"]).generate()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_repo(self):
+        tree = self.tree
+        self.assertEqual(len(tree.packages), SCALES["tiny"]["packages"])
+        for cp, versions in tree.packages:
+            pn = cp.split("/")[1]
+            for version in versions:
+                ebuild = os.path.join(tree.repo, cp, "%s-%s.ebuild" % (pn, version))
+                cache = os.path.join(
+                    tree.repo, "metadata", "md5-cache", "%s-%s" % (cp, version)
+                )
+                with open(ebuild, "rb") as ebuild_file:
+                    md5 = hashlib.md5(ebuild_file.read()).hexdigest()
+                with open(cache) as cache_file:
+                    self.assertIn("_md5_=%s\n" % md5, cache_file.read())
+
+    def test_vdb(self):
+        tree = self.tree
+        self.assertEqual(len(tree.installed), SCALES["tiny"]["installed"])
+        counters = []
+        for cpv in tree.installed:
+            with open(os.path.join(tree.vdb, cpv, "COUNTER")) as counter:
+                counters.append(int(counter.read()))
+            with open(os.path.join(tree.vdb, cpv, "CONTENTS")) as contents:
+                for line in contents:
+                    path = line.split()[1]
+                    self.assertTrue(os.path.lexists(tree.root + path), path)
+        self.assertEqual(counters, list(range(1, len(tree.installed) + 1)))
+
+    def test_pkgdir(self):
+        tree = self.tree
+        with open(os.path.join(tree.pkgdir, "Packages")) as index:
+            entries = index.read().strip().split("\n\n")[1:]
+        self.assertEqual(len(entries), SCALES["tiny"]["binpkgs"])
+        for entry in entries:
+            fields = dict(line.split(": ", 1) for line in entry.strip().split("\n"))
+            st = os.stat(os.path.join(tree.pkgdir, fields["PATH"]))
+            self.assertEqual(int(fields["SIZE"]), st.st_size)
+            self.assertEqual(int(fields["MTIME"]), int(st.st_mtime))
+
+    def test_seed(self):
+        other = SyntheticTree(self.tmpdir, **SCALES["tiny"])
+        other._plan(random.Random(0))
+        self.assertEqual(other.installed, self.tree.installed)
+        self.assertRaises(TypeError, SyntheticTree, self.tmpdir, ebuilds=1)
+
+
+def test_main():
+    suite = unittest.TestLoader()
+    suite.loadTestsFromTestCase(TestSyntheticTree)
+    unittest.TextTestRunner(verbosity=2).run(suite)
+
+
+test_main.__test__ = False
+
+
+if __name__ == "__main__":
+    test_main()
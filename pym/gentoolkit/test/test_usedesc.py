@@ -0,0 +1,116 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from gentoolkit import usedesc
+from gentoolkit.usedesc import LocalFlag, UseDescriptions
+
+METADATA = """<?xml version="1.0" encoding="UTF-8"?>
+<pkgmetadata>
+	<use>
+		<flag name="%s">Local
+			flag</flag>
+		<flag name="new" restrict="&gt;=app-misc/%s-2">Only in 2</flag>
+	</use>
+</pkgmetadata>
+"""
+
+
+class TestUseDescriptions(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.repo = os.path.join(self.tmpdir, "repo")
+        self.path = os.path.join(self.tmpdir, "cache", "usedesc.idx")
+        self.write("profiles/use.desc", "# comment\nssl - SSL support\n")
+        self.write("profiles/desc/video_cards.desc", "radeon - Radeon cards\n")
+        for pn in ("aaa", "bbb", "ccc"):
+            self.write("app-misc/%s/metadata.xml" % pn, METADATA % (pn, pn))
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def write(self, name, content):
+        path = os.path.join(self.repo, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as f:
+            f.write(content)
+        return path
+
+    def metadata(self, pn):
+        return os.path.join(self.repo, "app-misc", pn, "metadata.xml")
+
+    def index(self):
+        return UseDescriptions(self.path, [self.repo])
+
+    def test_global_flags(self):
+        self.assertEqual(
+            self.index().global_flags(),
+            {"ssl": "SSL support", "video_cards_radeon": "Radeon cards"},
+        )
+
+    def test_local_flags(self):
+        self.assertEqual(
+            self.index().local_flags(self.metadata("bbb")),
+            [
+                LocalFlag("bbb", None, "Local flag"),
+                LocalFlag("new", ">=app-misc/bbb-2", "Only in 2 "),
+            ],
+        )
+        self.assertEqual(self.index().local_flags(self.metadata("none")), [])
+
+    def test_persistence(self):
+        index = self.index()
+        index.global_flags()
+        index.local_flags(self.metadata("aaa"))
+        index.local_flags(self.metadata("ccc"))
+        index.save()
+        index = self.index()
+        index.local_flags(self.metadata("bbb"))
+        index.save()
+
+        index = self.index()
+        for pn in ("aaa", "bbb", "ccc"):
+            self.assertEqual(index.local_flags(self.metadata(pn))[0].name, pn)
+        self.assertEqual(index.global_flags()["ssl"], "SSL support")
+        self.assertFalse(index._dirty)
+
+    def test_invalidation(self):
+        index = self.index()
+        index.update_all()
+        index.save()
+
+        self.write("profiles/use.desc", "ssl - Secure sockets\n")
+        self.write("app-misc/bbb/metadata.xml", METADATA % ("changed", "bbb"))
+        for path in (
+            self.metadata("bbb"),
+            os.path.join(self.repo, "profiles/use.desc"),
+        ):
+            os.utime(path, ns=(1, 1))
+
+        index = self.index()
+        self.assertEqual(index.local_flags(self.metadata("bbb"))[0].name, "changed")
+        self.assertEqual(index.global_flags()["ssl"], "Secure sockets")
+        self.assertTrue(index._dirty)
+
+        # Another set of repositories
+        index = UseDescriptions(self.path, [self.repo, self.tmpdir])
+        self.assertIsNone(index._mmap)
+
+    def test_get_use_descriptions(self):
+        usedesc.clear_use_descriptions_cache()
+        self.assertIs(usedesc.get_use_descriptions(), usedesc.get_use_descriptions())
+        usedesc.clear_use_descriptions_cache()
+
+
+def test_main():
+    suite = unittest.TestLoader()
+    suite.loadTestsFromTestCase(TestUseDescriptions)
+    unittest.TextTestRunner(verbosity=2).run(suite)
+
+
+test_main.__test__ = False
+
+
+if __name__ == "__main__":
+    test_main()
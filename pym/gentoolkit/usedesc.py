@@ -0,0 +1,338 @@
+# Copyright(c) 2026, Gentoo Foundation
+#
+# Licensed under the GNU General Public License, v2
+
+"""A persistent index of USE flag descriptions.
+
+Global and USE_EXPAND flag descriptions come from profiles/use.desc and
+profiles/desc/*.desc of every configured repository, local ones from the
+packages' metadata.xml. All of them are kept in one file in gentoolkit's
+cache directory, so that a run does not have to parse them again:
+
+    >>> from gentoolkit.usedesc import get_use_descriptions
+    >>> index = get_use_descriptions()
+    >>> index.global_flags()["ssl"]
+    'Add support for SSL/TLS connections (Secure Socket Layer / Transport Layer Security)'
+    >>> [flag.name for flag in index.local_flags(
+    ...     '/var/db/repos/gentoo/app-accessibility/espeak-ng/metadata.xml')]
+    ['async', 'klatt', 'l10n_ru', 'l10n_zh', 'man', 'mbrola']
+    >>> index.save()
+
+The file starts with a header line holding the global descriptions and the
+mtimes of the files they were read from, followed by one sorted line per
+local flag, "PATH<tab>FLAG<tab>RESTRICT<tab>DESCRIPTION", and per
+metadata.xml a stamp line with its mtime in place of the restriction and
+no flag, which sorts first. Local flags are looked up with a binary search
+in the memory mapped file, so only the lines of the requested packages are
+read. Entries whose files changed since are parsed again, as are packages
+not in the index yet, and saved with the next L{UseDescriptions.save}.
+"""
+
+__all__ = (
+    "UseDescriptions",
+    "clear_use_descriptions_cache",
+    "get_use_descriptions",
+)
+__docformat__ = "epytext"
+
+# =======
+# Imports
+# =======
+
+import json
+import mmap
+import os
+from collections import namedtuple
+from glob import glob
+
+import portage
+from portage import _encodings, _unicode_encode
+
+from gentoolkit import instrument
+from gentoolkit.helpers import find_sorted_line, get_cache_path, write_cache_file
+
+# =======
+# Globals
+# =======
+
+# A local USE flag, with the attributes of gentoolkit.metadata._Useflag
+LocalFlag = namedtuple("LocalFlag", ("name", "restrict", "description"))
+
+_MAGIC = b"gentoolkit-usedesc 1\n"
+
+_use_descriptions = None
+
+# =======
+# Classes
+# =======
+
+
+class UseDescriptions:
+    """USE flag descriptions of the configured repositories.
+
+    @type path: str
+    @param path: the index file, defaults to usedesc.idx in gentoolkit's
+            cache directory
+    @type repos: list
+    @param repos: repository locations, in increasing order of
+            precedence for global flags. Defaults to those of
+            portage.settings, with the main repository last.
+    """
+
+    def __init__(self, path=None, repos=None):
+        self.path = path or get_cache_path("usedesc.idx")
+        if repos is None:
+            repos = _repo_locations()
+        self.repos = list(repos)
+        self._global = None
+        self._sources = None
+        # {metadata.xml path: (mtime_ns, [LocalFlag, ...])} parsed in this run
+        self._local = {}
+        self._dirty = False
+        self._mmap = None
+        self._start = 0
+        self._load()
+
+    def global_flags(self):
+        """Return the global and USE_EXPAND flag descriptions.
+
+        USE_EXPAND flags are named like they appear in USE, e.g.
+        video_cards_radeon.
+
+        @rtype: dict
+        @return: {'flag_name': 'flag description', ...}
+        """
+
+        sources = self._global_sources()
+        if self._global is None or sources != self._sources:
+            with instrument.phase("read USE flag descriptions"):
+                self._global = {}
+                for location in self.repos:
+                    self._global.update(_read_global(location))
+            self._sources = sources
+            self._dirty = True
+        return self._global
+
+    def local_flags(self, metadata_path):
+        """Return the local flags of a package.
+
+        @type metadata_path: str
+        @param metadata_path: path of the package's metadata.xml
+        @rtype: list
+        @return: a L{LocalFlag} per flag, in document order, or [] if the
+                file does not exist
+        """
+
+        mtime = _mtime(metadata_path)
+        entry = self._local.get(metadata_path)
+        if entry is None or entry[0] != mtime:
+            entry = self._lookup(metadata_path)
+            if entry is None or entry[0] != mtime:
+                entry = (mtime, _read_local(metadata_path, mtime))
+                self._dirty = True
+            self._local[metadata_path] = entry
+        return entry[1]
+
+    def update_all(self):
+        """Index the local flags of every package of the repositories."""
+
+        self.global_flags()
+        for location in self.repos:
+            for path in glob(os.path.join(location, "*", "*", "metadata.xml")):
+                self.local_flags(path)
+
+    def save(self):
+        """Write the index, if anything was added or updated."""
+
+        if not self._dirty:
+            return
+        lines = {}
+        for path, (mtime, flags) in self._local.items():
+            lines[path] = _format_local(path, mtime, flags)
+        if self._mmap is not None:
+            # Keep what was indexed before and not looked up this time
+            self._mmap.seek(self._start)
+            for line in iter(self._mmap.readline, b""):
+                path = line.split(b"\t", 1)[0].decode("utf-8")
+                if path not in self._local:
+                    lines.setdefault(path, []).append(line)
+        header = json.dumps(
+            {"repos": self.repos, "sources": self._sources, "global": self._global},
+            separators=(",", ":"),
+        )
+
+        def write(index):
+            index.write(_MAGIC)
+            index.write(header.encode("utf-8") + b"\n")
+            for path in sorted(lines, key=lambda path: path.encode("utf-8")):
+                index.writelines(lines[path])
+
+        if write_cache_file(self.path, write, binary=True):
+            self._dirty = False
+
+    def _load(self):
+        try:
+            with open(self.path, "rb") as index:
+                if index.readline() != _MAGIC:
+                    return
+                header = json.loads(index.readline())
+                self._start = index.tell()
+                self._mmap = mmap.mmap(index.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            return
+        if header.get("repos") != self.repos:
+            # Another configuration, start over
+            self._mmap = None
+            return
+        self._sources = header["sources"]
+        self._global = header["global"]
+
+    def _lookup(self, metadata_path):
+        """Find the local flags of metadata_path in the index file.
+
+        @rtype: tuple or None
+        @return: (mtime_ns, [LocalFlag, ...])
+        """
+
+        data = self._mmap
+        if data is None:
+            return None
+        key = metadata_path.encode("utf-8") + b"\t"
+        lo = find_sorted_line(data, key, self._start)
+        end = data.find(b"\n", lo)
+        if end < 0 or data[lo : lo + len(key)] != key:
+            return None
+        stamp = data[lo:end].decode("utf-8").split("\t")
+        if stamp[1]:
+            return None
+        mtime = int(stamp[2]) if stamp[2] else None
+        flags = []
+        lo = end + 1
+        while data[lo : lo + len(key)] == key:
+            end = data.find(b"\n", lo)
+            fields = data[lo + len(key) : end].decode("utf-8").split("\t")
+            flags.append(LocalFlag(fields[0], fields[1] or None, fields[2]))
+            lo = end + 1
+        return mtime, flags
+
+    def _global_sources(self):
+        """Return the mtimes of the files global_flags() are read from."""
+
+        sources = []
+        for location in self.repos:
+            profiles = os.path.join(location, "profiles")
+            paths = [os.path.join(profiles, "use.desc"), os.path.join(profiles, "desc")]
+            paths.extend(sorted(glob(os.path.join(profiles, "desc", "*.desc"))))
+            sources.extend([path, _mtime(path)] for path in paths)
+        return sources
+
+
+# =========
+# Functions
+# =========
+
+
+def get_use_descriptions():
+    """Return the L{UseDescriptions} of the configured repositories.
+
+    The index is loaded on first use and reused for the rest of the
+    process.
+
+    @rtype: L{UseDescriptions}
+    """
+
+    global _use_descriptions
+
+    if _use_descriptions is None:
+        _use_descriptions = UseDescriptions()
+    return _use_descriptions
+
+
+def clear_use_descriptions_cache():
+    """Forget the loaded L{UseDescriptions}."""
+
+    global _use_descriptions
+
+    _use_descriptions = None
+
+
+def _repo_locations(settings=None):
+    if settings is None:
+        settings = portage.settings
+    main = settings.repositories.mainRepoLocation()
+    locations = [
+        settings.repositories[name].location
+        for name in settings.repositories.prepos_order
+        if settings.repositories[name].location != main
+    ]
+    if main is not None:
+        locations.append(main)
+    return locations
+
+
+def _mtime(path):
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+
+def _read_desc(path):
+    """Yield the (flag, description) pairs of a use.desc style file."""
+
+    try:
+        with open(
+            _unicode_encode(path, encoding=_encodings["fs"]),
+            encoding=_encodings["content"],
+        ) as open_file:
+            for line in open_file:
+                if line.startswith("#"):
+                    continue
+                fields = line.split(" - ", 1)
+                if len(fields) == 2:
+                    yield fields[0].strip(), fields[1].strip()
+    except IOError:
+        return
+
+
+def _read_global(location):
+    """Return the global and USE_EXPAND flag descriptions of a repository."""
+
+    descriptions = dict(_read_desc(os.path.join(location, "profiles", "use.desc")))
+    # Add USE_EXPANDED variables -- Bug #238005
+    for path in glob(os.path.join(location, "profiles", "desc", "*.desc")):
+        prefix = os.path.basename(path)[:-5]
+        for flag, description in _read_desc(path):
+            descriptions["%s_%s" % (prefix, flag)] = description
+    return descriptions
+
+
+def _read_local(metadata_path, mtime):
+    if mtime is None:
+        return []
+
+    from gentoolkit.metadata import MetaData
+
+    try:
+        metadata = MetaData(metadata_path)
+    except (IOError, SyntaxError):
+        # Missing, or not valid XML
+        return []
+    return [
+        LocalFlag(flag.name, flag.restrict, flag.description) for flag in metadata.use()
+    ]
+
+
+def _format_local(path, mtime, flags):
+    """Return the index lines of a metadata.xml."""
+
+    lines = ["%s\t\t%s\t\n" % (path, "" if mtime is None else mtime)]
+    for flag in flags:
+        lines.append(
+            "%s\t%s\t%s\t%s\n"
+            % (path, flag.name, flag.restrict or "", flag.description)
+        )
+    return [line.encode("utf-8") for line in lines]
+
+
+# vim: set ts=4 sw=4 tw=79: